@@ -0,0 +1,126 @@
+"""
+Sync (threadpool + psycopg2) against async (event loop + asyncpg) routes
+under uvicorn: requests per second at increasing concurrency, and the best
+throughput each stack sustains within a fixed p99 latency budget.
+
+    python ./benchmarks/async_comparison.py --scenario browse --p99-budget 100
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCHMARKS = Path(__file__).resolve().parent
+MODES = {"sync": "false", "async": "true"}
+
+
+def run_level(
+    mode: str, scenario: str, concurrency: int, requests: int, seed: int
+) -> dict:
+    """
+    Result of one run.py scenario run in a process of its own, the stack is
+    selected by USE_ASYNC at import time
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        output = Path(directory) / "results.json"
+        subprocess.run(
+            [
+                sys.executable,
+                str(BENCHMARKS / "run.py"),
+                "--target",
+                "uvicorn",
+                "--scenario",
+                scenario,
+                "--requests",
+                str(requests),
+                "--concurrency",
+                str(concurrency),
+                "--seed",
+                str(seed),
+                "--output",
+                str(output),
+                # Never compare against the stored baseline
+                "--baseline",
+                str(Path(directory) / "baseline.json"),
+            ],
+            env=dict(
+                os.environ,
+                USE_ASYNC=MODES[mode],
+                # Pool waits would otherwise dominate the latencies
+                DATABASE_POOL_SIZE=str(concurrency),
+                DATABASE_MAX_OVERFLOW="0",
+            ),
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        return json.loads(output.read_text())["results"][f"uvicorn/{scenario}"]
+
+
+def best_within_budget(results: Dict[int, dict], p99_budget: float) -> Optional[int]:
+    within = [
+        concurrency
+        for concurrency, result in results.items()
+        if result["p99_ms"] <= p99_budget and not result["errors"]
+    ]
+    if not within:
+        return None
+    return max(within, key=lambda concurrency: results[concurrency]["throughput"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", default="browse")
+    parser.add_argument(
+        "--concurrency",
+        default="1,4,16,32,64",
+        help="Comma separated concurrent client levels",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=2_000, help="Measured requests per level"
+    )
+    parser.add_argument(
+        "--p99-budget", type=float, default=100, help="p99 latency budget in ms"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    levels: List[int] = [int(level) for level in args.concurrency.split(",")]
+
+    results: Dict[str, Dict[int, dict]] = {}
+    for mode in MODES:
+        results[mode] = {}
+        for concurrency in levels:
+            print(f"Running {args.scenario} {mode} at concurrency {concurrency}")
+            results[mode][concurrency] = run_level(
+                mode, args.scenario, concurrency, args.requests, args.seed
+            )
+
+    print(
+        f"{'mode':6} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} "
+        f"{'errors':>7}"
+    )
+    for mode, mode_results in results.items():
+        for concurrency, result in mode_results.items():
+            print(
+                f"{mode:6} {concurrency:8} {result['throughput']:9.1f} "
+                f"{result['p50_ms']:9.2f} {result['p99_ms']:9.2f} "
+                f"{result['errors']:7}"
+            )
+    print(f"Best throughput within p99 {args.p99_budget} ms:")
+    for mode, mode_results in results.items():
+        concurrency = best_within_budget(mode_results, args.p99_budget)
+        if concurrency is None:
+            print(f"  {mode:6} no level within budget")
+            continue
+        print(
+            f"  {mode:6} {mode_results[concurrency]['throughput']:9.1f} req/s "
+            f"at {concurrency} clients"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Latency of conditional GET requests answered with 304 Not Modified against
+full responses of the same resources. A matching If-None-Match is answered
+after the version query alone, without loading relationships or serializing.
+
+    python ./benchmarks/conditional_requests.py --resources 100 --requests 1000
+"""
+
+import sys
+from pathlib import Path
+
+# Add my_awesome_api to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent / "my_awesome_api"))
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import etags as etags
+import models.sqlalchemy as sql
+import resources
+from run import TARGETS, Sample, summarize
+from scenarios import Operation
+from sqlalchemy import Select, select
+
+
+class Resource(NamedTuple):
+    route: str
+    path: str
+    model: type
+    version: Callable[[int], Select]
+
+
+RESOURCES = (
+    Resource("GET /books/{book_id}", "/books/{}", sql.Book, etags.book_version),
+    Resource(
+        "GET /library-cards/{library_card_id}",
+        "/library-cards/{}",
+        sql.LibraryCard,
+        etags.library_card_version,
+    ),
+)
+
+
+def current_etags(resource: Resource, amount: int) -> Dict[int, str]:
+    """
+    Current ETags of the first amount rows of given resource
+    """
+    with resources.get_configured_database().create_session() as session:
+        ids = session.scalars(
+            select(resource.model.id).order_by(resource.model.id).limit(amount)
+        ).all()
+        return {id_: etags.etag(session.scalar(resource.version(id_))) for id_ in ids}
+
+
+def measure(
+    target,
+    resource: Resource,
+    resource_etags: Dict[int, str],
+    requests: int,
+    conditional: bool,
+    rng: random.Random,
+) -> dict:
+    expected = 304 if conditional else 200
+    ids = list(resource_etags)
+    samples: List[Sample] = []
+    for _ in range(requests):
+        id_ = rng.choice(ids)
+        headers: Optional[Dict[str, str]] = None
+        if conditional:
+            headers = {"If-None-Match": resource_etags[id_]}
+        operation = Operation(
+            resource.route,
+            "GET",
+            resource.path.format(id_),
+            expected=(expected,),
+            headers=headers,
+        )
+        started = time.perf_counter()
+        result = target.request(operation)
+        samples.append(
+            Sample(
+                resource.route,
+                time.perf_counter() - started,
+                result.status_code == expected,
+                result.statements,
+                1,
+            )
+        )
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=tuple(TARGETS), default="uvicorn")
+    parser.add_argument(
+        "--resources", type=int, default=100, help="Distinct ids per route"
+    )
+    parser.add_argument("--requests", type=int, default=1_000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(
+        f"{'route':38} {'response':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'queries':>8} {'errors':>7}"
+    )
+    with TARGETS[args.target]() as target:
+        for resource in RESOURCES:
+            resource_etags = current_etags(resource, args.resources)
+            if not resource_etags:
+                print(f"{resource.route:38} skipped, no rows")
+                continue
+            results = {}
+            for conditional, label in ((False, "200 full"), (True, "304")):
+                rng = random.Random(args.seed)
+                measure(target, resource, resource_etags, args.warmup, conditional, rng)
+                results[label] = result = measure(
+                    target, resource, resource_etags, args.requests, conditional, rng
+                )
+                print(
+                    f"{resource.route:38} {label:>9} {result['p50_ms']:9.2f} "
+                    f"{result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+                    f"{result['queries_per_request'] or 0:8.2f} "
+                    f"{result['errors']:7}"
+                )
+            if results["304"]["p50_ms"]:
+                speedup = results["200 full"]["p50_ms"] / results["304"]["p50_ms"]
+                print(f"{resource.route:38} 304 is {speedup:.1f}x faster at p50")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Time per row of the vectorized dataset row generators in
+data/create_dataset.py at growing batch sizes. Generation should scale
+linearly: the time per row may creep up once a batch no longer fits in CPU
+caches, but must not grow with every tenfold step the way it would for a
+quadratic generator.
+
+    python ./benchmarks/dataset_generation.py --rows 1000,10000,100000,1000000
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# Add my_awesome_api, the repository root and data to sys.path
+sys.path.append(str(ROOT / "my_awesome_api"))
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "data"))
+
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from create_dataset import (
+    Pools,
+    batch_random,
+    generate_author_rows,
+    generate_book_rows,
+    generate_borrower_rows,
+    generate_loan_rows,
+    generate_pools,
+    generate_review_rows,
+)
+
+AUTHORS_AMOUNT = 1_000
+
+
+def generators(pools: Pools, seed: int) -> Dict[str, Callable[[int], object]]:
+    """
+    Row generators by table, each generating the rows of one batch of given
+    size the way bulk_populate_database does
+    """
+
+    def rng(phase: str):
+        return batch_random(seed, 0, phase)
+
+    authors = range(1, AUTHORS_AMOUNT + 1)
+    return {
+        "authors": lambda amount: generate_author_rows(
+            range(1, amount + 1), pools, rng("authors")
+        ),
+        "books": lambda amount: generate_book_rows(
+            range(1, amount + 1), authors, pools, rng("parents")
+        ),
+        "borrowers": lambda amount: generate_borrower_rows(
+            range(1, amount + 1), range(1, amount + 1), amount, pools, rng("parents")
+        ),
+        "loans": lambda amount: generate_loan_rows(
+            range(1, amount + 1),
+            range(1, amount + 1),
+            range(1, amount + 1),
+            rng("children"),
+        ),
+        "reviews": lambda amount: generate_review_rows(
+            range(1, amount + 1),
+            range(1, amount + 1),
+            range(1, amount + 1),
+            pools,
+            rng("children"),
+        ),
+    }
+
+
+def best_time(generate: Callable[[int], object], amount: int, repeats: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        generate(amount)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows",
+        default="1000,10000,100000,1000000",
+        help="Comma separated increasing batch sizes",
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Best of repeats")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.0,
+        help="Allowed relative increase of the time per row between sizes",
+    )
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.rows.split(",")]
+
+    # Pools are generated once per dataset, not per batch
+    started = time.perf_counter()
+    pools = generate_pools(args.seed)
+    print(f"Pools generated in {time.perf_counter() - started:.2f} s")
+
+    print(f"{'table':10} {'rows':>10} {'total ms':>10} {'ns/row':>9} {'ratio':>7}")
+    regressions = []
+    for table, generate in generators(pools, args.seed).items():
+        previous = None
+        for amount in sizes:
+            per_row = best_time(generate, amount, args.repeats) / amount
+            ratio = per_row / (previous or per_row)
+            previous = per_row
+            print(
+                f"{table:10} {amount:10} {per_row * amount * 1000:10.2f} "
+                f"{per_row * 1e9:9.1f} {ratio:7.2f}"
+            )
+            if ratio > 1 + args.tolerance:
+                regressions.append(f"{table}/{amount}")
+
+    if regressions:
+        print(f"REGRESSION {regressions} scale worse than linearly")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
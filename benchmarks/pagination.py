@@ -0,0 +1,120 @@
+"""
+Latency of GET /books/available/ by page depth. Keyset pagination seeks
+straight to the cursor, so page 10,000 should be served as fast as page 1.
+
+    python ./benchmarks/pagination.py --pages 1,10,100,1000,10000 --limit 10
+"""
+
+import sys
+from pathlib import Path
+
+# Add my_awesome_api to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent / "my_awesome_api"))
+
+import argparse
+import time
+from typing import List, Optional
+
+import models.sqlalchemy as sql
+import resources
+from run import TARGETS, Sample, summarize
+from scenarios import Operation
+from sqlalchemy import select
+
+ROUTE = "GET /books/available/"
+
+
+def page_cursor(page: int, limit: int) -> Optional[int]:
+    """
+    Cursor of given page, the id of the last available book of the page
+    before it. None for the first page and for pages past the last one
+    """
+    if page == 1:
+        return None
+    with resources.get_configured_database().create_session() as session:
+        return session.scalar(
+            select(sql.Book.id)
+            .where(sql.Book.is_available)
+            .order_by(sql.Book.id)
+            .offset((page - 1) * limit - 1)
+            .limit(1)
+        )
+
+
+def measure_page(target, cursor: Optional[int], limit: int, requests: int) -> dict:
+    query = f"limit={limit}" if cursor is None else f"after={cursor}&limit={limit}"
+    operation = Operation(ROUTE, "GET", "/books/available/", query, items=limit)
+    samples: List[Sample] = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        result = target.request(operation)
+        samples.append(
+            Sample(
+                ROUTE,
+                time.perf_counter() - started,
+                result.status_code == 200,
+                result.statements,
+                limit,
+            )
+        )
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=tuple(TARGETS), default="uvicorn")
+    parser.add_argument(
+        "--pages",
+        default="1,10,100,1000,10000",
+        help="Comma separated page numbers, the first one is the reference",
+    )
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative p50 increase of any page over the reference page",
+    )
+    args = parser.parse_args()
+    pages = [int(page) for page in args.pages.split(",")]
+
+    cursors = {page: page_cursor(page, args.limit) for page in pages}
+    skipped = [page for page in pages if page != 1 and cursors[page] is None]
+    pages = [page for page in pages if page not in skipped]
+
+    results = {}
+    with TARGETS[args.target]() as target:
+        for page in pages:
+            measure_page(target, cursors[page], args.limit, args.warmup)
+            results[page] = measure_page(
+                target, cursors[page], args.limit, args.requests
+            )
+
+    reference = results[pages[0]]
+    print(
+        f"{'page':>8} {'cursor':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'queries':>8} {'errors':>7} {'p50 ratio':>10}"
+    )
+    regressions = []
+    for page, result in results.items():
+        ratio = result["p50_ms"] / reference["p50_ms"] if reference["p50_ms"] else 0
+        print(
+            f"{page:>8} {cursors[page] or '':>10} {result['p50_ms']:9.2f} "
+            f"{result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+            f"{result['queries_per_request'] or 0:8.2f} {result['errors']:7} "
+            f"{ratio:10.2f}"
+        )
+        if ratio > 1 + args.tolerance:
+            regressions.append(page)
+    for page in skipped:
+        print(f"Page {page} skipped, the dataset has fewer available books")
+
+    if regressions:
+        print(f"REGRESSION pages {regressions} are slower than page {pages[0]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Python-side overhead per lookup-by-id query, measured against a stub DB-API
+that answers every statement instantly with a single row. Time spent here is
+ORM query construction, statement compilation (or compiled cache lookups),
+result processing and session bookkeeping, never the database.
+
+    python ./benchmarks/query_overhead.py --iterations 20000
+"""
+
+import sys
+from pathlib import Path
+
+# Add my_awesome_api to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent / "my_awesome_api"))
+
+import argparse
+import time
+import types
+from typing import Callable, Dict, NamedTuple
+
+import models.loaders as loaders
+import models.response as response
+import models.sqlalchemy as sql
+from sqlalchemy import ARRAY, bindparam, create_engine, event, lambda_stmt, select
+from sqlalchemy.dialects import registry
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+from sqlalchemy.orm import Session
+
+FLOAT8_OID = 701
+
+
+class StubCursor:
+    """
+    DB-API cursor returning one row shaped like the compiled statement.
+    Plain SQL strings, only run by the dialect on connect, get a version string
+    """
+
+    arraysize = 1
+    rowcount = 1
+    lastrowid = None
+    columns = None
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self._rows = []
+
+    def execute(self, statement, parameters=None):
+        if not self.columns:
+            self.description = [("version", None, None, None, None, None, None)]
+            self._rows = [("PostgreSQL 16.0",)]
+            return
+        # Every column claims to be float8 so that numeric result processors
+        # accept it, the ORM does not check values against column types
+        self.description = [
+            (name, FLOAT8_OID, None, None, None, None, None) for name, _ in self.columns
+        ]
+        self._rows = [tuple(value for _, value in self.columns)]
+
+    def fetchone(self):
+        return self._rows.pop() if self._rows else None
+
+    def fetchmany(self, size=None):
+        return self.fetchall()
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    server_version = 160000
+    autocommit = False
+    closed = 0
+    notices = []
+
+    def cursor(self, *args, **kwargs):
+        return StubCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+stub_dbapi = types.ModuleType("stub_dbapi")
+stub_dbapi.__version__ = "2.9.9"
+stub_dbapi.paramstyle = "pyformat"
+stub_dbapi.Error = Exception
+stub_dbapi.connect = lambda *args, **kwargs: StubConnection()
+
+
+class StubDialect(PGDialect_psycopg2):
+    """
+    psycopg2 dialect on top of the stub DB-API, statements compile exactly as
+    they would against PostgreSQL
+    """
+
+    supports_statement_cache = True
+
+    @classmethod
+    def import_dbapi(cls):
+        return stub_dbapi
+
+    def on_connect(self):
+        # Skip registering psycopg2 type adapters on the stub connection
+        return None
+
+
+registry.register("postgresql.stub", __name__, "StubDialect")
+
+
+def stub_engine():
+    engine = create_engine("postgresql+stub://stub@stub/stub", use_native_hstore=False)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _shape_result(connection, cursor, statement, parameters, context, many):
+        compiled = context.compiled
+        result_columns = getattr(compiled, "_result_columns", None) or []
+        cursor.columns = [
+            (name, [1] if isinstance(type_, ARRAY) else 1)
+            for name, _, _, type_ in result_columns
+        ]
+
+    return engine
+
+
+class Lookup(NamedTuple):
+    name: str
+    model: type
+    options: tuple
+
+
+LOOKUPS = (
+    Lookup("loan", sql.Loan, loaders.loader_options(response.Loan)),
+    Lookup("book", sql.Book, loaders.loader_options(response.Book)),
+)
+
+
+def legacy_query(session: Session, lookup: Lookup, id: int):
+    return (
+        session.query(lookup.model)
+        .options(*lookup.options)
+        .filter(lookup.model.id == id)
+        .first()
+    )
+
+
+def select_statement(session: Session, lookup: Lookup, id: int):
+    return session.scalars(
+        select(lookup.model).options(*lookup.options).where(lookup.model.id == id)
+    ).first()
+
+
+# Built once like the statements of the routes, bound per lookup
+PREBUILT = {
+    lookup.name: select(lookup.model)
+    .options(*lookup.options)
+    .where(lookup.model.id == bindparam("id"))
+    for lookup in LOOKUPS
+}
+
+
+def prebuilt_statement(session: Session, lookup: Lookup, id: int):
+    return session.scalars(PREBUILT[lookup.name], {"id": id}).first()
+
+
+def lambda_statement(session: Session, lookup: Lookup, id: int):
+    model, options = lookup.model, lookup.options
+    statement = lambda_stmt(lambda: select(model).options(*options))
+    statement += lambda s: s.where(model.id == id)
+    return session.scalars(statement).first()
+
+
+def session_get(session: Session, lookup: Lookup, id: int):
+    return session.get(lookup.model, id, options=lookup.options)
+
+
+STYLES: Dict[str, Callable] = {
+    "query().filter().first()": legacy_query,
+    "select()": select_statement,
+    "prebuilt select()": prebuilt_statement,
+    "lambda_stmt()": lambda_statement,
+    "session.get()": session_get,
+}
+
+
+class Measurement(NamedTuple):
+    seconds_per_lookup: float
+    statements_per_lookup: float
+
+
+def measure(engine, lookup: Lookup, style: Callable, iterations: int, shared: bool):
+    """
+    Time iterations lookups of given style. Every lookup runs in its own
+    session unless shared, in which case the identity map of one session
+    answers all but the first
+    """
+    statements = 0
+
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    session = Session(engine)
+    # Keep the instance referenced, the identity map only holds weak references
+    instance = style(session, lookup, 1)
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            if not shared:
+                session.close()
+            style(session, lookup, 1)
+        elapsed = time.perf_counter() - started
+        session.close()
+        del instance
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    return Measurement(elapsed / iterations, statements / iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10_000)
+    args = parser.parse_args()
+
+    engine = stub_engine()
+    print(
+        f"{'lookup':<8}{'style':<28}{'session':<10}{'us/lookup':>12}{'statements':>12}"
+    )
+    for lookup in LOOKUPS:
+        for name, style in STYLES.items():
+            for shared in (False, True):
+                result = measure(engine, lookup, style, args.iterations, shared)
+                print(
+                    f"{lookup.name:<8}{name:<28}{'shared' if shared else 'new':<10}"
+                    f"{result.seconds_per_lookup * 1e6:>12.1f}"
+                    f"{result.statements_per_lookup:>12.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
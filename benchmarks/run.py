@@ -0,0 +1,375 @@
+import sys
+from pathlib import Path
+
+# Add my_awesome_api to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent / "my_awesome_api"))
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import main
+import resources
+import settings
+from scenarios import SCENARIOS, IdRanges, Workload
+from sqlalchemy import text
+from targets import MangumTarget, UvicornTarget
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Dataset sizes passed to data/create_dataset.py
+DATASETS = {
+    "small": dict(
+        DATASET_BATCH_SIZE=1_000,
+        DATASET_AUTHORS_AMOUNT=1_000,
+        DATASET_BOOKS_AMOUNT=10_000,
+        DATASET_LOANS_AMOUNT=2_000,
+        DATASET_BORROWERS_AMOUNT=2_000,
+        DATASET_REVIEWS_AMOUNT=20_000,
+    ),
+    "medium": dict(
+        DATASET_BATCH_SIZE=10_000,
+        DATASET_AUTHORS_AMOUNT=10_000,
+        DATASET_BOOKS_AMOUNT=100_000,
+        DATASET_LOANS_AMOUNT=20_000,
+        DATASET_BORROWERS_AMOUNT=20_000,
+        DATASET_REVIEWS_AMOUNT=200_000,
+    ),
+    "large": dict(
+        DATASET_BATCH_SIZE=50_000,
+        DATASET_AUTHORS_AMOUNT=100_000,
+        DATASET_BOOKS_AMOUNT=1_000_000,
+        DATASET_LOANS_AMOUNT=200_000,
+        DATASET_BORROWERS_AMOUNT=200_000,
+        DATASET_REVIEWS_AMOUNT=2_000_000,
+    ),
+    # Review heavy dataset for the leaderboard scenario
+    "reviews-10m": dict(
+        DATASET_BATCH_SIZE=100_000,
+        DATASET_AUTHORS_AMOUNT=100_000,
+        DATASET_BOOKS_AMOUNT=1_000_000,
+        DATASET_LOANS_AMOUNT=200_000,
+        DATASET_BORROWERS_AMOUNT=1_000_000,
+        DATASET_REVIEWS_AMOUNT=10_000_000,
+    ),
+    # Catalogue of millions of books for the search scenario
+    "catalogue-5m": dict(
+        DATASET_BATCH_SIZE=100_000,
+        DATASET_AUTHORS_AMOUNT=500_000,
+        DATASET_BOOKS_AMOUNT=5_000_000,
+        DATASET_LOANS_AMOUNT=200_000,
+        DATASET_BORROWERS_AMOUNT=1_000_000,
+        DATASET_REVIEWS_AMOUNT=5_000_000,
+    ),
+}
+
+TARGETS = {
+    "uvicorn": lambda: UvicornTarget(main.app),
+    "mangum": lambda: MangumTarget(main.handler),
+}
+
+
+class Sample(NamedTuple):
+    route: str
+    latency: float
+    ok: bool
+    statements: Optional[int]
+    items: int
+
+
+def seed_database(dataset: str, seed: int, workers: int, reset: bool):
+    env = dict(
+        os.environ, **{key: str(value) for key, value in DATASETS[dataset].items()}
+    )
+    if reset:
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "downgrade", "base"],
+            cwd=ROOT,
+            env=env,
+            check=True,
+        )
+    subprocess.run(
+        [
+            sys.executable,
+            "data/create_dataset.py",
+            "--mode",
+            "copy",
+            "--workers",
+            str(workers),
+            "--seed",
+            str(seed),
+        ],
+        cwd=ROOT,
+        env=env,
+        check=True,
+    )
+
+
+def id_ranges() -> IdRanges:
+    ranges = {}
+    with resources.get_configured_database().engine.connect() as connection:
+        for field, table in zip(
+            IdRanges._fields,
+            ("authors", "books", "borrowers", "library_cards", "loans"),
+        ):
+            low, high = connection.execute(
+                text(f"SELECT min(id), max(id) FROM {table}")
+            ).one()
+            ranges[field] = range(low, high + 1) if low is not None else range(0)
+    return IdRanges(**ranges)
+
+
+def run_client(target, workload: Workload, requests: int) -> List[Sample]:
+    samples = []
+    for _ in range(requests):
+        operation = workload.next_operation()
+        started = time.perf_counter()
+        result = target.request(operation)
+        latency = time.perf_counter() - started
+        workload.observe(operation, result.status_code, result.body)
+        samples.append(
+            Sample(
+                operation.route,
+                latency,
+                result.status_code in operation.expected,
+                result.statements,
+                operation.items,
+            )
+        )
+    return samples
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    # Nearest rank
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(samples: List[Sample]) -> dict:
+    latencies = sorted(sample.latency * 1000 for sample in samples)
+    statements = [
+        sample.statements for sample in samples if sample.statements is not None
+    ]
+    return {
+        "requests": len(samples),
+        "errors": sum(not sample.ok for sample in samples),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "queries_per_request": (
+            round(sum(statements) / len(statements), 3) if statements else None
+        ),
+    }
+
+
+def run_scenario(
+    target,
+    scenario: str,
+    ids: IdRanges,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    seed: int,
+) -> dict:
+    concurrency = min(concurrency, target.max_concurrency or concurrency)
+    workload_class = SCENARIOS[scenario]
+    warmup_workload = workload_class(ids, random.Random(f"{seed}:warmup"))
+    run_client(target, warmup_workload, warmup)
+
+    workloads = [
+        workload_class(ids, random.Random(f"{seed}:{scenario}:{client}"))
+        for client in range(concurrency)
+    ]
+    per_client = math.ceil(requests / concurrency)
+    started = time.perf_counter()
+    if concurrency == 1:
+        # Mangum handler runs its event loop on the calling (main) thread
+        samples = run_client(target, workloads[0], per_client)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = executor.map(
+                lambda workload: run_client(target, workload, per_client), workloads
+            )
+            samples = [
+                sample for client_samples in results for sample in client_samples
+            ]
+    elapsed = time.perf_counter() - started
+
+    for workload in [warmup_workload, *workloads]:
+        for operation in workload.cleanup():
+            target.request(operation)
+
+    routes = sorted({sample.route for sample in samples})
+    return {
+        **summarize(samples),
+        "concurrency": concurrency,
+        "throughput": round(len(samples) / elapsed, 1),
+        # Comparable across batch and single item scenarios
+        "item_throughput": round(sum(sample.items for sample in samples) / elapsed, 1),
+        "routes": {
+            route: summarize([sample for sample in samples if sample.route == route])
+            for route in routes
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Regressions of results against baseline. Query counts of a seeded run
+    are deterministic, so any increase is reported
+    """
+    regressions = []
+    for key, result in results["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        if result["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{key}: p99 {result['p99_ms']} ms, baseline {base['p99_ms']} ms"
+            )
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: throughput {result['throughput']} req/s, "
+                f"baseline {base['throughput']} req/s"
+            )
+        for route, route_result in result["routes"].items():
+            base_queries = base["routes"].get(route, {}).get("queries_per_request")
+            queries = route_result["queries_per_request"]
+            if base_queries is not None and queries is not None:
+                if queries > base_queries + 0.05:
+                    regressions.append(
+                        f"{key} {route}: {queries} queries per request, "
+                        f"baseline {base_queries}"
+                    )
+    return regressions
+
+
+def print_report(results: dict):
+    print(
+        f"{'target/scenario':28} {'req/s':>9} {'items/s':>9} {'p50 ms':>9} "
+        f"{'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'errors':>7}"
+    )
+    for key, result in results["results"].items():
+        print(
+            f"{key:28} {result['throughput']:9.1f} {result['item_throughput']:9.1f} "
+            f"{result['p50_ms']:9.2f} {result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+            f"{result['queries_per_request'] or 0:8.2f} {result['errors']:7}"
+        )
+        for route, route_result in result["routes"].items():
+            print(
+                f"  {route:48} {route_result['p50_ms']:9.2f} "
+                f"{route_result['p95_ms']:9.2f} {route_result['p99_ms']:9.2f} "
+                f"{route_result['queries_per_request'] or 0:8.2f} "
+                f"{route_result['errors']:7}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end API benchmarks")
+    parser.add_argument(
+        "--target", action="append", choices=tuple(TARGETS), help="Default: all"
+    )
+    parser.add_argument(
+        "--scenario", action="append", choices=tuple(SCENARIOS), help="Default: all"
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=1_000,
+        help="Measured requests per target and scenario",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Concurrent clients, the mangum target always runs one",
+    )
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--dataset",
+        choices=tuple(DATASETS),
+        default=None,
+        help="Seed a dataset of this size before benchmarking",
+    )
+    parser.add_argument(
+        "--seed-workers",
+        type=int,
+        default=4,
+        help="Processes used by data/create_dataset.py",
+    )
+    parser.add_argument(
+        "--reset-database",
+        action="store_true",
+        help="Drop all tables (alembic downgrade base) before seeding",
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed relative p99 and throughput regression",
+    )
+    args = parser.parse_args()
+
+    if args.dataset is not None:
+        seed_database(args.dataset, args.seed, args.seed_workers, args.reset_database)
+    ids = id_ranges()
+
+    results: Dict[str, dict] = {}
+    for target_name in args.target or TARGETS:
+        with TARGETS[target_name]() as target:
+            for scenario in args.scenario or SCENARIOS:
+                print(f"Running {scenario} against {target_name}", flush=True)
+                results[f"{target_name}/{scenario}"] = run_scenario(
+                    target,
+                    scenario,
+                    ids,
+                    args.requests,
+                    args.concurrency,
+                    args.warmup,
+                    args.seed,
+                )
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "dataset": args.dataset,
+            "seed": args.seed,
+            "requests": args.requests,
+            "use_async": settings.USE_ASYNC,
+            "pool_profile": settings.DATABASE_POOL_PROFILE,
+        },
+        "results": results,
+    }
+    print_report(report)
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline stored in {args.baseline}")
+    elif args.baseline.exists():
+        regressions = compare(
+            report, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
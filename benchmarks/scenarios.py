@@ -0,0 +1,434 @@
+import json
+import random
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+# Workloads generate the requests of one benchmark client. Each client owns a
+# seeded random generator so that a given seed replays the same request mix.
+
+
+class Operation(NamedTuple):
+    route: str
+    method: str
+    path: str
+    query: str = ""
+    body: Optional[dict] = None
+    expected: Tuple[int, ...] = (200,)
+    # Books, loans, ... handled by the operation, batch operations handle many
+    items: int = 1
+    headers: Optional[Dict[str, str]] = None
+
+
+class IdRanges(NamedTuple):
+    authors: Sequence[int]
+    books: Sequence[int]
+    borrowers: Sequence[int]
+    library_cards: Sequence[int]
+    loans: Sequence[int]
+
+
+class Workload:
+    """
+    Weighted mix of operations, weights are relative to each other
+    """
+
+    operations: List[Tuple[int, str]] = []
+
+    def __init__(self, ids: IdRanges, rng: random.Random):
+        self.ids = ids
+        self.rng = rng
+        self._methods: List[Callable[[], Operation]] = [
+            getattr(self, name) for _, name in self.operations
+        ]
+        self._weights = [weight for weight, _ in self.operations]
+
+    def next_operation(self) -> Operation:
+        return self.rng.choices(self._methods, weights=self._weights)[0]()
+
+    def observe(self, operation: Operation, status_code: int, body: bytes):
+        """
+        Called with the response of every operation of this workload
+        """
+
+    def cleanup(self) -> List[Operation]:
+        """
+        Operations undoing the writes of this workload, run after measuring
+        """
+        return []
+
+    def _pick(self, ids: Sequence[int]) -> int:
+        return self.rng.choice(ids) if ids else 1
+
+    def _pick_many(self, ids: Sequence[int], amount: int) -> str:
+        return ",".join(str(self._pick(ids)) for _ in range(amount))
+
+    def get_author(self) -> Operation:
+        return Operation(
+            "GET /authors/{author_id}",
+            "GET",
+            f"/authors/{self._pick(self.ids.authors)}",
+            expected=(200, 404),
+        )
+
+    def get_authors(self) -> Operation:
+        return Operation(
+            "GET /authors",
+            "GET",
+            "/authors",
+            f"ids={self._pick_many(self.ids.authors, 10)}",
+        )
+
+    def batch_get_authors(self) -> Operation:
+        return Operation(
+            "POST /authors:batchGet",
+            "POST",
+            "/authors:batchGet",
+            body={"ids": [self._pick(self.ids.authors) for _ in range(10)]},
+        )
+
+    def get_book(self) -> Operation:
+        return Operation(
+            "GET /books/{book_id}",
+            "GET",
+            f"/books/{self._pick(self.ids.books)}",
+            expected=(200, 404),
+        )
+
+    def get_books(self) -> Operation:
+        return Operation(
+            "GET /books",
+            "GET",
+            "/books",
+            f"ids={self._pick_many(self.ids.books, 10)}",
+        )
+
+    def batch_get_books(self) -> Operation:
+        return Operation(
+            "POST /books:batchGet",
+            "POST",
+            "/books:batchGet",
+            body={"ids": [self._pick(self.ids.books) for _ in range(10)]},
+        )
+
+    def get_available_books(self) -> Operation:
+        return Operation(
+            "GET /books/available/",
+            "GET",
+            "/books/available/",
+            f"after={self._pick(self.ids.books)}&limit=20",
+        )
+
+    def get_top_books(self) -> Operation:
+        return Operation(
+            "GET /books/top",
+            "GET",
+            "/books/top",
+            f"by={self.rng.choice(('rating', 'reviews'))}&limit=20",
+        )
+
+    def get_borrower(self) -> Operation:
+        return Operation(
+            "GET /borrowers/{borrower_id}",
+            "GET",
+            f"/borrowers/{self._pick(self.ids.borrowers)}",
+            expected=(200, 404),
+        )
+
+    def get_borrowers(self) -> Operation:
+        return Operation(
+            "GET /borrowers",
+            "GET",
+            "/borrowers",
+            f"ids={self._pick_many(self.ids.borrowers, 10)}",
+        )
+
+    def batch_get_borrowers(self) -> Operation:
+        return Operation(
+            "POST /borrowers:batchGet",
+            "POST",
+            "/borrowers:batchGet",
+            body={"ids": [self._pick(self.ids.borrowers) for _ in range(10)]},
+        )
+
+    def get_library_card(self) -> Operation:
+        return Operation(
+            "GET /library-cards/{library_card_id}",
+            "GET",
+            f"/library-cards/{self._pick(self.ids.library_cards)}",
+            expected=(200, 404),
+        )
+
+    def get_loan(self) -> Operation:
+        return Operation(
+            "GET /loans/{loan_id}",
+            "GET",
+            f"/loans/{self._pick(self.ids.loans)}",
+            expected=(200, 404),
+        )
+
+    def list_loans(self) -> Operation:
+        return Operation(
+            "GET /loans",
+            "GET",
+            "/loans",
+            f"library_card_id={self._pick(self.ids.library_cards)}&limit=20",
+        )
+
+    def create_loan(self) -> Operation:
+        return Operation(
+            "POST /books/{book_id}/loan",
+            "POST",
+            f"/books/{self._pick(self.ids.books)}/loan",
+            body={"library_card_id": self._pick(self.ids.library_cards)},
+            expected=(201, 409),
+        )
+
+    def create_review(self) -> Operation:
+        return Operation(
+            "POST /books/{book_id}/reviews",
+            "POST",
+            f"/books/{self._pick(self.ids.books)}/reviews",
+            body={
+                "borrower_id": self._pick(self.ids.borrowers),
+                "rating": self.rng.randint(1, 5),
+                "comment": "Benchmark review",
+            },
+            # 202 when reviews are written behind
+            expected=(201, 202),
+        )
+
+
+class Browse(Workload):
+    """
+    Read heavy catalogue browsing
+    """
+
+    operations = [
+        (25, "get_book"),
+        (15, "get_available_books"),
+        (10, "get_author"),
+        (10, "get_borrower"),
+        (10, "get_library_card"),
+        (10, "list_loans"),
+        (5, "get_loan"),
+        (3, "get_books"),
+        (3, "get_authors"),
+        (3, "get_borrowers"),
+        (2, "batch_get_books"),
+        (2, "batch_get_authors"),
+        (2, "batch_get_borrowers"),
+    ]
+
+
+class LoanChurn(Workload):
+    """
+    Books are loaned and returned, loans still open at the end are returned
+    during cleanup
+    """
+
+    operations = [
+        (45, "create_loan"),
+        (45, "return_loan"),
+        (10, "get_book"),
+    ]
+
+    def __init__(self, ids: IdRanges, rng: random.Random):
+        super().__init__(ids, rng)
+        self.open_loans: List[int] = []
+
+    def return_loan(self) -> Operation:
+        if not self.open_loans:
+            return self.create_loan()
+        loan_id = self.open_loans.pop(self.rng.randrange(len(self.open_loans)))
+        return Operation(
+            "DELETE /loans/{loan_id}",
+            "DELETE",
+            f"/loans/{loan_id}",
+            expected=(204,),
+        )
+
+    def observe(self, operation: Operation, status_code: int, body: bytes):
+        if operation.route == "POST /books/{book_id}/loan" and status_code == 201:
+            self.open_loans.append(json.loads(body)["id"])
+
+    def cleanup(self) -> List[Operation]:
+        return [self.return_loan() for _ in range(len(self.open_loans))]
+
+
+class ReviewBurst(Workload):
+    """
+    Bursts of reviews on a small set of popular books, read back right after
+    """
+
+    operations = [
+        (60, "create_review"),
+        (40, "get_book"),
+    ]
+
+    def __init__(self, ids: IdRanges, rng: random.Random):
+        super().__init__(ids, rng)
+        hot_books = [self._pick(ids.books) for _ in range(10)]
+        self.ids = ids._replace(books=hot_books)
+
+
+class Availability(LoanChurn):
+    """
+    Paging through available books while loans change their availability
+    """
+
+    operations = [
+        (80, "get_available_books"),
+        (10, "create_loan"),
+        (10, "return_loan"),
+    ]
+
+
+class Leaderboard(Workload):
+    """
+    Homepage rankings read while reviews keep changing them
+    """
+
+    operations = [
+        (70, "get_top_books"),
+        (30, "create_review"),
+    ]
+
+
+class CirculationLoop(LoanChurn):
+    """
+    A stack of books checked out to one library card and returned again,
+    one request per book
+    """
+
+    stack_size = 10
+
+    def __init__(self, ids: IdRanges, rng: random.Random):
+        super().__init__(ids, rng)
+        self.library_card_id = self._pick(ids.library_cards)
+        self._pending: List[Operation] = []
+
+    def next_operation(self) -> Operation:
+        if not self._pending:
+            if self.open_loans:
+                self._pending = [self.return_loan() for _ in self.open_loans[:]]
+            else:
+                self._pending = [
+                    self._checkout(self._pick(self.ids.books))
+                    for _ in range(self.stack_size)
+                ]
+        return self._pending.pop(0)
+
+    def _checkout(self, book_id: int) -> Operation:
+        return Operation(
+            "POST /books/{book_id}/loan",
+            "POST",
+            f"/books/{book_id}/loan",
+            body={"library_card_id": self.library_card_id},
+            expected=(201, 409),
+        )
+
+
+class CirculationBatch(Workload):
+    """
+    Batch counterpart of CirculationLoop, the stack is checked out and
+    returned with one request each
+    """
+
+    stack_size = CirculationLoop.stack_size
+
+    def __init__(self, ids: IdRanges, rng: random.Random):
+        super().__init__(ids, rng)
+        self.library_card_id = self._pick(ids.library_cards)
+        self.loaned_books: List[int] = []
+
+    def next_operation(self) -> Operation:
+        if self.loaned_books:
+            return self._batch("batchDelete", self.loaned_books)
+        return self._batch(
+            "batchCreate",
+            [self._pick(self.ids.books) for _ in range(self.stack_size)],
+        )
+
+    def observe(self, operation: Operation, status_code: int, body: bytes):
+        if status_code != 200:
+            return
+        if operation.route == "POST /loans:batchCreate":
+            self.loaned_books = [
+                item["book_id"]
+                for item in json.loads(body)
+                if item["status_code"] == 201
+            ]
+        else:
+            self.loaned_books = []
+
+    def cleanup(self) -> List[Operation]:
+        if not self.loaned_books:
+            return []
+        return [self._batch("batchDelete", self.loaned_books)]
+
+    def _batch(self, method: str, book_ids: List[int]) -> Operation:
+        return Operation(
+            f"POST /loans:{method}",
+            "POST",
+            f"/loans:{method}",
+            body={"library_card_id": self.library_card_id, "book_ids": book_ids},
+            items=len(book_ids),
+        )
+
+
+class Search(Workload):
+    """
+    Catalogue search with terms taken from the titles and author names of
+    books and authors browsed before, some of them misspelled
+    """
+
+    operations = [
+        (80, "search"),
+        (10, "get_book"),
+        (10, "get_author"),
+    ]
+
+    def __init__(self, ids: IdRanges, rng: random.Random):
+        super().__init__(ids, rng)
+        self.terms: List[str] = []
+        self.query = ""
+        self.next_cursor: Optional[str] = None
+
+    def search(self) -> Operation:
+        if not self.terms:
+            return self.get_book()
+        if self.next_cursor is not None and self.rng.random() < 0.2:
+            query = f"q={self.query}&after={self.next_cursor}"
+        else:
+            self.query = "+".join(self.rng.sample(self.terms, self.rng.randint(1, 2)))
+            if self.rng.random() < 0.1:
+                # Drop a letter, only the trigram index can match the typo
+                position = self.rng.randrange(1, len(self.query))
+                self.query = self.query[:position] + self.query[position + 1 :]
+            query = f"q={self.query}"
+        return Operation("GET /search", "GET", "/search", f"{query}&limit=20")
+
+    def observe(self, operation: Operation, status_code: int, body: bytes):
+        if status_code != 200:
+            return
+        if operation.route == "GET /search":
+            self.next_cursor = None
+            results = json.loads(body)
+            if len(results) == 20:
+                last = results[-1]
+                self.next_cursor = f"{round(last['rank'], 6)}_{last['id']}"
+        elif operation.route == "GET /books/{book_id}":
+            self.terms.extend(json.loads(body)["title"].lower().split())
+        elif operation.route == "GET /authors/{author_id}":
+            self.terms.append(json.loads(body)["last_name"].lower())
+
+
+SCENARIOS: Dict[str, Type[Workload]] = {
+    "browse": Browse,
+    "loan-churn": LoanChurn,
+    "review-burst": ReviewBurst,
+    "availability": Availability,
+    "leaderboard": Leaderboard,
+    "circulation-loop": CirculationLoop,
+    "circulation-batch": CirculationBatch,
+    "search": Search,
+}
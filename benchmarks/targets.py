@@ -0,0 +1,149 @@
+import base64
+import json
+import re
+import socket
+import threading
+import time
+import uuid
+from typing import Mapping, NamedTuple, Optional
+
+import httpx
+import uvicorn
+
+from scenarios import Operation
+
+_STATEMENTS = re.compile(r'desc="(\d+) statements')
+
+
+class Result(NamedTuple):
+    status_code: int
+    body: bytes
+    statements: Optional[int]
+
+
+def _statements(headers: Mapping[str, str]) -> Optional[int]:
+    # Statement count reported by SQLInstrumentationMiddleware
+    match = _STATEMENTS.search(headers.get("server-timing", ""))
+    return int(match.group(1)) if match else None
+
+
+class UvicornTarget:
+    """
+    The ASGI app served by uvicorn in a background thread of this process,
+    called over loopback HTTP
+    """
+
+    name = "uvicorn"
+    max_concurrency: Optional[int] = None
+
+    def __init__(self, app):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.server = uvicorn.Server(
+            uvicorn.Config(
+                app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+            )
+        )
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+        self._clients = threading.local()
+
+    def __enter__(self):
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self._thread.join()
+
+    def request(self, operation: Operation) -> Result:
+        client = getattr(self._clients, "client", None)
+        if client is None:
+            client = self._clients.client = httpx.Client(base_url=self.base_url)
+        try:
+            response = client.request(
+                operation.method,
+                operation.path,
+                params=operation.query or None,
+                json=operation.body,
+                headers=operation.headers,
+            )
+        except httpx.TransportError:
+            # Connection dropped by the server, e.g. after an unhandled error
+            return Result(0, b"", None)
+        return Result(
+            response.status_code, response.content, _statements(response.headers)
+        )
+
+
+class MangumTarget:
+    """
+    The Lambda handler invoked directly with synthetic API Gateway HTTP API
+    (payload format 2.0) events. A Lambda container serves one request at a
+    time, so the handler is never called concurrently
+    """
+
+    name = "mangum"
+    max_concurrency = 1
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def request(self, operation: Operation) -> Result:
+        response = self.handler(self.event(operation), None)
+        body = response.get("body") or ""
+        if response.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+        else:
+            body = body.encode()
+        headers = {key.lower(): value for key, value in response["headers"].items()}
+        return Result(response["statusCode"], body, _statements(headers))
+
+    @staticmethod
+    def event(operation: Operation) -> dict:
+        now = time.time()
+        return {
+            "version": "2.0",
+            "routeKey": "$default",
+            "rawPath": operation.path,
+            "rawQueryString": operation.query,
+            "headers": {
+                "accept": "application/json",
+                "content-type": "application/json",
+                "host": "localhost",
+                "user-agent": "benchmark",
+                **{
+                    key.lower(): value
+                    for key, value in (operation.headers or {}).items()
+                },
+            },
+            "requestContext": {
+                "accountId": "000000000000",
+                "apiId": "benchmark",
+                "domainName": "localhost",
+                "domainPrefix": "localhost",
+                "http": {
+                    "method": operation.method,
+                    "path": operation.path,
+                    "protocol": "HTTP/1.1",
+                    "sourceIp": "127.0.0.1",
+                    "userAgent": "benchmark",
+                },
+                "requestId": str(uuid.uuid4()),
+                "routeKey": "$default",
+                "stage": "$default",
+                "time": time.strftime("%d/%b/%Y:%H:%M:%S +0000", time.gmtime(now)),
+                "timeEpoch": int(now * 1000),
+            },
+            "body": json.dumps(operation.body) if operation.body is not None else None,
+            "isBase64Encoded": False,
+        }
@@ -5,23 +5,56 @@ from pathlib import Path
 # Add my_awesome_api to sys.path
 sys.path.append(str(Path(__file__).resolve().parent.parent / "my_awesome_api"))
 
+import argparse
 import asyncio
+import csv
+import io
 import logging
+import math
 import random
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import List
-
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import coolname
+import numpy as np
+from alembic import command
+from alembic.config import Config
 from coolname import generate as generate_random_title
 from names_generator import generate_name
 
-import my_awesome_api.models.sqlalchemy as sql
+import models.sqlalchemy as sql
 from my_awesome_api.database import SQLDatabase
-from my_awesome_api.models.sqlalchemy import Base
 from my_awesome_api.resources import get_database, get_secret_cache
+from leaderboard import refresh_view
+from reconciliation import reconcile_books
+from sqlalchemy import Table, create_engine, func, select, text
+from sqlalchemy.pool import NullPool
 
 # logging.basicConfig()
 # logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
 
+LOREM_IPSUM = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua."
+
+# Column order of the plain tuples produced by bulk row generators
+AUTHOR_COLUMNS = ("id", "first_name", "last_name", "biography")
+BOOK_COLUMNS = ("id", "title", "published_date")
+BOOK_AUTHOR_COLUMNS = ("book_id", "author_id")
+BORROWER_COLUMNS = ("id", "first_name", "last_name", "email")
+LIBRARY_CARD_COLUMNS = ("id", "issue_date", "borrower_id")
+LOAN_COLUMNS = ("id", "book_id", "library_card_id", "loan_date")
+REVIEW_COLUMNS = ("id", "book_id", "borrower_id", "rating", "comment", "review_date")
+
+# Bulk generators pick names and titles from pools instead of calling the
+# name generators once per row
+NAME_POOL_SIZE = 10_000
+TITLE_POOL_SIZE = 100_000
+COMMENT_POOL_SIZE = 100_000
+BATCH_PHASES = ("authors", "parents", "children")
+
 
 def count_batcher(count: int, subtract: int) -> int:
     while count > 0:
@@ -34,11 +67,13 @@ def count_batcher(count: int, subtract: int) -> int:
         count -= subtract
 
 
-def generate_random_date(start_year: int, end_year: int) -> datetime:
+def generate_random_date(
+    start_year: int, end_year: int, rng: random.Random = random
+) -> datetime:
     start_date = datetime(start_year, 1, 1)
     end_date = datetime(end_year, 12, 31)
     delta_days = (end_date - start_date).days
-    random_days = random.randint(0, delta_days)
+    random_days = rng.randint(0, delta_days)
     random_date = start_date + timedelta(days=random_days)
     return random_date
 
@@ -134,7 +169,7 @@ def serialize_authors(session, authors_amount: int, total_authors: int):
         author = sql.Author(
             first_name=first_name,
             last_name=last_name,
-            biography="Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.",
+            biography=LOREM_IPSUM,
         )
         authors.append(author)
         index += 1
@@ -208,13 +243,9 @@ def serialize_loans(
         )
 
     books_to_use = books[start_index:end_index]
-    available_books = books_to_use.copy()  # Create a copy for manipulation
 
-    for _ in range(len(books_to_use)):
-        selected_book = random.choice(available_books)
-        available_books.remove(
-            selected_book
-        )  # Remove the selected book from available_books
+    # Shuffle once instead of removing picked books from a list one by one
+    for selected_book in random.sample(books_to_use, len(books_to_use)):
         selected_borrower = random.choice(borrowers)
         loan_date = generate_random_date(1990, 2024)
         loan = sql.Loan(
@@ -256,7 +287,7 @@ def serialize_reviews(
     for _ in range(len(books_to_use)):
         selected_book = random.choice(books_to_use)
         selected_borrower = random.choice(borrowers_to_use)
-        comment = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua."
+        comment = LOREM_IPSUM
         rating = random.randint(1, 5)
         review_date = generate_random_date(1990, 2024)
         review = sql.Review(
@@ -273,7 +304,536 @@ def serialize_reviews(
     return reviews
 
 
+class ThroughputReport:
+    """
+    Rows written and seconds spent writing them per table
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, int] = defaultdict(int)
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    def record(self, table_name: str, rows: int, seconds: float):
+        self.rows[table_name] += rows
+        self.seconds[table_name] += seconds
+
+    def merge(self, other: "ThroughputReport"):
+        for table_name in other.rows:
+            self.record(table_name, other.rows[table_name], other.seconds[table_name])
+
+    def summary(self) -> str:
+        lines = []
+        for table_name, rows in self.rows.items():
+            seconds = self.seconds[table_name]
+            rate = rows / seconds if seconds else float("inf")
+            lines.append(
+                f"{table_name:<14} {rows:>12} rows {seconds:>10.2f} s {rate:>14.0f} rows/s"
+            )
+        return "\n".join(lines)
+
+
+def write_rows(
+    connection,
+    table: Table,
+    columns: Sequence[str],
+    rows: List[Tuple],
+    *,
+    use_copy: bool = True,
+    report: ThroughputReport = None,
+):
+    """
+    Write plain tuples into given table either streaming them through
+    COPY FROM STDIN or with a Core executemany INSERT (insertmanyvalues)
+    """
+    if not rows:
+        return
+    started = time.perf_counter()
+    if use_copy:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    else:
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+    if report is not None:
+        report.record(table.name, len(rows), time.perf_counter() - started)
+
+
+def next_ids(connection) -> Dict[str, int]:
+    """
+    First free primary key per table, ids for bulk rows are allocated from here
+    so that foreign keys can be filled in without flush round trips
+    """
+    tables = (sql.Author, sql.Book, sql.Borrower, sql.LibraryCard, sql.Loan, sql.Review)
+    return {
+        model.__tablename__: connection.scalar(
+            select(func.coalesce(func.max(model.id), 0))
+        )
+        + 1
+        for model in tables
+    }
+
+
+def reset_sequences(connection):
+    """
+    Move id sequences past explicitly written ids
+    """
+    for model in (
+        sql.Author,
+        sql.Book,
+        sql.Borrower,
+        sql.LibraryCard,
+        sql.Loan,
+        sql.Review,
+    ):
+        connection.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), "
+                f"(SELECT coalesce(max(id), 0) + 1 FROM {model.__tablename__}), false)"
+            )
+        )
+
+
+class BatchPlan(NamedTuple):
+    """
+    Deterministic id ranges of one bulk batch. Ranges are computed up front so
+    that batches can be generated in any process and still reference rows of
+    other batches by id
+    """
+
+    index: int
+    borrower_ids: range
+    library_card_ids: range
+    book_ids: range
+    loan_ids: range
+    review_ids: range
+    reviewable_book_ids: range
+    borrowers_total: int
+
+
+def plan_batches(
+    ids: Dict[str, int],
+    *,
+    batch_size: int,
+    books_amount: int,
+    loans_amount: int,
+    borrowers_amount: int,
+    reviews_amount: int,
+) -> List[BatchPlan]:
+    def take(table_name: str, offset: int, amount: int) -> range:
+        return range(ids[table_name] + offset, ids[table_name] + offset + amount)
+
+    plans: List[BatchPlan] = []
+    total_borrowers = total_books = total_loans = total_reviews = 0
+    # Datasets with more reviews than borrowers spread the reviews over batches
+    batches_amount = math.ceil(borrowers_amount / batch_size)
+    reviews_per_batch = max(batch_size, math.ceil(reviews_amount / batches_amount))
+    for index, batch in enumerate(count_batcher(borrowers_amount, batch_size)):
+        books_to_create = min(batch, books_amount - total_books)
+        loans_to_create = min(batch, loans_amount - total_loans, books_to_create)
+        # Reviews may target any book created so far
+        reviewable_books = total_books + books_to_create
+        reviews_to_create = min(
+            max(batch, reviews_per_batch), reviews_amount - total_reviews
+        )
+        if not reviewable_books:
+            reviews_to_create = 0
+        plans.append(
+            BatchPlan(
+                index=index,
+                borrower_ids=take("borrowers", total_borrowers, batch),
+                library_card_ids=take("library_cards", total_borrowers, batch),
+                book_ids=take("books", total_books, books_to_create),
+                loan_ids=take("loans", total_loans, loans_to_create),
+                review_ids=take("reviews", total_reviews, reviews_to_create),
+                reviewable_book_ids=take("books", 0, reviewable_books),
+                borrowers_total=ids["borrowers"] + borrowers_amount,
+            )
+        )
+        total_borrowers += batch
+        total_books += books_to_create
+        total_loans += loans_to_create
+        total_reviews += reviews_to_create
+    return plans
+
+
+class Pools(NamedTuple):
+    """
+    Pre-generated names and titles that vectorized row generators pick from
+    """
+
+    first_names: np.ndarray
+    last_names: np.ndarray
+    titles: np.ndarray
+    comments: np.ndarray
+
+
+def generate_pools(
+    seed: int,
+    *,
+    names_amount: int = NAME_POOL_SIZE,
+    titles_amount: int = TITLE_POOL_SIZE,
+    comments_amount: int = COMMENT_POOL_SIZE,
+) -> Pools:
+    rng = random.Random(seed)
+    names = [
+        generate_name(style="capital", seed=rng.getrandbits(64)).split()
+        for _ in range(names_amount)
+    ]
+    coolname.replace_random(random.Random(rng.getrandbits(64)))
+    titles = [" ".join(generate_random_title()) for _ in range(titles_amount)]
+    # Review comments draw from the title vocabulary so that searching reviews
+    # matches a realistic share of them instead of all or none
+    comments = [
+        f"{' '.join(generate_random_title()).capitalize()}, "
+        f"{' '.join(generate_random_title(4))}."
+        for _ in range(comments_amount)
+    ]
+    return Pools(
+        first_names=np.array([first_name for first_name, _ in names]),
+        last_names=np.array([last_name for _, last_name in names]),
+        titles=np.array(titles),
+        comments=np.array(comments),
+    )
+
+
+def batch_random(seed: int, index: int, phase: str) -> np.random.Generator:
+    """
+    Random generator of given batch and phase, independent of which worker
+    process generates the batch
+    """
+    return np.random.default_rng([seed, index + 1, BATCH_PHASES.index(phase)])
+
+
+def generate_random_dates(
+    rng: np.random.Generator, start_year: int, end_year: int, amount: int
+) -> np.ndarray:
+    start_date = np.datetime64(f"{start_year}-01-01")
+    delta_days = (np.datetime64(f"{end_year}-12-31") - start_date).astype(int)
+    return start_date + rng.integers(0, delta_days, size=amount, endpoint=True)
+
+
+def generate_author_rows(
+    ids: range, pools: Pools, rng: np.random.Generator
+) -> List[Tuple]:
+    names = rng.integers(0, len(pools.first_names), size=len(ids))
+    return list(
+        zip(
+            ids,
+            pools.first_names[names].tolist(),
+            pools.last_names[names].tolist(),
+            repeat(LOREM_IPSUM),
+        )
+    )
+
+
+def generate_book_rows(
+    ids: range, author_ids: range, pools: Pools, rng: np.random.Generator
+) -> Tuple[List[Tuple], List[Tuple]]:
+    amount = len(ids)
+    book_ids = np.arange(ids.start, ids.stop)
+    titles = pools.titles[rng.integers(0, len(pools.titles), size=amount)]
+    dates = generate_random_dates(rng, 1800, 2024, amount)
+
+    # 1-3 distinct authors per book: a random first author followed by two
+    # distinct non-zero offsets from it, wrapping around the author id range
+    authors_amount = len(author_ids)
+    first = rng.integers(0, authors_amount, size=amount)
+    offset_1 = rng.integers(1, authors_amount, size=amount)
+    offset_2 = rng.integers(1, authors_amount - 1, size=amount)
+    offset_2 += offset_2 >= offset_1
+    author_matrix = (
+        np.stack([first, first + offset_1, first + offset_2], axis=1) % authors_amount
+        + author_ids.start
+    )
+    counts = rng.integers(1, 3, size=amount, endpoint=True)
+    selected = np.arange(3) < counts[:, None]
+
+    books = list(zip(ids, titles.tolist(), dates.astype(object)))
+    book_authors = list(
+        zip(
+            np.repeat(book_ids, counts).tolist(),
+            author_matrix[selected].tolist(),
+        )
+    )
+    return books, book_authors
+
+
+def generate_borrower_rows(
+    ids: range,
+    library_card_ids: range,
+    total_amount: int,
+    pools: Pools,
+    rng: np.random.Generator,
+) -> Tuple[List[Tuple], List[Tuple]]:
+    amount = len(ids)
+    names = rng.integers(0, len(pools.first_names), size=amount)
+    padded_ids = np.char.zfill(
+        np.arange(ids.start, ids.stop).astype(str), len(str(total_amount))
+    )
+    emails = np.char.add(np.char.add("borrower_", padded_ids), "@my_awesome_email.com")
+    issue_dates = generate_random_dates(rng, 1950, 2024, amount)
+
+    borrowers = list(
+        zip(
+            ids,
+            pools.first_names[names].tolist(),
+            pools.last_names[names].tolist(),
+            emails.tolist(),
+        )
+    )
+    library_cards = list(zip(library_card_ids, issue_dates.astype(object), ids))
+    return borrowers, library_cards
+
+
+def generate_loan_rows(
+    ids: range,
+    book_ids: range,
+    library_card_ids: range,
+    rng: np.random.Generator,
+) -> List[Tuple]:
+    amount = len(ids)
+    # Every book can be on loan only once
+    loaned_book_ids = rng.permutation(len(book_ids))[:amount] + book_ids.start
+    card_ids = (
+        rng.integers(0, len(library_card_ids), size=amount) + library_card_ids.start
+    )
+    loan_dates = generate_random_dates(rng, 1990, 2024, amount)
+    return list(
+        zip(
+            ids,
+            loaned_book_ids.tolist(),
+            card_ids.tolist(),
+            loan_dates.astype(object),
+        )
+    )
+
+
+def generate_review_rows(
+    ids: range,
+    book_ids: range,
+    borrower_ids: range,
+    pools: Pools,
+    rng: np.random.Generator,
+) -> List[Tuple]:
+    amount = len(ids)
+    reviewed_book_ids = rng.integers(0, len(book_ids), size=amount) + book_ids.start
+    reviewer_ids = rng.integers(0, len(borrower_ids), size=amount) + borrower_ids.start
+    ratings = rng.integers(1, 5, size=amount, endpoint=True)
+    review_dates = generate_random_dates(rng, 1990, 2024, amount)
+    comments = pools.comments[rng.integers(0, len(pools.comments), size=amount)]
+    return list(
+        zip(
+            ids,
+            reviewed_book_ids.tolist(),
+            reviewer_ids.tolist(),
+            ratings.tolist(),
+            comments.tolist(),
+            review_dates.astype(object),
+        )
+    )
+
+
+def write_parent_rows(
+    connection,
+    plan: BatchPlan,
+    author_ids: range,
+    pools: Pools,
+    seed: int,
+    *,
+    use_copy: bool,
+    report: ThroughputReport,
+):
+    """
+    Borrowers, library cards, books and book authors of given batch
+    """
+    rng = batch_random(seed, plan.index, "parents")
+    borrowers, library_cards = generate_borrower_rows(
+        plan.borrower_ids, plan.library_card_ids, plan.borrowers_total, pools, rng
+    )
+    books, book_authors = generate_book_rows(plan.book_ids, author_ids, pools, rng)
+    for table, columns, rows in (
+        (sql.Borrower.__table__, BORROWER_COLUMNS, borrowers),
+        (sql.LibraryCard.__table__, LIBRARY_CARD_COLUMNS, library_cards),
+        (sql.Book.__table__, BOOK_COLUMNS, books),
+        (sql.book_author_table, BOOK_AUTHOR_COLUMNS, book_authors),
+    ):
+        write_rows(connection, table, columns, rows, use_copy=use_copy, report=report)
+
+
+def write_child_rows(
+    connection,
+    plan: BatchPlan,
+    pools: Pools,
+    seed: int,
+    *,
+    use_copy: bool,
+    report: ThroughputReport,
+):
+    """
+    Loans and reviews of given batch. Run only after every batch has written
+    its parent rows since reviews may reference books of other batches
+    """
+    rng = batch_random(seed, plan.index, "children")
+    loans = generate_loan_rows(plan.loan_ids, plan.book_ids, plan.library_card_ids, rng)
+    reviews = generate_review_rows(
+        plan.review_ids, plan.reviewable_book_ids, plan.borrower_ids, pools, rng
+    )
+    for table, columns, rows in (
+        (sql.Loan.__table__, LOAN_COLUMNS, loans),
+        (sql.Review.__table__, REVIEW_COLUMNS, reviews),
+    ):
+        write_rows(connection, table, columns, rows, use_copy=use_copy, report=report)
+
+
+def populate_shard(
+    database_url: str,
+    phase: str,
+    plans: List[BatchPlan],
+    author_ids: range,
+    pools: Pools,
+    seed: int,
+    use_copy: bool,
+) -> ThroughputReport:
+    """
+    Write given batches with an engine of its own, one transaction per batch.
+    Entry point of worker processes
+    """
+    report = ThroughputReport()
+    engine = create_engine(database_url, poolclass=NullPool)
+    try:
+        for plan in plans:
+            print(f"********* {phase.upper()} BATCH NO: {plan.index + 1} *********")
+            with engine.begin() as connection:
+                if phase == "parents":
+                    write_parent_rows(
+                        connection,
+                        plan,
+                        author_ids,
+                        pools,
+                        seed,
+                        use_copy=use_copy,
+                        report=report,
+                    )
+                else:
+                    write_child_rows(
+                        connection,
+                        plan,
+                        pools,
+                        seed,
+                        use_copy=use_copy,
+                        report=report,
+                    )
+    finally:
+        engine.dispose()
+    return report
+
+
+def bulk_populate_database(
+    database: SQLDatabase,
+    *,
+    batch_size: int = 1000,
+    authors_amount: int = 500,
+    books_amount: int = 5000,
+    loans_amount: int = 1000,
+    borrowers_amount: int = 10000,
+    reviews_amount: int = 1000,
+    use_copy: bool = True,
+    workers: int = 1,
+    seed: int = None,
+) -> ThroughputReport:
+    """
+    Bulk counterpart of populate_database. Rows are generated as plain tuples
+    with pre-allocated ids and written with COPY (or executemany INSERT),
+    bypassing ORM unit of work.
+    * workers > 1 splits the batches across a process pool. Every batch has its
+      own seeded random generator, so given seed produces the same dataset
+      regardless of the amount of workers
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    print(f"Bulk populating database with seed: {seed} and workers: {workers}")
+
+    report = ThroughputReport()
+    with database.engine.begin() as connection:
+        ids = next_ids(connection)
+
+    pools = generate_pools(seed)
+    author_ids = range(ids["authors"], ids["authors"] + authors_amount)
+    with database.engine.begin() as connection:
+        write_rows(
+            connection,
+            sql.Author.__table__,
+            AUTHOR_COLUMNS,
+            generate_author_rows(author_ids, pools, batch_random(seed, -1, "authors")),
+            use_copy=use_copy,
+            report=report,
+        )
+
+    plans = plan_batches(
+        ids,
+        batch_size=batch_size,
+        books_amount=books_amount,
+        loans_amount=loans_amount,
+        borrowers_amount=borrowers_amount,
+        reviews_amount=reviews_amount,
+    )
+    database_url = database.engine.url.render_as_string(hide_password=False)
+    # Parent rows of every batch are committed before any loan or review is
+    # written, so cross batch references always point at existing rows
+    for phase in ("parents", "children"):
+        if workers <= 1:
+            report.merge(
+                populate_shard(
+                    database_url, phase, plans, author_ids, pools, seed, use_copy
+                )
+            )
+            continue
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = [plans[worker::workers] for worker in range(workers)]
+            for shard_report in executor.map(
+                populate_shard,
+                repeat(database_url),
+                repeat(phase),
+                shards,
+                repeat(author_ids),
+                repeat(pools),
+                repeat(seed),
+                repeat(use_copy),
+            ):
+                report.merge(shard_report)
+
+    with database.engine.begin() as connection:
+        reset_sequences(connection)
+    return report
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate database with test data")
+    parser.add_argument(
+        "--mode",
+        choices=("orm", "copy", "insert"),
+        default="orm",
+        help="orm: ORM unit of work, copy: COPY FROM STDIN, insert: Core executemany",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Amount of processes generating and writing batches in bulk modes",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for reproducible datasets in bulk modes",
+    )
+    args = parser.parse_args()
+
     # When run locally we do not use aws secrets manager to fetch database secrets
     if os.getenv("ENV") == "local":
         aws_secret_cache = None
@@ -285,15 +845,32 @@ if __name__ == "__main__":
         )
     # When populating the database from local machine do not use AWS RDS Proxy
     db: SQLDatabase = get_database(use_proxy=False, use_secret_cache=aws_secret_cache)
-    Base.metadata.create_all(db.engine)
-    asyncio.run(
-        populate_database(
+    # Schema is owned by the migrations in migrations/
+    command.upgrade(
+        Config(str(Path(__file__).resolve().parent.parent / "alembic.ini")), "head"
+    )
+    dataset_sizes = dict(
+        batch_size=int(os.getenv("DATASET_BATCH_SIZE")),
+        authors_amount=int(os.getenv("DATASET_AUTHORS_AMOUNT")),
+        books_amount=int(os.getenv("DATASET_BOOKS_AMOUNT")),
+        loans_amount=int(os.getenv("DATASET_LOANS_AMOUNT")),
+        borrowers_amount=int(os.getenv("DATASET_BORROWERS_AMOUNT")),
+        reviews_amount=int(os.getenv("DATASET_REVIEWS_AMOUNT")),
+    )
+    if args.mode == "orm":
+        asyncio.run(populate_database(db, **dataset_sizes))
+    else:
+        report = bulk_populate_database(
             db,
-            batch_size=int(os.getenv("DATASET_BATCH_SIZE")),
-            authors_amount=int(os.getenv("DATASET_AUTHORS_AMOUNT")),
-            books_amount=int(os.getenv("DATASET_BOOKS_AMOUNT")),
-            loans_amount=int(os.getenv("DATASET_LOANS_AMOUNT")),
-            borrowers_amount=int(os.getenv("DATASET_BORROWERS_AMOUNT")),
-            reviews_amount=int(os.getenv("DATASET_REVIEWS_AMOUNT")),
+            use_copy=args.mode == "copy",
+            workers=args.workers,
+            seed=args.seed,
+            **dataset_sizes,
         )
-    )
+        print(report.summary())
+
+    # Generated loans and reviews do not maintain the denormalized columns of books
+    result = reconcile_books(db.engine, batch_size=dataset_sizes["batch_size"])
+    print(f"Reconciled {len(result.drifted)} of {result.checked} books")
+    with db.engine.begin() as connection:
+        refresh_view(connection)
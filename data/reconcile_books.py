@@ -0,0 +1,48 @@
+import os
+import sys
+from pathlib import Path
+
+# Add my_awesome_api to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent / "my_awesome_api"))
+
+import argparse
+import time
+
+from reconciliation import reconcile_books
+from resources import get_database, get_secret_cache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Verify and repair availability and rating aggregates of books"
+    )
+    parser.add_argument(
+        "--verify-only",
+        action="store_true",
+        help="Only report drifted books, exits with 1 when any are found",
+    )
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    # When run locally we do not use aws secrets manager to fetch database secrets
+    if os.getenv("ENV") == "local":
+        aws_secret_cache = None
+    else:
+        aws_secret_cache = get_secret_cache(
+            region=os.getenv("MY_AWS_REGION"),
+            use_profile=os.getenv("MY_AWS_PROFILE", None),
+        )
+    db = get_database(use_proxy=False, use_secret_cache=aws_secret_cache)
+
+    started = time.perf_counter()
+    result = reconcile_books(
+        db.engine, batch_size=args.batch_size, repair=not args.verify_only
+    )
+    action = "found" if args.verify_only else "repaired"
+    print(
+        f"Checked {result.checked} books in {time.perf_counter() - started:.1f}s, "
+        f"{action} {len(result.drifted)} drifted"
+    )
+    if result.drifted:
+        print(f"Drifted book ids: {result.drifted[:100]}")
+    if args.verify_only and result.drifted:
+        sys.exit(1)
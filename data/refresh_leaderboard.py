@@ -0,0 +1,46 @@
+import os
+import sys
+from pathlib import Path
+
+# Add my_awesome_api to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent / "my_awesome_api"))
+
+import argparse
+import time
+
+from leaderboard import refresh_view
+from resources import get_database, get_secret_cache
+
+# Run on a schedule (e.g. cron or EventBridge), rankings served by the API
+# lag the reviews by at most the refresh interval plus LEADERBOARD_TTL
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Refresh the book_leaderboard materialized view"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="Keep refreshing every this many seconds instead of refreshing once",
+    )
+    args = parser.parse_args()
+
+    # When run locally we do not use aws secrets manager to fetch database secrets
+    if os.getenv("ENV") == "local":
+        aws_secret_cache = None
+    else:
+        aws_secret_cache = get_secret_cache(
+            region=os.getenv("MY_AWS_REGION"),
+            use_profile=os.getenv("MY_AWS_PROFILE", None),
+        )
+    db = get_database(use_proxy=False, use_secret_cache=aws_secret_cache)
+
+    while True:
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            refresh_view(connection)
+        print(f"Leaderboard refreshed in {time.perf_counter() - started:.2f}s")
+        if args.interval is None:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,55 @@
+import os
+import sys
+from logging.config import fileConfig
+from pathlib import Path
+
+from alembic import context
+
+# Add my_awesome_api to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent / "my_awesome_api"))
+
+from models.sqlalchemy import Base
+from resources import get_database, get_secret_cache
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """
+    Emit the migration SQL to stdout (alembic upgrade head --sql) without
+    connecting to the database
+    """
+    context.configure(
+        dialect_name="postgresql",
+        target_metadata=target_metadata,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # When run locally we do not use aws secrets manager to fetch database secrets
+    if os.getenv("ENV") == "local":
+        aws_secret_cache = None
+    else:
+        aws_secret_cache = get_secret_cache(
+            region=os.getenv("MY_AWS_REGION"),
+            use_profile=os.getenv("MY_AWS_PROFILE", None),
+        )
+    # Migrations are run from local machine, never through AWS RDS Proxy
+    db = get_database(use_proxy=False, use_secret_cache=aws_secret_cache)
+    with db.engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,97 @@
+"""Initial schema as created by Base.metadata.create_all
+
+Databases created before migrations were introduced already have this schema,
+mark them with "alembic stamp 0001" instead of upgrading.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-08-20 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "authors",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("first_name", sa.String(), nullable=False),
+        sa.Column("last_name", sa.String(), nullable=False),
+        sa.Column("biography", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "books",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("published_date", sa.Date(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_books_title", "books", ["title"])
+    op.create_table(
+        "borrowers",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("first_name", sa.String(), nullable=False),
+        sa.Column("last_name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_borrowers_email", "borrowers", ["email"])
+    op.create_table(
+        "book_author",
+        sa.Column("book_id", sa.Integer(), nullable=True),
+        sa.Column("author_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["author_id"], ["authors.id"]),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"]),
+    )
+    op.create_table(
+        "library_cards",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("issue_date", sa.Date(), nullable=True),
+        sa.Column("borrower_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["borrower_id"], ["borrowers.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "reviews",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("borrower_id", sa.Integer(), nullable=False),
+        sa.Column("rating", sa.Integer(), nullable=False),
+        sa.Column("comment", sa.Text(), nullable=True),
+        sa.Column("review_date", sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"]),
+        sa.ForeignKeyConstraint(["borrower_id"], ["borrowers.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "loans",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("library_card_id", sa.Integer(), nullable=False),
+        sa.Column("loan_date", sa.Date(), nullable=True),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"]),
+        sa.ForeignKeyConstraint(["library_card_id"], ["library_cards.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("book_id"),
+    )
+    op.create_index("ix_loans_id", "loans", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("loans")
+    op.drop_table("reviews")
+    op.drop_table("library_cards")
+    op.drop_table("book_author")
+    op.drop_table("borrowers")
+    op.drop_table("books")
+    op.drop_table("authors")
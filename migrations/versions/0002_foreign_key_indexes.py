@@ -0,0 +1,83 @@
+"""Index foreign keys and title prefixes, add composite primary key to book_author
+
+Indexes are built with CREATE INDEX CONCURRENTLY so that the tables stay
+writable while they are built. Concurrent builds cannot run inside a
+transaction, so they run in autocommit blocks. A failed concurrent build
+leaves an INVALID index behind, drop it before running the upgrade again.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-08-20 12:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns)
+FOREIGN_KEY_INDEXES = (
+    ("ix_book_author_author_id", "book_author", ["author_id"]),
+    ("ix_reviews_book_id", "reviews", ["book_id"]),
+    ("ix_reviews_borrower_id", "reviews", ["borrower_id"]),
+    ("ix_loans_library_card_id", "loans", ["library_card_id"]),
+    ("ix_library_cards_borrower_id", "library_cards", ["borrower_id"]),
+)
+
+# Databases created by create_all after the title prefix filter was added
+# already have this index
+TITLE_PREFIX_INDEX = "ix_books_title_prefix"
+
+
+def upgrade() -> None:
+    # Primary key columns must be unique and not null
+    op.execute("DELETE FROM book_author WHERE book_id IS NULL OR author_id IS NULL")
+    op.execute(
+        "DELETE FROM book_author a USING book_author b "
+        "WHERE a.ctid < b.ctid AND a.book_id = b.book_id "
+        "AND a.author_id = b.author_id"
+    )
+    op.alter_column("book_author", "book_id", nullable=False)
+    op.alter_column("book_author", "author_id", nullable=False)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "book_author_pkey",
+            "book_author",
+            ["book_id", "author_id"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        for name, table, columns in FOREIGN_KEY_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+        op.create_index(
+            TITLE_PREFIX_INDEX,
+            "books",
+            ["title"],
+            postgresql_ops={"title": "text_pattern_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    # Promoting the prebuilt unique index only takes a brief lock
+    op.execute(
+        "ALTER TABLE book_author "
+        "ADD CONSTRAINT book_author_pkey PRIMARY KEY USING INDEX book_author_pkey"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("book_author_pkey", "book_author", type_="primary")
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            TITLE_PREFIX_INDEX, table_name="books", postgresql_concurrently=True
+        )
+        for name, table, _ in reversed(FOREIGN_KEY_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    op.alter_column("book_author", "author_id", nullable=True)
+    op.alter_column("book_author", "book_id", nullable=True)
@@ -0,0 +1,69 @@
+"""Add denormalized availability and rating aggregates to books
+
+Columns are added with constant defaults, which does not rewrite the table,
+and backfilled from loans and reviews. From here on the routes writing loans
+and reviews maintain them, data/reconcile_books.py repairs any drift.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-08-27 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "books",
+        sa.Column(
+            "is_available", sa.Boolean(), server_default=sa.true(), nullable=False
+        ),
+    )
+    op.add_column(
+        "books",
+        sa.Column("review_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "books",
+        sa.Column("rating_sum", sa.Integer(), server_default="0", nullable=False),
+    )
+
+    op.execute(
+        "UPDATE books SET is_available = false "
+        "WHERE EXISTS (SELECT 1 FROM loans WHERE loans.book_id = books.id)"
+    )
+    op.execute(
+        "UPDATE books SET review_count = aggregates.review_count, "
+        "rating_sum = aggregates.rating_sum "
+        "FROM (SELECT book_id, count(*) AS review_count, sum(rating) AS rating_sum "
+        "FROM reviews GROUP BY book_id) AS aggregates "
+        "WHERE aggregates.book_id = books.id"
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_books_available",
+            "books",
+            ["id"],
+            postgresql_where=sa.text("is_available"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_books_available", table_name="books", postgresql_concurrently=True
+        )
+    op.drop_column("books", "rating_sum")
+    op.drop_column("books", "review_count")
+    op.drop_column("books", "is_available")
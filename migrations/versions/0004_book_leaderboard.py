@@ -0,0 +1,55 @@
+"""Add book_leaderboard materialized view
+
+Ranks reviewed books by review count and by Bayesian average rating. The
+average of a book is pulled towards the mean rating of all reviews by
+PRIOR_WEIGHT virtual reviews, so that books with a handful of reviews do not
+outrank books with hundreds. The view is read from the aggregates on books
+instead of the reviews table and is refreshed concurrently by
+data/refresh_leaderboard.py.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-09-03 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PRIOR_WEIGHT = 10
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE MATERIALIZED VIEW book_leaderboard AS "
+        "WITH prior AS ("
+        "SELECT coalesce(sum(rating_sum)::float / nullif(sum(review_count), 0), 0) "
+        "AS mean FROM books) "
+        "SELECT books.id AS book_id, books.review_count, books.rating_sum, "
+        f"(prior.mean * {PRIOR_WEIGHT} + books.rating_sum) "
+        f"/ ({PRIOR_WEIGHT} + books.review_count) AS bayesian_rating, "
+        f"prior.mean AS prior_mean, {PRIOR_WEIGHT} AS prior_weight "
+        "FROM books CROSS JOIN prior WHERE books.review_count > 0"
+    )
+    # REFRESH MATERIALIZED VIEW CONCURRENTLY requires a unique index
+    op.create_index(
+        "ix_book_leaderboard_book_id", "book_leaderboard", ["book_id"], unique=True
+    )
+    op.execute(
+        "CREATE INDEX ix_book_leaderboard_bayesian_rating "
+        "ON book_leaderboard (bayesian_rating DESC, book_id)"
+    )
+    op.execute(
+        "CREATE INDEX ix_book_leaderboard_review_count "
+        "ON book_leaderboard (review_count DESC, book_id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW book_leaderboard")
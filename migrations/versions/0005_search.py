@@ -0,0 +1,72 @@
+"""Add full-text search vectors and trigram index
+
+Books titles and review comments are indexed with the english configuration,
+author names with the simple one so that names are not stemmed. The vectors
+are stored generated columns, adding them rewrites books, authors and reviews
+while holding an ACCESS EXCLUSIVE lock, so run this migration in a maintenance
+window on large catalogues. GIN indexes are built concurrently afterwards.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-09-10 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTORS = {
+    "books": "to_tsvector('english', coalesce(title, ''))",
+    "authors": "to_tsvector('simple', first_name || ' ' || last_name)",
+    "reviews": "to_tsvector('english', coalesce(comment, ''))",
+}
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table_name, expression in SEARCH_VECTORS.items():
+        op.add_column(
+            table_name,
+            sa.Column("search_vector", TSVECTOR(), sa.Computed(expression)),
+        )
+
+    with op.get_context().autocommit_block():
+        for table_name in SEARCH_VECTORS:
+            op.create_index(
+                f"ix_{table_name}_search_vector",
+                table_name,
+                ["search_vector"],
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+            )
+        op.create_index(
+            "ix_books_title_trgm",
+            "books",
+            ["title"],
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_books_title_trgm", table_name="books", postgresql_concurrently=True
+        )
+        for table_name in SEARCH_VECTORS:
+            op.drop_index(
+                f"ix_{table_name}_search_vector",
+                table_name=table_name,
+                postgresql_concurrently=True,
+            )
+    for table_name in SEARCH_VECTORS:
+        op.drop_column(table_name, "search_vector")
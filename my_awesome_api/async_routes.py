@@ -0,0 +1,726 @@
+from datetime import date
+from typing import AsyncGenerator, List, Literal, Optional
+
+import cache as cache
+import consistency as consistency
+import etags as etags
+import fieldsets as fieldsets
+import leaderboard as leaderboard
+import models.loaders as loaders
+import models.request as request
+import models.serializers as serializers
+import models.response as response
+import models.sqlalchemy as sql
+import resources as resources
+import review_queue as review_queue
+import search as search
+import settings as settings
+from database import constraint_name
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from routes import (
+    AUTHOR_BY_ID,
+    BOOK_BY_ID,
+    BOOK_RESPONSE_BY_ID,
+    BORROWER_BY_ID,
+    BORROWER_RESPONSE_BY_ID,
+    LIBRARY_CARD_BY_ID,
+    LIBRARY_CARD_RESPONSE_BY_ID,
+    LOAN_BY_ID,
+    LOAN_FOREIGN_KEY_ERRORS,
+    REVIEW_FOREIGN_KEY_ERRORS,
+    NDJSON_MEDIA_TYPE,
+    batch_items,
+    checkout_statement,
+    loan_batch_invalidations,
+    loan_batch_items,
+    query_ids,
+    return_statement,
+    review_targets_statement,
+    set_availability,
+    validate_batch_ids,
+)
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Async counterparts of routes.router. Lazy loading is not available with
+# AsyncSession so every relationship is loaded through models.loaders options
+router = APIRouter()
+
+
+async def _get_batch(session: AsyncSession, entity, response_model, ids: List[int]):
+    entities = (
+        await session.scalars(
+            select(entity)
+            .options(*loaders.loader_options(response_model))
+            .where(entity.id.in_(set(ids)))
+        )
+    ).all()
+    return batch_items(response_model, entities, ids)
+
+
+@router.get("/authors", response_model=List[response.BatchItem[response.Author]])
+async def get_authors(
+    ids: List[int] = Depends(query_ids),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    return await _get_batch(session, sql.Author, response.Author, ids)
+
+
+@router.post(
+    "/authors:batchGet", response_model=List[response.BatchItem[response.Author]]
+)
+async def batch_get_authors(
+    batch: request.BatchGet,
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    return await _get_batch(
+        session, sql.Author, response.Author, validate_batch_ids(batch.ids)
+    )
+
+
+@router.get("/authors/{author_id}", response_model=response.Author)
+async def get_author(
+    author_id: int,
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.Author, sql.Author)
+    ),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_read_response_cache),
+):
+    if fieldset is not None:
+        author = (
+            await session.scalars(
+                AUTHOR_BY_ID.options(*fieldset.options()), {"id": author_id}
+            )
+        ).first()
+        if author is None:
+            raise HTTPException(status_code=404, detail="Author not found")
+        return fieldset.response(author)
+
+    cached = response_cache.cached_response(cache.author_key(author_id))
+    if cached is not None:
+        return cached
+    author = (await session.scalars(AUTHOR_BY_ID, {"id": author_id})).first()
+    if author is None:
+        raise HTTPException(status_code=404, detail="Author not found")
+    return response_cache.store_response(
+        cache.author_key(author_id), serializers.AUTHOR.dump(author)
+    )
+
+
+@router.get("/books", response_model=List[response.BatchItem[response.Book]])
+async def get_books(
+    ids: List[int] = Depends(query_ids),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    return await _get_batch(session, sql.Book, response.Book, ids)
+
+
+@router.post("/books:batchGet", response_model=List[response.BatchItem[response.Book]])
+async def batch_get_books(
+    batch: request.BatchGet,
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    return await _get_batch(
+        session, sql.Book, response.Book, validate_batch_ids(batch.ids)
+    )
+
+
+@router.get("/books/top", response_model=List[response.TopBook])
+async def get_top_books(
+    by: Literal["rating", "reviews"] = "rating",
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.LEADERBOARD_SIZE),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+    book_leaderboard: leaderboard.Leaderboard = Depends(resources.get_leaderboard),
+):
+    top_books = book_leaderboard.top(by, limit)
+    if top_books is None:
+        rows = await session.execute(
+            leaderboard.leaderboard_statement(by, book_leaderboard.size)
+        )
+        book_leaderboard.load(by, rows)
+        top_books = book_leaderboard.top(by, limit)
+    return serializers.TOP_BOOK.list_response(top_books)
+
+
+@router.get("/books/{book_id}", response_model=response.Book)
+async def get_book(
+    book_id: int,
+    if_none_match: Optional[str] = Header(None),
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.Book, sql.Book)
+    ),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    # Version is checked before anything else so that unchanged resources are
+    # answered without loading relationships or validating models
+    version = await session.scalar(etags.book_version(book_id))
+    if version is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    book_etag = etags.etag(version)
+    if etags.etag_matches(if_none_match, book_etag):
+        return etags.not_modified(book_etag)
+
+    if fieldset is not None:
+        # Sparse representations are not cached, they are cheap to build
+        book = (
+            await session.scalars(
+                BOOK_BY_ID.options(*fieldset.options()), {"id": book_id}
+            )
+        ).first()
+        if book is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return fieldset.response(book, headers={"ETag": book_etag})
+
+    # The body is loaded after the version, it is never older than the version
+    # it is cached under
+    cached = response_cache.cached_response(cache.book_key(book_id, version))
+    if cached is not None:
+        cached.headers["ETag"] = book_etag
+        return cached
+    book = (await session.scalars(BOOK_RESPONSE_BY_ID, {"id": book_id})).first()
+    if book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    book_response = response_cache.store_response(
+        cache.book_key(book_id, version), serializers.BOOK.dump(book)
+    )
+    book_response.headers["ETag"] = book_etag
+    return book_response
+
+
+@router.get("/books/available/", response_model=List[response.Book])
+async def get_available_books(
+    after: Optional[int] = Query(
+        None, description="Return books with id greater than this cursor"
+    ),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    title_prefix: Optional[str] = Query(None, min_length=1),
+    published_after: Optional[date] = None,
+    published_before: Optional[date] = None,
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    statement = (
+        select(sql.Book)
+        .options(*loaders.loader_options(response.Book))
+        .where(sql.Book.is_available)
+    )
+    if after is not None:
+        statement = statement.where(sql.Book.id > after)
+    if title_prefix is not None:
+        statement = statement.where(
+            sql.Book.title.startswith(title_prefix, autoescape=True)
+        )
+    if published_after is not None:
+        statement = statement.where(sql.Book.published_date >= published_after)
+    if published_before is not None:
+        statement = statement.where(sql.Book.published_date <= published_before)
+    available_books = (
+        await session.scalars(statement.order_by(sql.Book.id).limit(limit))
+    ).all()
+
+    headers = {}
+    if len(available_books) == limit:
+        headers["X-Next-Cursor"] = str(available_books[-1].id)
+    return serializers.BOOK.list_response(available_books, headers=headers)
+
+
+@router.get("/search", response_model=List[response.SearchResult])
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=256),
+    after: Optional[str] = Query(
+        None, description="Return results after this cursor of X-Next-Cursor"
+    ),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    try:
+        cursor = search.decode_cursor(after) if after is not None else None
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    results = (
+        await session.execute(
+            search.search_statement(q, limit, cursor, settings.SEARCH_MAX_CANDIDATES)
+        )
+    ).all()
+
+    headers = {}
+    if len(results) == limit:
+        headers["X-Next-Cursor"] = search.encode_cursor(
+            results[-1].rank, results[-1].id
+        )
+    return serializers.SEARCH_RESULT.list_response(results, headers=headers)
+
+
+@router.post(
+    "/books/{book_id}/loan",
+    response_model=response.Loan,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_loan(
+    book_id: int,
+    loan: request.Loan,
+    session: AsyncSession = Depends(resources.async_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    statement = (
+        insert(sql.Loan)
+        .values(
+            book_id=book_id,
+            library_card_id=loan.library_card_id,
+            loan_date=date.today(),
+        )
+        .on_conflict_do_nothing(index_elements=[sql.Loan.book_id])
+        .returning(sql.Loan)
+    )
+    try:
+        new_loan = (await session.scalars(statement)).one_or_none()
+    except IntegrityError as error:
+        detail = LOAN_FOREIGN_KEY_ERRORS.get(constraint_name(error))
+        if detail is None:
+            raise
+        raise HTTPException(status_code=404, detail=detail)
+
+    if new_loan is None:
+        # Foreign keys are not checked when the insert is skipped on conflict
+        library_card_id = await session.scalar(
+            select(sql.LibraryCard.id).where(sql.LibraryCard.id == loan.library_card_id)
+        )
+        if library_card_id is None:
+            raise HTTPException(status_code=404, detail="Library Card not found")
+        raise HTTPException(status_code=409, detail="Book is already on loan")
+    await session.execute(
+        update(sql.Book).where(sql.Book.id == book_id).values(is_available=False)
+    )
+
+    if response_cache.enabled:
+        borrower_id = await session.scalar(
+            select(sql.LibraryCard.borrower_id).where(
+                sql.LibraryCard.id == new_loan.library_card_id
+            )
+        )
+        cache.invalidate_on_commit(
+            session,
+            response_cache,
+            cache.borrower_key(borrower_id),
+        )
+    return serializers.LOAN.response(new_loan, status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/loans:batchCreate", response_model=List[response.LoanBatchItem])
+async def batch_create_loans(
+    batch: request.LoanBatch,
+    session: AsyncSession = Depends(resources.async_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    book_ids = validate_batch_ids(batch.book_ids)
+    try:
+        loans = (
+            (await session.execute(checkout_statement(batch.library_card_id, book_ids)))
+            .mappings()
+            .all()
+        )
+    except IntegrityError as error:
+        detail = LOAN_FOREIGN_KEY_ERRORS.get(constraint_name(error))
+        if detail is None:
+            raise
+        raise HTTPException(status_code=404, detail=detail)
+
+    if not loans:
+        # Foreign keys are not checked when every insert is skipped on conflict
+        library_card_id = await session.scalar(
+            select(sql.LibraryCard.id).where(
+                sql.LibraryCard.id == batch.library_card_id
+            )
+        )
+        if library_card_id is None:
+            raise HTTPException(status_code=404, detail="Library Card not found")
+
+    loaned = {loan["book_id"] for loan in loans}
+    failures = {}
+    if loaned != set(book_ids):
+        existing = set(
+            await session.scalars(
+                select(sql.Book.id).where(sql.Book.id.in_(set(book_ids) - loaned))
+            )
+        )
+        failures = {
+            book_id: (
+                (409, "Book is already on loan")
+                if book_id in existing
+                else (404, "Book not found")
+            )
+            for book_id in set(book_ids) - loaned
+        }
+    if loaned:
+        await session.execute(set_availability(loaned, False))
+
+    if response_cache.enabled and loans:
+        borrower_id = await session.scalar(
+            select(sql.LibraryCard.borrower_id).where(
+                sql.LibraryCard.id == batch.library_card_id
+            )
+        )
+        cache.invalidate_on_commit(
+            session,
+            response_cache,
+            *loan_batch_invalidations(borrower_id, loans),
+        )
+    return loan_batch_items(book_ids, loans, status.HTTP_201_CREATED, failures)
+
+
+@router.post("/loans:batchDelete", response_model=List[response.LoanBatchItem])
+async def batch_delete_loans(
+    batch: request.LoanBatch,
+    session: AsyncSession = Depends(resources.async_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    book_ids = validate_batch_ids(batch.book_ids)
+    loans = (
+        (await session.execute(return_statement(batch.library_card_id, book_ids)))
+        .mappings()
+        .all()
+    )
+    if loans:
+        await session.execute(
+            set_availability([loan["book_id"] for loan in loans], True)
+        )
+
+    if response_cache.enabled and loans:
+        borrower_id = await session.scalar(
+            select(sql.LibraryCard.borrower_id).where(
+                sql.LibraryCard.id == batch.library_card_id
+            )
+        )
+        cache.invalidate_on_commit(
+            session,
+            response_cache,
+            *loan_batch_invalidations(borrower_id, loans),
+        )
+    not_found = (status.HTTP_404_NOT_FOUND, "Loan not found")
+    return loan_batch_items(
+        book_ids,
+        loans,
+        status.HTTP_200_OK,
+        {book_id: not_found for book_id in book_ids},
+    )
+
+
+@router.post(
+    "/books/{book_id}/reviews",
+    response_model=response.Review,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": response.QueuedReview}},
+)
+async def create_review(
+    book_id: int,
+    review: request.Review,
+    session: AsyncSession = Depends(resources.async_database_session),
+    read_only_session: AsyncSession = Depends(
+        resources.async_read_only_database_session
+    ),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+    book_leaderboard: leaderboard.Leaderboard = Depends(resources.get_leaderboard),
+    review_writer: Optional[review_queue.ReviewWriter] = Depends(
+        resources.get_review_writer
+    ),
+):
+    if review_writer is not None:
+        # Write-behind: the review is inserted with the next batch of queued
+        # reviews, which also updates the rating aggregates and leaderboard
+        # Queued reviews are only written later, a review of an unknown book
+        # or borrower must be refused before it is accepted
+        targets = (
+            await read_only_session.execute(
+                review_targets_statement(book_id, review.borrower_id)
+            )
+        ).one_or_none()
+        if targets is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        if not targets.borrower:
+            raise HTTPException(status_code=404, detail="Borrower not found")
+        queued_review = review_writer.enqueue(
+            book_id, review.borrower_id, review.rating, review.comment
+        )
+        return serializers.QUEUED_REVIEW.response(
+            queued_review._asdict(), status_code=status.HTTP_202_ACCEPTED
+        )
+
+    reviewed_book = (
+        await session.execute(
+            update(sql.Book)
+            .where(sql.Book.id == book_id)
+            .values(
+                review_count=sql.Book.review_count + 1,
+                rating_sum=sql.Book.rating_sum + review.rating,
+            )
+            .returning(
+                sql.Book.id, sql.Book.title, sql.Book.review_count, sql.Book.rating_sum
+            )
+        )
+    ).one_or_none()
+    if reviewed_book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    new_review = sql.Review(
+        book_id=book_id,
+        borrower_id=review.borrower_id,
+        comment=review.comment,
+        rating=review.rating,
+        review_date=date.today(),
+    )
+    session.add(new_review)
+    try:
+        await session.flush()
+    except IntegrityError as error:
+        detail = REVIEW_FOREIGN_KEY_ERRORS.get(constraint_name(error))
+        if detail is None:
+            raise
+        raise HTTPException(status_code=404, detail=detail)
+    cache.invalidate_on_commit(
+        session,
+        response_cache,
+        cache.borrower_key(review.borrower_id),
+    )
+    leaderboard.record_review_on_commit(
+        session, book_leaderboard, leaderboard.LeaderboardEntry(*reviewed_book)
+    )
+    return serializers.REVIEW.response(new_review, status_code=status.HTTP_201_CREATED)
+
+
+@router.get("/borrowers", response_model=List[response.BatchItem[response.Borrower]])
+async def get_borrowers(
+    ids: List[int] = Depends(query_ids),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    return await _get_batch(session, sql.Borrower, response.Borrower, ids)
+
+
+@router.post(
+    "/borrowers:batchGet",
+    response_model=List[response.BatchItem[response.Borrower]],
+)
+async def batch_get_borrowers(
+    batch: request.BatchGet,
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    return await _get_batch(
+        session, sql.Borrower, response.Borrower, validate_batch_ids(batch.ids)
+    )
+
+
+@router.get("/borrowers/{borrower_id}", response_model=response.Borrower)
+async def get_borrower(
+    borrower_id: int,
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.Borrower, sql.Borrower)
+    ),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_read_response_cache),
+):
+    if fieldset is not None:
+        borrower = (
+            await session.scalars(
+                BORROWER_BY_ID.options(*fieldset.options()), {"id": borrower_id}
+            )
+        ).first()
+        if borrower is None:
+            raise HTTPException(status_code=404, detail="Borrower not found")
+        return fieldset.response(borrower)
+
+    cached = response_cache.cached_response(cache.borrower_key(borrower_id))
+    if cached is not None:
+        return cached
+    borrower = (
+        await session.scalars(BORROWER_RESPONSE_BY_ID, {"id": borrower_id})
+    ).first()
+    if borrower is None:
+        raise HTTPException(status_code=404, detail="Borrower not found")
+    return response_cache.store_response(
+        cache.borrower_key(borrower_id), serializers.BORROWER.dump(borrower)
+    )
+
+
+@router.get("/library-cards/{library_card_id}", response_model=response.LibraryCard)
+async def get_library_card(
+    library_card_id: int,
+    if_none_match: Optional[str] = Header(None),
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.LibraryCard, sql.LibraryCard)
+    ),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    # Version is checked before anything else so that unchanged resources are
+    # answered without loading relationships or validating models
+    version = await session.scalar(etags.library_card_version(library_card_id))
+    if version is None:
+        raise HTTPException(status_code=404, detail="Library Card not found")
+    library_card_etag = etags.etag(version)
+    if etags.etag_matches(if_none_match, library_card_etag):
+        return etags.not_modified(library_card_etag)
+
+    if fieldset is not None:
+        library_card = (
+            await session.scalars(
+                LIBRARY_CARD_BY_ID.options(*fieldset.options()),
+                {"id": library_card_id},
+            )
+        ).first()
+        if library_card is None:
+            raise HTTPException(status_code=404, detail="Library Card not found")
+        return fieldset.response(library_card, headers={"ETag": library_card_etag})
+
+    cached = response_cache.cached_response(
+        cache.library_card_key(library_card_id, version)
+    )
+    if cached is not None:
+        cached.headers["ETag"] = library_card_etag
+        return cached
+    library_card = (
+        await session.scalars(LIBRARY_CARD_RESPONSE_BY_ID, {"id": library_card_id})
+    ).first()
+    if library_card is None:
+        raise HTTPException(status_code=404, detail="Library Card not found")
+    library_card_response = response_cache.store_response(
+        cache.library_card_key(library_card_id, version),
+        serializers.LIBRARY_CARD.dump(library_card),
+    )
+    library_card_response.headers["ETag"] = library_card_etag
+    return library_card_response
+
+
+@router.get("/loans/{loan_id}", response_model=response.Loan)
+async def get_loan(
+    loan_id: int,
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.Loan, sql.Loan)
+    ),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_read_response_cache),
+):
+    if fieldset is not None:
+        loan = (
+            await session.scalars(
+                LOAN_BY_ID.options(*fieldset.options()), {"id": loan_id}
+            )
+        ).first()
+        if loan is None:
+            raise HTTPException(status_code=404, detail="Loan not found")
+        return fieldset.response(loan)
+
+    cached = response_cache.cached_response(cache.loan_key(loan_id))
+    if cached is not None:
+        return cached
+    loan = (await session.scalars(LOAN_BY_ID, {"id": loan_id})).first()
+    if loan is None:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    return response_cache.store_response(
+        cache.loan_key(loan_id), serializers.LOAN.dump(loan)
+    )
+
+
+@router.delete("/loans/{loan_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_loan(
+    loan_id: int,
+    session: AsyncSession = Depends(resources.async_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    loan = (await session.scalars(LOAN_BY_ID, {"id": loan_id})).first()
+    if loan is None:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    if response_cache.enabled:
+        borrower_id = await session.scalar(
+            select(sql.LibraryCard.borrower_id).where(
+                sql.LibraryCard.id == loan.library_card_id
+            )
+        )
+        cache.invalidate_on_commit(
+            session,
+            response_cache,
+            cache.loan_key(loan_id),
+            cache.borrower_key(borrower_id),
+        )
+    await session.delete(loan)
+    await session.execute(
+        update(sql.Book).where(sql.Book.id == loan.book_id).values(is_available=True)
+    )
+    return None
+
+
+async def _stream_loans_for_borrower(
+    library_card_id: int,
+) -> AsyncGenerator[bytes, None]:
+    # The request scoped session is closed before a streaming body is sent,
+    # so the stream owns its session for as long as rows are being read
+    async with resources.get_configured_async_database().create_session(
+        use_reader=not consistency.reads_from_writer()
+    ) as session:
+        loans = await session.stream(
+            select(*loaders.LOAN_COLUMNS)
+            .where(sql.Loan.library_card_id == library_card_id)
+            .order_by(sql.Loan.id)
+            .execution_options(yield_per=settings.STREAM_BATCH_SIZE)
+        )
+        async for loan in loans.mappings():
+            yield serializers.LOAN.dump(loan) + b"\n"
+
+
+@router.get("/loans", response_model=List[response.Loan])
+async def list_loans_for_borrower(
+    library_card_id: int,
+    after: Optional[int] = Query(
+        None, description="Return loans with id greater than this cursor"
+    ),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    stream: bool = Query(False, description="Stream all loans as NDJSON"),
+    accept: Optional[str] = Header(None),
+    session: AsyncSession = Depends(resources.async_read_only_database_session),
+):
+    if stream or (accept is not None and NDJSON_MEDIA_TYPE in accept):
+        return StreamingResponse(
+            _stream_loans_for_borrower(library_card_id),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    statement = select(*loaders.LOAN_COLUMNS).where(
+        sql.Loan.library_card_id == library_card_id
+    )
+    if after is not None:
+        statement = statement.where(sql.Loan.id > after)
+    loans = (
+        (await session.execute(statement.order_by(sql.Loan.id).limit(limit)))
+        .mappings()
+        .all()
+    )
+
+    headers = {}
+    if len(loans) == limit:
+        headers["X-Next-Cursor"] = str(loans[-1]["id"])
+    return serializers.LOAN.list_response(loans, headers=headers)
+
+
+@router.get("/metrics/database-pool")
+async def get_database_pool_metrics():
+    return resources.get_configured_async_database().pool_status()
+
+
+@router.get("/metrics/response-cache")
+async def get_response_cache_metrics(
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    return response_cache.metrics()
+
+
+@router.get("/metrics/review-queue")
+async def get_review_queue_metrics(
+    review_writer: Optional[review_queue.ReviewWriter] = Depends(
+        resources.get_review_writer
+    ),
+):
+    if review_writer is None:
+        return {"enabled": False}
+    return {"enabled": True, **review_writer.status()}
@@ -0,0 +1,317 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+JSON_MEDIA_TYPE = "application/json"
+
+_INVALIDATIONS_KEY = "response_cache_invalidations"
+
+# Value of an invalidated key for the invalidation grace period. Response
+# bodies are JSON and never empty
+TOMBSTONE = b""
+
+
+def author_key(author_id: int) -> str:
+    return f"author:{author_id}"
+
+
+# Books and library cards have ETag versions, their entries are keyed by
+# version so that a cached body always matches the ETag it is served with and
+# writes never need to invalidate them
+
+
+def book_key(book_id: int, version: str) -> str:
+    return f"book:{book_id}:{version}"
+
+
+def borrower_key(borrower_id: int) -> str:
+    return f"borrower:{borrower_id}"
+
+
+def library_card_key(library_card_id: int, version: str) -> str:
+    return f"library_card:{library_card_id}:{version}"
+
+
+def loan_key(loan_id: int) -> str:
+    return f"loan:{loan_id}"
+
+
+class CacheBackend(ABC):
+    """
+    Minimal interface of a cache tier storing serialized response bodies
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float): ...
+
+    @abstractmethod
+    def delete(self, *keys: str): ...
+
+    def set_unless_invalidated(self, key: str, value: bytes, ttl: float) -> bool:
+        """
+        Set key unless it holds a tombstone. Shared tiers should override this
+        with an atomic check-and-set (e.g. a Lua script in Redis)
+        """
+        if self.get(key) == TOMBSTONE:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+
+class LocalCache(CacheBackend):
+    """
+    In-process cache with per entry TTL, evicting least recently used
+    entries once max_size is reached
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def set_unless_invalidated(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry[1] == TOMBSTONE
+                and entry[0] >= time.monotonic()
+            ):
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _set(self, key: str, value: bytes, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+class InMemorySharedCache(CacheBackend):
+    """
+    Local stand-in for a shared cache tier (e.g. ElastiCache), for tests and
+    local development
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def set_unless_invalidated(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry[1] == TOMBSTONE
+                and entry[0] >= time.monotonic()
+            ):
+                return False
+            self._entries[key] = (time.monotonic() + ttl, value)
+            return True
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class ResponseCache:
+    """
+    Read-through cache of already serialized JSON response bodies.
+    Lookups go through the local tier first and the optional shared tier
+    second, writes and invalidations go to both.
+
+    Invalidated keys hold a tombstone for invalidation_grace seconds that
+    rejects stores, so that a request which read the state before the
+    invalidating commit cannot cache it again afterwards
+    """
+
+    def __init__(
+        self,
+        local: Optional[LocalCache] = None,
+        shared: Optional[CacheBackend] = None,
+        ttl: float = 60,
+        invalidation_grace: float = 5,
+    ):
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+        self.invalidation_grace = invalidation_grace
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.rejected_stores = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.local is not None or self.shared is not None
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value:
+                self.hits += 1
+                return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value:
+                self.shared_hits += 1
+                if self.local is not None:
+                    self.local.set_unless_invalidated(key, value, self.ttl)
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: bytes) -> bool:
+        """
+        Store given value in every tier, unless the key was invalidated within
+        the grace period. Returns whether the value was stored
+        """
+        # The shared tier decides for every process, a tombstone in it rejects
+        # the store even where the local tier has none
+        for tier in reversed(self._tiers()):
+            if not tier.set_unless_invalidated(key, value, self.ttl):
+                self.rejected_stores += 1
+                return False
+        return True
+
+    def invalidate(self, *keys: str):
+        self.invalidations += len(keys)
+        for tier in self._tiers():
+            if self.invalidation_grace > 0:
+                for key in keys:
+                    tier.set(key, TOMBSTONE, self.invalidation_grace)
+            else:
+                tier.delete(*keys)
+
+    def cached_response(self, key: str) -> Optional[Response]:
+        value = self.get(key)
+        if value is None:
+            return None
+        return Response(content=value, media_type=JSON_MEDIA_TYPE)
+
+    def store_response(self, key: str, value: bytes) -> Response:
+        """
+        Cache given serialized response body and return it as response so that
+        FastAPI does not serialize it again
+        """
+        if self.enabled:
+            self.set(key, value)
+        return Response(content=value, media_type=JSON_MEDIA_TYPE)
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "rejected_stores": self.rejected_stores,
+            "evictions": self.local.evictions if self.local is not None else 0,
+            "size": len(self.local) if self.local is not None else 0,
+        }
+
+    def _tiers(self) -> List[CacheBackend]:
+        return [tier for tier in (self.local, self.shared) if tier is not None]
+
+
+class LookupOnlyResponseCache(ResponseCache):
+    """
+    View of a response cache serving lookups without storing anything, for
+    bodies read from a reader. Entries invalidated by a write could otherwise
+    be filled again with the state of a reader that has not replayed it yet
+    """
+
+    def __init__(self, response_cache: ResponseCache):
+        self.response_cache = response_cache
+
+    @property
+    def enabled(self) -> bool:
+        return self.response_cache.enabled
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.response_cache.get(key)
+
+    def set(self, key: str, value: bytes) -> bool:
+        return False
+
+    def invalidate(self, *keys: str):
+        self.response_cache.invalidate(*keys)
+
+    def metrics(self) -> dict:
+        return self.response_cache.metrics()
+
+
+def invalidate_on_commit(session: Session, cache: ResponseCache, *keys: str):
+    """
+    Invalidate given keys once the session commits. Invalidating before commit
+    would let a concurrent request cache the pre-commit state again right
+    away, after commit the tombstones of the invalidated keys reject stores of
+    requests that read before the commit for the invalidation grace period.
+    A request taking longer than the grace period between its read and its
+    store can still cache the pre-commit state, for at most the cache TTL
+    """
+    if not cache.enabled:
+        return
+    pending = session.info.setdefault(_INVALIDATIONS_KEY, [])
+    pending.append((cache, keys))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    for cache, keys in session.info.pop(_INVALIDATIONS_KEY, []):
+        cache.invalidate(*keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session):
+    session.info.pop(_INVALIDATIONS_KEY, None)
@@ -0,0 +1,65 @@
+import math
+import time
+from contextvars import ContextVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+LAST_WRITE_COOKIE = "last_write"
+
+_SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# POST routes that only read
+_READ_ONLY_SUFFIXES = (":batchGet",)
+
+_reads_from_writer: ContextVar[bool] = ContextVar("reads_from_writer", default=False)
+
+
+def reads_from_writer() -> bool:
+    """
+    Whether reads of the current request must see the client's own writes
+    """
+    return _reads_from_writer.get()
+
+
+class ReadYourWritesMiddleware:
+    """
+    Route the reads of a client to the writer for window seconds after its
+    last successful write, readers may not have replayed the write yet.
+    The time of the write is kept in a cookie so that the window holds
+    across processes and Lambda containers
+    """
+
+    def __init__(self, app, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        last_write = HTTPConnection(scope).cookies.get(LAST_WRITE_COOKIE)
+        try:
+            recent = time.time() - float(last_write) < self.window
+        except (TypeError, ValueError):
+            recent = False
+
+        async def send_with_last_write(message):
+            if (
+                message["type"] == "http.response.start"
+                and scope["method"] not in _SAFE_METHODS
+                and not scope["path"].endswith(_READ_ONLY_SUFFIXES)
+                and message["status"] < 400
+            ):
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie",
+                    f"{LAST_WRITE_COOKIE}={time.time():.3f}; "
+                    f"Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        token = _reads_from_writer.set(recent)
+        try:
+            await self.app(scope, receive, send_with_last_write)
+        finally:
+            _reads_from_writer.reset(token)
@@ -1,11 +1,224 @@
-from contextlib import contextmanager
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Sequence
 
-from sqlalchemy import create_engine
+from instrumentation import current_request_metrics, instrument_statements
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 
 Base = declarative_base()
 
+# lambda-proxy:  new connection per checkout, RDS Proxy multiplexes the real ones
+# lambda-direct: one persistent connection per container, recycled by age and
+#                invalidated on disconnect errors instead of pinged on checkout
+# server:        tunable QueuePool for long running processes
+POOL_PROFILES = ("lambda-proxy", "lambda-direct", "server")
+
+# round-robin: cycle through the readers
+# least-busy:  reader with the fewest checked out connections in this process
+READER_SELECTIONS = ("round-robin", "least-busy")
+
+# Max connection age of lambda-direct when no pool_recycle is given
+LAMBDA_DIRECT_POOL_RECYCLE = 1800
+
+
+class PoolMetrics:
+    """
+    Connection pool counters for sizing database max_connections.
+    Checkout time includes connect time when a checkout opens a new connection,
+    wait time is the remainder spent waiting on the pool itself
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self.connects = 0
+        self.connect_time = 0.0
+        self.invalidations = 0
+
+    def record_checkout(self, elapsed: float):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_time += elapsed
+            self.max_checkout_time = max(self.max_checkout_time, elapsed)
+
+    def record_connect(self, elapsed: float):
+        with self._lock:
+            self.connects += 1
+            self.connect_time += elapsed
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_time": self.checkout_time,
+                "max_checkout_time": self.max_checkout_time,
+                "wait_time": max(self.checkout_time - self.connect_time, 0.0),
+                "connects": self.connects,
+                "connect_time": self.connect_time,
+                "invalidations": self.invalidations,
+            }
+
+
+class _MeasuredPool:
+    metrics: PoolMetrics = None
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        elapsed = time.perf_counter() - started
+        if self.metrics is not None:
+            self.metrics.record_checkout(elapsed)
+        request_metrics = current_request_metrics()
+        if request_metrics is not None:
+            request_metrics.record_checkout(elapsed)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeasuredQueuePool(_MeasuredPool, QueuePool):
+    pass
+
+
+class MeasuredAsyncAdaptedQueuePool(_MeasuredPool, AsyncAdaptedQueuePool):
+    pass
+
+
+class MeasuredNullPool(_MeasuredPool, NullPool):
+    pass
+
+
+def pool_arguments(
+    pool_profile,
+    *,
+    pool_size=5,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_recycle=-1,
+    pool_pre_ping=True,
+    use_async=False,
+) -> dict:
+    """
+    Engine keyword arguments for given pool profile
+
+    Args:
+        pool_profile (str): One of POOL_PROFILES
+        pool_size, max_overflow, pool_timeout: QueuePool tuning for server profile
+        pool_recycle (int): Max connection age in seconds, -1 disables recycling
+            except for lambda-direct, which then recycles after
+            LAMBDA_DIRECT_POOL_RECYCLE
+        pool_pre_ping (bool): Ping connections on checkout (server profile only)
+        use_async (bool): Build arguments for create_async_engine
+
+    Returns:
+        dict: Keyword arguments for create_engine / create_async_engine
+    """
+    queue_pool = MeasuredAsyncAdaptedQueuePool if use_async else MeasuredQueuePool
+    if pool_profile == "lambda-proxy":
+        return dict(poolclass=MeasuredNullPool, pool_pre_ping=False)
+    if pool_profile == "lambda-direct":
+        return dict(
+            poolclass=queue_pool,
+            pool_size=1,
+            max_overflow=0,
+            pool_recycle=(
+                pool_recycle if pool_recycle > 0 else LAMBDA_DIRECT_POOL_RECYCLE
+            ),
+            pool_pre_ping=False,
+        )
+    if pool_profile == "server":
+        return dict(
+            poolclass=queue_pool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+        )
+    raise ValueError(
+        f"Unknown pool profile: {pool_profile}, expected one of {POOL_PROFILES}"
+    )
+
+
+def instrument_pool(engine) -> PoolMetrics:
+    """
+    Attach PoolMetrics to the pool of given (sync) engine
+    """
+    metrics = PoolMetrics()
+    engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "do_connect")
+    def _connect_started(dialect, connection_record, cargs, cparams):
+        connection_record.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _connected(dbapi_connection, connection_record):
+        started = connection_record.info.pop("connect_started", None)
+        if started is not None:
+            metrics.record_connect(time.perf_counter() - started)
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidated(dbapi_connection, connection_record, exception):
+        metrics.record_invalidation()
+
+    return metrics
+
+
+class ReaderPool:
+    """
+    Engines of the reader instances (or reader endpoints) of a cluster
+    """
+
+    def __init__(self, engines: Sequence, selection: str = "round-robin"):
+        if selection not in READER_SELECTIONS:
+            raise ValueError(
+                f"Unknown reader selection: {selection}, "
+                f"expected one of {READER_SELECTIONS}"
+            )
+        self.engines = list(engines)
+        self.selection = selection
+        self._next = itertools.count()
+
+    def __len__(self):
+        return len(self.engines)
+
+    def select(self):
+        if self.selection == "least-busy":
+            return min(self.engines, key=_checked_out)
+        return self.engines[next(self._next) % len(self.engines)]
+
+    def pool_status(self) -> List[dict]:
+        return [
+            {
+                "endpoint": engine.url.host,
+                "status": engine.pool.status(),
+                **engine.pool.metrics.snapshot(),
+            }
+            for engine in self.engines
+        ]
+
+
+def _checked_out(engine) -> int:
+    # NullPool does not keep connections, every reader is equally busy
+    checkedout = getattr(engine.pool, "checkedout", None)
+    return checkedout() if checkedout is not None else 0
+
 
 class SQLDatabase:
     def __init__(
@@ -18,17 +231,53 @@ class SQLDatabase:
         database,
         ssl=False,
         pool_pre_ping=True,
+        pool_profile="server",
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_recycle=-1,
+        slow_query_threshold=0,
+        reader_endpoints=(),
+        reader_selection="round-robin",
+        query_cache_size=500,
     ):
         ssl_mode = "require" if ssl else "disable"
-        self.engine = create_engine(
-            f"postgresql+psycopg2://{username}:{password}@{endpoint}:{port}/{database}?sslmode={ssl_mode}",
-            pool_pre_ping=pool_pre_ping,
+
+        def _create_engine(host):
+            engine = create_engine(
+                f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{database}?sslmode={ssl_mode}",
+                query_cache_size=query_cache_size,
+                **pool_arguments(
+                    pool_profile,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
+                    pool_timeout=pool_timeout,
+                    pool_recycle=pool_recycle,
+                    pool_pre_ping=pool_pre_ping,
+                ),
+            )
+            instrument_statements(engine, slow_query_threshold)
+            return engine
+
+        self.engine = _create_engine(endpoint)
+        self.pool_metrics = instrument_pool(self.engine)
+        self.readers = ReaderPool(
+            [_create_engine(host) for host in reader_endpoints], reader_selection
         )
+        for reader in self.readers.engines:
+            instrument_pool(reader)
         self.session = sessionmaker(bind=self.engine, autocommit=False, autoflush=False)
 
     @contextmanager
-    def create_session(self):
-        session = self.session()
+    def create_session(self, use_reader=False):
+        """
+        Session bound to the writer, or to one of the readers when use_reader
+        is set and readers are configured
+        """
+        if use_reader and self.readers:
+            session = self.session(bind=self.readers.select())
+        else:
+            session = self.session()
         try:
             yield session
             session.commit()
@@ -37,3 +286,101 @@ class SQLDatabase:
             raise
         finally:
             session.close()
+
+    def pool_status(self) -> dict:
+        status = {"status": self.engine.pool.status(), **self.pool_metrics.snapshot()}
+        if self.readers:
+            status["readers"] = self.readers.pool_status()
+        return status
+
+
+class AsyncSQLDatabase:
+    def __init__(
+        self,
+        *,
+        username,
+        password,
+        endpoint,
+        port,
+        database,
+        ssl=False,
+        pool_pre_ping=True,
+        pool_profile="server",
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_recycle=-1,
+        slow_query_threshold=0,
+        reader_endpoints=(),
+        reader_selection="round-robin",
+        query_cache_size=500,
+        prepared_statement_cache_size=100,
+    ):
+        ssl_mode = "require" if ssl else "disable"
+
+        def _create_engine(host):
+            # asyncpg prepares statements server-side and keeps the last
+            # prepared_statement_cache_size of them per connection
+            engine = create_async_engine(
+                f"postgresql+asyncpg://{username}:{password}@{host}:{port}/{database}"
+                f"?prepared_statement_cache_size={prepared_statement_cache_size}",
+                connect_args={"ssl": ssl_mode},
+                query_cache_size=query_cache_size,
+                **pool_arguments(
+                    pool_profile,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
+                    pool_timeout=pool_timeout,
+                    pool_recycle=pool_recycle,
+                    pool_pre_ping=pool_pre_ping,
+                    use_async=True,
+                ),
+            )
+            instrument_statements(engine.sync_engine, slow_query_threshold)
+            return engine
+
+        self.engine = _create_engine(endpoint)
+        self.pool_metrics = instrument_pool(self.engine.sync_engine)
+        self.readers = ReaderPool(
+            [_create_engine(host) for host in reader_endpoints], reader_selection
+        )
+        for reader in self.readers.engines:
+            instrument_pool(reader.sync_engine)
+        self.session = async_sessionmaker(
+            bind=self.engine, autocommit=False, autoflush=False
+        )
+
+    @asynccontextmanager
+    async def create_session(self, use_reader=False):
+        """
+        Async counterpart of SQLDatabase.create_session
+        """
+        if use_reader and self.readers:
+            session = self.session(bind=self.readers.select())
+        else:
+            session = self.session()
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+    def pool_status(self) -> dict:
+        status = {"status": self.engine.pool.status(), **self.pool_metrics.snapshot()}
+        if self.readers:
+            status["readers"] = self.readers.pool_status()
+        return status
+
+
+def constraint_name(error: IntegrityError):
+    """
+    Name of the constraint that raised given IntegrityError for both psycopg2
+    and asyncpg drivers, or None when the driver does not report it
+    """
+    diagnostics = getattr(error.orig, "diag", None)
+    if diagnostics is not None:
+        return diagnostics.constraint_name
+    return getattr(error.orig.__cause__, "constraint_name", None)
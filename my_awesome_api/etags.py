@@ -0,0 +1,96 @@
+from typing import Optional
+
+import models.sqlalchemy as sql
+from fastapi import Response, status
+from sqlalchemy import Select, String, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+# Version signals are aggregates over the rows embedded in a response, computed
+# by a single query without loading relationships. Loans and reviews are never
+# updated, only inserted or deleted, so their count and id sum change whenever
+# the embedded collection changes.
+
+
+def _count_and_id_sum(model, foreign_key, parent_id):
+    return (
+        select(func.concat_ws("/", func.count(model.id), func.sum(model.id)))
+        .where(foreign_key == parent_id)
+        .scalar_subquery()
+    )
+
+
+def book_version(book_id: int) -> Select:
+    book_authors = sql.book_author_table.alias("book_authors")
+    author_books = sql.book_author_table.alias("author_books")
+    loan_id = select(sql.Loan.id).where(sql.Loan.book_id == sql.Book.id)
+    author_ids = select(
+        func.string_agg(
+            cast(book_authors.c.author_id, String),
+            aggregate_order_by(literal_column("','"), book_authors.c.author_id),
+        )
+    ).where(book_authors.c.book_id == sql.Book.id)
+    # Embedded authors list the ids of all of their books
+    authors_book_count = (
+        select(func.count())
+        .select_from(
+            book_authors.join(
+                author_books, book_authors.c.author_id == author_books.c.author_id
+            )
+        )
+        .where(book_authors.c.book_id == sql.Book.id)
+    )
+    return select(
+        func.md5(
+            func.concat_ws(
+                ":",
+                sql.Book.title,
+                sql.Book.published_date,
+                loan_id.scalar_subquery(),
+                _count_and_id_sum(sql.Review, sql.Review.book_id, sql.Book.id),
+                author_ids.scalar_subquery(),
+                authors_book_count.scalar_subquery(),
+            )
+        )
+    ).where(sql.Book.id == book_id)
+
+
+def library_card_version(library_card_id: int) -> Select:
+    return select(
+        func.md5(
+            func.concat_ws(
+                ":",
+                sql.LibraryCard.issue_date,
+                sql.LibraryCard.borrower_id,
+                _count_and_id_sum(
+                    sql.Loan, sql.Loan.library_card_id, sql.LibraryCard.id
+                ),
+            )
+        )
+    ).where(sql.LibraryCard.id == library_card_id)
+
+
+def etag(version: str) -> str:
+    return f'"{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], current_etag: str) -> bool:
+    """
+    Weak comparison of If-None-Match header against current ETag (RFC 9110)
+    """
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current_etag:
+            return True
+    return False
+
+
+def not_modified(current_etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": current_etag}
+    )
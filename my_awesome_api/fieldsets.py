@@ -0,0 +1,142 @@
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+import models.loaders as loaders
+import models.serializers as serializers
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.orm import load_only
+
+# Sparse fieldsets: "fields" selects the columns and "expand" the embedded
+# relationships of a response. Only the selected columns are loaded with
+# load_only and only the expanded relationships get loader options, so an
+# omitted relationship is never queried. The id is always returned.
+
+
+@lru_cache(maxsize=None)
+def _field_adapter(model: Type[BaseModel], name: str) -> TypeAdapter:
+    return TypeAdapter(model.model_fields[name].annotation)
+
+
+def _split(value: str) -> Tuple[str, ...]:
+    return tuple(
+        dict.fromkeys(part.strip() for part in value.split(",") if part.strip())
+    )
+
+
+class FieldSet:
+    """
+    Columns and relationships of a response model selected by the client
+    """
+
+    def __init__(
+        self,
+        model: Type[BaseModel],
+        entity,
+        fields: Tuple[str, ...],
+        expand: Tuple[str, ...],
+    ):
+        self.model = model
+        self.entity = entity
+        self.fields = fields
+        self.expand = expand
+
+    def options(self) -> tuple:
+        """
+        Loader options loading nothing but the selected columns and relationships
+        """
+        columns = [getattr(self.entity, name) for name in ("id", *self.fields)]
+        return (
+            load_only(*columns),
+            *loaders.loader_options(self.model, self.expand),
+        )
+
+    def serialize(self, instance) -> dict:
+        """
+        JSON compatible values of the selected fields. Each field is dumped by
+        its own adapter, the adapter of the whole dict cannot serialize the
+        nested models it does not know the schema of
+        """
+        data = {"id": instance.id}
+        for name in (*self.fields, *self.expand):
+            adapter = _field_adapter(self.model, name)
+            data[name] = adapter.dump_python(
+                adapter.validate_python(getattr(instance, name), from_attributes=True),
+                mode="json",
+            )
+        return data
+
+    def response(
+        self, instance, headers: Optional[dict] = None
+    ) -> serializers.JSONBytesResponse:
+        return serializers.JSONBytesResponse(
+            serializers.dump_values(self.serialize(instance)), headers=headers
+        )
+
+
+def parse_fieldset(
+    model: Type[BaseModel],
+    entity,
+    fields: Optional[str],
+    expand: Optional[str],
+) -> Optional[FieldSet]:
+    """
+    Validate fields and expand query parameters against given response model
+
+    Args:
+        model (Type[BaseModel]): Response model class from models.response
+        entity: SQLAlchemy model the response model is read from
+        fields (str): Comma separated columns, all when omitted
+        expand (str): Comma separated relationships, none when omitted
+
+    Returns:
+        Optional[FieldSet]: None when neither parameter is given, meaning the
+        full response
+    """
+    if fields is None and expand is None:
+        return None
+    relationships = loaders.relationships(model)
+    columns = tuple(
+        name
+        for name in model.model_fields
+        if name not in relationships and name != "id"
+    )
+    selected_fields = columns if fields is None else _split(fields)
+    selected_fields = tuple(name for name in selected_fields if name != "id")
+    selected_expand = () if expand is None else _split(expand)
+
+    unknown_fields = [name for name in selected_fields if name not in columns]
+    if unknown_fields:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(unknown_fields)}. "
+            f"Available fields: {', '.join(('id', *columns))}",
+        )
+    unknown_expand = [name for name in selected_expand if name not in relationships]
+    if unknown_expand:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown relationships: {', '.join(unknown_expand)}. "
+            f"Available relationships: {', '.join(relationships) or 'none'}",
+        )
+    return FieldSet(model, entity, selected_fields, selected_expand)
+
+
+def fieldset_query(model: Type[BaseModel], entity):
+    """
+    Dependency parsing the sparse fieldset query parameters of given model
+    """
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None, description="Comma separated fields to return, all when omitted"
+        ),
+        expand: Optional[str] = Query(
+            None,
+            description="Comma separated relationships to embed, "
+            "all when neither fields nor expand is given",
+        ),
+    ) -> Optional[FieldSet]:
+        return parse_fieldset(model, entity, fields, expand)
+
+    return dependency
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+_STATEMENT_STARTED_KEY = "statement_started"
+
+# Literals and bind parameters are replaced so that statements differing only
+# in their values share a fingerprint
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAMETER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RequestMetrics:
+    """
+    Database work attributed to a single request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.database_time = 0.0
+        self.pool_wait_time = 0.0
+        self.rows = 0
+
+    def record_statement(self, elapsed: float, rows: int):
+        self.statements += 1
+        self.database_time += elapsed
+        self.rows += rows
+
+    def record_checkout(self, elapsed: float):
+        self.pool_wait_time += elapsed
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        return (
+            f'db;dur={self.database_time * 1000:.1f};desc="{self.statements} '
+            f'statements, {self.rows} rows", '
+            f"pool;dur={self.pool_wait_time * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+
+_request_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+def current_request_metrics() -> Optional[RequestMetrics]:
+    return _request_metrics.get()
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalize given SQL statement by replacing literals and bind parameters
+    with placeholders and collapsing IN lists and whitespace
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _BIND_PARAMETER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (?+)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def instrument_statements(engine, slow_query_threshold: float = 0):
+    """
+    Attribute statements executed by given (sync) engine to the current request
+    and log statements slower than slow_query_threshold seconds (0 disables)
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _statement_started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_STATEMENT_STARTED_KEY, []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info[_STATEMENT_STARTED_KEY].pop()
+        metrics = _request_metrics.get()
+        if metrics is not None:
+            metrics.record_statement(elapsed, max(cursor.rowcount, 0))
+        if slow_query_threshold and elapsed >= slow_query_threshold:
+            normalized = fingerprint(statement)
+            logger.warning(
+                json.dumps(
+                    {
+                        "message": "slow query",
+                        "fingerprint": hashlib.md5(normalized.encode()).hexdigest(),
+                        "statement": normalized,
+                        "duration_ms": round(elapsed * 1000, 1),
+                        "rows": cursor.rowcount,
+                    }
+                )
+            )
+
+
+def embedded_metric(
+    namespace: str, route: str, method: str, status_code: int, metrics: RequestMetrics
+) -> dict:
+    """
+    Request metrics in CloudWatch Embedded Metric Format, dimensioned by route
+    template so that path parameters do not create new metrics
+    """
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [["Route"]],
+                    "Metrics": [
+                        {"Name": "Duration", "Unit": "Milliseconds"},
+                        {"Name": "Statements", "Unit": "Count"},
+                        {"Name": "DatabaseTime", "Unit": "Milliseconds"},
+                        {"Name": "PoolWaitTime", "Unit": "Milliseconds"},
+                        {"Name": "RowsReturned", "Unit": "Count"},
+                    ],
+                }
+            ],
+        },
+        "Route": route,
+        "Method": method,
+        "StatusCode": status_code,
+        "Duration": round((time.perf_counter() - metrics.started) * 1000, 3),
+        "Statements": metrics.statements,
+        "DatabaseTime": round(metrics.database_time * 1000, 3),
+        "PoolWaitTime": round(metrics.pool_wait_time * 1000, 3),
+        "RowsReturned": metrics.rows,
+    }
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Collect RequestMetrics for every HTTP request, report them in Server-Timing
+    response header and optionally log them as embedded metrics.
+    Statements executed while a streaming body is sent are not included in
+    the header but are included in the logged metrics
+    """
+
+    def __init__(self, app, log_metrics: bool = False, namespace: str = ""):
+        self.app = app
+        self.log_metrics = log_metrics
+        self.namespace = namespace
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        status_code = 500
+
+        async def send_with_server_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", metrics.server_timing()
+                )
+            await send(message)
+
+        token = _request_metrics.set(metrics)
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _request_metrics.reset(token)
+            if self.log_metrics:
+                route = scope.get("route")
+                # EMF documents must be written to stdout as is, without the
+                # prefix added by the Lambda log handler
+                print(
+                    json.dumps(
+                        embedded_metric(
+                            self.namespace,
+                            route.path if route is not None else "unmatched",
+                            scope["method"],
+                            status_code,
+                            metrics,
+                        )
+                    ),
+                    flush=True,
+                )
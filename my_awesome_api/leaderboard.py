@@ -0,0 +1,183 @@
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import models.sqlalchemy as sql
+from sqlalchemy import Float, Integer, Select, column, event, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+_RECORDED_REVIEWS_KEY = "leaderboard_recorded_reviews"
+
+# Materialized view created by migration 0004. Not part of Base.metadata, the
+# view is owned by the migration and only read here
+book_leaderboard = table(
+    "book_leaderboard",
+    column("book_id", Integer),
+    column("review_count", Integer),
+    column("rating_sum", Integer),
+    column("bayesian_rating", Float),
+    column("prior_mean", Float),
+    column("prior_weight", Integer),
+)
+
+RANKINGS = {
+    "rating": book_leaderboard.c.bayesian_rating,
+    "reviews": book_leaderboard.c.review_count,
+}
+
+
+class LeaderboardEntry(NamedTuple):
+    book_id: int
+    title: str
+    review_count: int
+    rating_sum: int
+
+
+def leaderboard_statement(by: str, size: int) -> Select:
+    """
+    Top size books of given ranking in the materialized view, with their
+    current aggregates from books
+    """
+    return (
+        select(
+            sql.Book.id,
+            sql.Book.title,
+            sql.Book.review_count,
+            sql.Book.rating_sum,
+            book_leaderboard.c.prior_mean,
+            book_leaderboard.c.prior_weight,
+        )
+        .join(book_leaderboard, book_leaderboard.c.book_id == sql.Book.id)
+        .order_by(RANKINGS[by].desc(), book_leaderboard.c.book_id)
+        .limit(size)
+    )
+
+
+def refresh_view(connection: Connection):
+    """
+    Recompute the materialized view without blocking concurrent reads of it
+    """
+    connection.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY book_leaderboard"))
+
+
+class Leaderboard:
+    """
+    In-process top size books of every ranking. Rankings are loaded from the
+    materialized view at most every ttl seconds and reviews committed by this
+    process are applied to them in between. The best books reviewed by this
+    process are also merged into every load, the view may not have been
+    refreshed since they were reviewed
+    """
+
+    def __init__(self, size: int = 100, ttl: float = 60):
+        self.size = size
+        self.ttl = ttl
+        self.prior_mean = 0.0
+        self.prior_weight = 0
+        self._rankings: Dict[str, Tuple[float, List[LeaderboardEntry]]] = {}
+        # Top size books of every ranking among the books reviewed by this
+        # process, with their aggregates when they were reviewed
+        self._reviewed: Dict[str, List[LeaderboardEntry]] = {by: [] for by in RANKINGS}
+        self._lock = threading.Lock()
+
+    def bayesian_rating(self, entry: LeaderboardEntry) -> float:
+        return (self.prior_mean * self.prior_weight + entry.rating_sum) / (
+            self.prior_weight + entry.review_count
+        )
+
+    def top(self, by: str, limit: int) -> Optional[List[dict]]:
+        """
+        Top limit books of given ranking, None when the ranking has to be
+        (re)loaded first
+        """
+        with self._lock:
+            ranking = self._rankings.get(by)
+            if ranking is None or ranking[0] < time.monotonic():
+                return None
+            return [
+                {
+                    "id": entry.book_id,
+                    "title": entry.title,
+                    "review_count": entry.review_count,
+                    "average_rating": entry.rating_sum / entry.review_count,
+                    "bayesian_rating": self.bayesian_rating(entry),
+                }
+                for entry in ranking[1][:limit]
+            ]
+
+    def load(self, by: str, rows: Iterable):
+        """
+        Replace given ranking with rows of leaderboard_statement, merged with
+        the books reviewed by this process that the view does not rank
+        """
+        entries = []
+        with self._lock:
+            for row in rows:
+                self.prior_mean = row.prior_mean
+                self.prior_weight = row.prior_weight
+                entries.append(
+                    LeaderboardEntry(
+                        row.id, row.title, row.review_count, row.rating_sum
+                    )
+                )
+            # Aggregates read from books are newer than the reviewed ones
+            loaded = {entry.book_id for entry in entries}
+            entries.extend(
+                entry for entry in self._reviewed[by] if entry.book_id not in loaded
+            )
+            # Aggregates may have changed since the view was refreshed
+            entries.sort(key=lambda entry: self._sort_key(by, entry))
+            self._rankings[by] = (time.monotonic() + self.ttl, entries[: self.size])
+
+    def record_review(self, entry: LeaderboardEntry):
+        """
+        Apply the new aggregates of a reviewed book to the loaded rankings
+        """
+        with self._lock:
+            for by, reviewed in self._reviewed.items():
+                reviewed = [
+                    other for other in reviewed if other.book_id != entry.book_id
+                ]
+                reviewed.append(entry)
+                reviewed.sort(key=lambda other: self._sort_key(by, other))
+                self._reviewed[by] = reviewed[: self.size]
+            for by, (expires_at, entries) in list(self._rankings.items()):
+                others = [other for other in entries if other.book_id != entry.book_id]
+                was_ranked = len(others) < len(entries)
+                key = self._sort_key(by, entry)
+                # Books outside of a full ranking rank below its last entry
+                if len(entries) < self.size or key <= self._sort_key(by, entries[-1]):
+                    others.append(entry)
+                    others.sort(key=lambda other: self._sort_key(by, other))
+                    self._rankings[by] = (expires_at, others[: self.size])
+                elif was_ranked:
+                    # The book dropped out of the ranking, the book replacing
+                    # it is not known without reloading
+                    del self._rankings[by]
+
+    def _sort_key(self, by: str, entry: LeaderboardEntry) -> Tuple[float, int]:
+        if by == "reviews":
+            return (-entry.review_count, entry.book_id)
+        return (-self.bayesian_rating(entry), entry.book_id)
+
+
+def record_review_on_commit(
+    session: Session, leaderboard: Leaderboard, entry: LeaderboardEntry
+):
+    """
+    Apply given aggregates to the leaderboard once the session commits
+    """
+    pending = session.info.setdefault(_RECORDED_REVIEWS_KEY, [])
+    pending.append((leaderboard, entry))
+
+
+@event.listens_for(Session, "after_commit")
+def _record_committed(session: Session):
+    for leaderboard, entry in session.info.pop(_RECORDED_REVIEWS_KEY, []):
+        leaderboard.record_review(entry)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_recorded(session: Session):
+    session.info.pop(_RECORDED_REVIEWS_KEY, None)
@@ -1,9 +1,10 @@
 import resources as resources
 import settings as settings
+from consistency import ReadYourWritesMiddleware
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from instrumentation import SQLInstrumentationMiddleware
 from mangum import Mangum
-from routes import router
 
 app = FastAPI()
 
@@ -15,21 +16,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(router)
+# Statement count, database time and pool wait time of every request are
+# reported in Server-Timing header and optionally logged as CloudWatch metrics
+app.add_middleware(
+    SQLInstrumentationMiddleware,
+    log_metrics=settings.METRICS_LOG_ENABLED,
+    namespace=settings.METRICS_NAMESPACE,
+)
+
+# Reads of a client go to the writer for a while after it wrote, instead of
+# to a reader that may lag behind
+if settings.READ_YOUR_WRITES_WINDOW > 0:
+    app.add_middleware(
+        ReadYourWritesMiddleware, window=settings.READ_YOUR_WRITES_WINDOW
+    )
 
-# When run locally we do not use aws secrets manager to fetch database secrets
-if settings.ENV == "local":
-    aws_secret_cache = None
+# Async routes run on the event loop with asyncpg instead of the threadpool
+if settings.USE_ASYNC:
+    from async_routes import router
 else:
-    aws_secret_cache = resources.get_secret_cache(region=settings.AWS_REGION)
+    from routes import router
+
+app.include_router(router)
 
+# Database engine is created lazily on first request. Warming up establishes
+# the connection outside lambda handler, during Lambda init phase instead
+if settings.WARM_UP_DATABASE:
+    resources.warm_up_database()
 
-# Establish database connection outside lambda handler.
-# After initialization this singleton database instance
-# will be reused as fastapi dependency
-my_awesome_database = resources.get_database(
-    use_proxy=settings.USE_PROXY, use_secret_cache=aws_secret_cache
-)
+# Write-behind is started with the app, a configuration it refuses fails
+# startup instead of the first review
+if settings.REVIEW_WRITE_BEHIND:
+    resources.get_review_writer()
 
 handler = Mangum(app, lifespan="off")
 
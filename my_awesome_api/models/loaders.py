@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, Optional, Tuple, Type
+
+import models.response as response
+import models.sqlalchemy as sql
+from pydantic import BaseModel
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
+
+# Loader options describing the relationship graph each response model walks,
+# keyed by relationship name. Collections use selectinload (one extra IN query
+# per relationship regardless of collection size) and scalar relationships use
+# joinedload so that model_validate never triggers lazy loads.
+
+AUTHOR: Dict[str, LoaderOption] = {}
+
+BOOK: Dict[str, LoaderOption] = {
+    "authors": selectinload(sql.Book.authors),
+    "loan": joinedload(sql.Book.loan),
+    "reviews": selectinload(sql.Book.reviews),
+}
+
+REVIEW: Dict[str, LoaderOption] = {}
+
+BORROWER: Dict[str, LoaderOption] = {
+    "library_card": joinedload(sql.Borrower.library_card).selectinload(
+        sql.LibraryCard.loans
+    ),
+    "reviews": selectinload(sql.Borrower.reviews),
+}
+
+LIBRARY_CARD: Dict[str, LoaderOption] = {
+    "loans": selectinload(sql.LibraryCard.loans),
+}
+
+LOAN: Dict[str, LoaderOption] = {}
+
+# Loans embed nothing, so list routes select their columns as plain rows
+# instead of building ORM objects
+LOAN_COLUMNS = (
+    sql.Loan.id,
+    sql.Loan.book_id,
+    sql.Loan.library_card_id,
+    sql.Loan.loan_date,
+)
+
+_LOADER_OPTIONS: Dict[Type[BaseModel], Dict[str, LoaderOption]] = {
+    response.Author: AUTHOR,
+    response.Book: BOOK,
+    response.Review: REVIEW,
+    response.Borrower: BORROWER,
+    response.LibraryCard: LIBRARY_CARD,
+    response.Loan: LOAN,
+}
+
+
+def relationships(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """
+    Names of the relationships given response model embeds
+    """
+    return tuple(_LOADER_OPTIONS[model])
+
+
+def loader_options(
+    model: Type[BaseModel], expand: Optional[Iterable[str]] = None
+) -> Tuple[LoaderOption, ...]:
+    """
+    Return the SQLAlchemy loader options needed to serialize given response model
+
+    Args:
+        model (Type[BaseModel]): Response model class from models.response
+        expand (Iterable[str]): Load only these relationships, all when None
+
+    Returns:
+        Tuple[LoaderOption, ...]: Options to pass to Query.options / Select.options
+    """
+    options = _LOADER_OPTIONS[model]
+    if expand is None:
+        return tuple(options.values())
+    return tuple(options[name] for name in expand)
@@ -28,3 +28,12 @@ class Borrower(BaseModel):
 
 class Loan(BaseModel):
     library_card_id: int
+
+
+class BatchGet(BaseModel):
+    ids: List[int]
+
+
+class LoanBatch(BaseModel):
+    library_card_id: int
+    book_ids: List[int]
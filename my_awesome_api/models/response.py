@@ -1,4 +1,10 @@
+from datetime import date
+from typing import Generic, Optional, TypeVar
+
 import models.core as core
+from pydantic import BaseModel
+
+T = TypeVar("T")
 
 
 class Author(core.Author):
@@ -6,7 +12,9 @@ class Author(core.Author):
 
 
 class Book(core.Book):
-    pass
+    is_available: bool = True
+    review_count: int = 0
+    average_rating: Optional[float] = None
 
 
 class Review(core.Review):
@@ -23,3 +31,56 @@ class LibraryCard(core.LibraryCard):
 
 class Loan(core.Loan):
     pass
+
+
+class TopBook(BaseModel):
+    id: int
+    title: str
+    review_count: int
+    average_rating: float
+    bayesian_rating: float
+
+
+class QueuedReview(BaseModel):
+    """
+    Review accepted for writing, its id is provisional until it is written
+    """
+
+    provisional_id: str
+    book_id: int
+    borrower_id: int
+    rating: int
+    comment: Optional[str] = None
+    review_date: date
+
+
+class SearchResult(BaseModel):
+    id: int
+    title: str
+    published_date: Optional[date] = None
+    review_count: int
+    average_rating: Optional[float] = None
+    rank: float
+
+
+class BatchItem(BaseModel, Generic[T]):
+    """
+    Result of one requested id in a batch lookup, missing ids are reported
+    per item instead of failing the whole request
+    """
+
+    id: int
+    found: bool
+    item: Optional[T] = None
+
+
+class LoanBatchItem(BaseModel):
+    """
+    Result of one requested book in a batch checkout or return, with the
+    status code the single item route would have answered
+    """
+
+    book_id: int
+    status_code: int
+    detail: Optional[str] = None
+    item: Optional[Loan] = None
@@ -0,0 +1,83 @@
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+import models.response as response
+from fastapi import Response, status
+from pydantic import BaseModel, TypeAdapter
+
+# Type adapters are compiled once at import. Rows are validated a single time,
+# from ORM objects or plain row mappings alike, and encoded straight to JSON
+# bytes by pydantic-core. Routes return the bytes so FastAPI neither validates
+# them against response_model again nor encodes them with the stdlib json.
+
+
+class JSONBytesResponse(Response):
+    media_type = "application/json"
+
+
+class Serializer:
+    """
+    Precompiled validation and JSON encoding of a response model
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._item = TypeAdapter(model)
+        self._items = TypeAdapter(List[model])
+
+    def dump(self, value: Any) -> bytes:
+        return self._item.dump_json(
+            self._item.validate_python(value, from_attributes=True)
+        )
+
+    def dump_many(self, values: Iterable[Any]) -> bytes:
+        return self._items.dump_json(
+            self._items.validate_python(values, from_attributes=True)
+        )
+
+    def response(
+        self,
+        value: Any,
+        status_code: int = status.HTTP_200_OK,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> JSONBytesResponse:
+        return JSONBytesResponse(
+            self.dump(value), status_code=status_code, headers=headers
+        )
+
+    def list_response(
+        self, values: Iterable[Any], headers: Optional[Dict[str, str]] = None
+    ) -> JSONBytesResponse:
+        return JSONBytesResponse(self.dump_many(values), headers=headers)
+
+
+AUTHOR = Serializer(response.Author)
+BOOK = Serializer(response.Book)
+REVIEW = Serializer(response.Review)
+BORROWER = Serializer(response.Borrower)
+LIBRARY_CARD = Serializer(response.LibraryCard)
+LOAN = Serializer(response.Loan)
+TOP_BOOK = Serializer(response.TopBook)
+SEARCH_RESULT = Serializer(response.SearchResult)
+QUEUED_REVIEW = Serializer(response.QueuedReview)
+LOAN_BATCH = Serializer(response.LoanBatchItem)
+
+_BATCH_SERIALIZERS: Dict[Type[BaseModel], Serializer] = {
+    model: Serializer(response.BatchItem[model])
+    for model in (response.Author, response.Book, response.Borrower)
+}
+
+_values = TypeAdapter(Dict[str, Any])
+
+
+def batch(model: Type[BaseModel]) -> Serializer:
+    """
+    Serializer of batch lookup items of given response model
+    """
+    return _BATCH_SERIALIZERS[model]
+
+
+def dump_values(values: Dict[str, Any]) -> bytes:
+    """
+    Encode a dict of JSON compatible values
+    """
+    return _values.dump_json(values)
@@ -1,14 +1,33 @@
 from database import Base
-from sqlalchemy import Column, Date, ForeignKey, Integer, String, Table, Text
-from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Computed,
+    Date,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    Text,
+    cast,
+    func,
+    literal_column,
+    select,
+    true,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import column_property, deferred, relationship
 
-# Many-to-Many relationship table
+# Many-to-Many relationship table. The composite primary key serves lookups
+# by book, authors' books are looked up through the author_id index
 book_author_table = Table(
     "book_author",
     Base.metadata,
-    Column("book_id", Integer, ForeignKey("books.id")),
-    Column("author_id", Integer, ForeignKey("authors.id")),
+    Column("book_id", Integer, ForeignKey("books.id"), primary_key=True),
+    Column("author_id", Integer, ForeignKey("authors.id"), primary_key=True),
+    Index("ix_book_author_author_id", "author_id"),
 )
 
 
@@ -20,12 +39,34 @@ class Author(Base):
     last_name = Column(String, nullable=False)
     biography = Column(Text, nullable=True)
 
+    # Names are not stemmed. Deferred, search only filters and ranks by it
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed("to_tsvector('simple', first_name || ' ' || last_name)"),
+        )
+    )
+
+    __table_args__ = (
+        Index("ix_authors_search_vector", search_vector, postgresql_using="gin"),
+    )
+
     # Many-to-Many relationship with Book
     books = relationship("Book", secondary=book_author_table, back_populates="authors")
 
-    @hybrid_property
-    def book_ids(self):
-        return [book.id for book in self.books]
+    # Book ids are aggregated straight from the association table in the same
+    # SELECT that loads the author, so the books collection is never touched
+    book_ids = column_property(
+        select(
+            func.coalesce(
+                func.array_agg(book_author_table.c.book_id),
+                literal_column("'{}'"),
+            )
+        )
+        .where(book_author_table.c.author_id == id)
+        .correlate_except(book_author_table)
+        .scalar_subquery()
+    )
 
     def __repr__(self):
         return f"<Author(id={self.id}, name='{self.first_name} {self.last_name}')>"
@@ -38,6 +79,40 @@ class Book(Base):
     title = Column(String, index=True)
     published_date = Column(Date, nullable=True)
 
+    # Denormalized state maintained by the routes writing loans and reviews
+    # in the same transaction, drift is repaired by reconciliation.reconcile_books
+    is_available = Column(Boolean, nullable=False, default=True, server_default=true())
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # NULL until the book has been reviewed
+    average_rating = column_property(
+        cast(rating_sum, Float).op("/")(func.nullif(review_count, 0))
+    )
+
+    search_vector = deferred(
+        Column(TSVECTOR, Computed("to_tsvector('english', coalesce(title, ''))"))
+    )
+
+    __table_args__ = (
+        # Supports "title LIKE 'prefix%'" filtering regardless of database collation
+        Index(
+            "ix_books_title_prefix",
+            "title",
+            postgresql_ops={"title": "text_pattern_ops"},
+        ),
+        # Keyset pagination over available books only touches available rows
+        Index("ix_books_available", "id", postgresql_where=is_available),
+        Index("ix_books_search_vector", search_vector, postgresql_using="gin"),
+        # Fuzzy title matching with pg_trgm similarity operators
+        Index(
+            "ix_books_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
+
     # One-to-One relationship with Loan (a book can have only one active loan)
     loan = relationship(
         "Loan", back_populates="book", uselist=False, cascade="all, delete-orphan"
@@ -58,12 +133,22 @@ class Review(Base):
     __tablename__ = "reviews"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
-    borrower_id = Column(Integer, ForeignKey("borrowers.id"), nullable=False)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False, index=True)
+    borrower_id = Column(
+        Integer, ForeignKey("borrowers.id"), nullable=False, index=True
+    )
     rating = Column(Integer, nullable=False)
     comment = Column(Text, nullable=True)
     review_date = Column(Date, nullable=False)
 
+    search_vector = deferred(
+        Column(TSVECTOR, Computed("to_tsvector('english', coalesce(comment, ''))"))
+    )
+
+    __table_args__ = (
+        Index("ix_reviews_search_vector", search_vector, postgresql_using="gin"),
+    )
+
     # Many-to-One relationship with Book
     book = relationship("Book", back_populates="reviews")
     borrower = relationship("Borrower", back_populates="reviews")
@@ -98,7 +183,7 @@ class LibraryCard(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     issue_date = Column(Date, nullable=True)
-    borrower_id = Column(Integer, ForeignKey("borrowers.id"))
+    borrower_id = Column(Integer, ForeignKey("borrowers.id"), index=True)
     borrower = relationship("Borrower", back_populates="library_card")
     loans = relationship("Loan", back_populates="library_card")
 
@@ -113,7 +198,9 @@ class Loan(Base):
     book_id = Column(
         Integer, ForeignKey("books.id"), unique=True, nullable=False
     )  # Ensures one active loan per book
-    library_card_id = Column(Integer, ForeignKey("library_cards.id"), nullable=False)
+    library_card_id = Column(
+        Integer, ForeignKey("library_cards.id"), nullable=False, index=True
+    )
     loan_date = Column(Date)
 
     book = relationship("Book", back_populates="loan")
@@ -0,0 +1,91 @@
+from typing import Iterator, List, NamedTuple, Tuple
+
+import models.sqlalchemy as sql
+from sqlalchemy import Engine, exists, func, or_, select, update
+
+# Values the denormalized columns of books must have according to loans and
+# reviews, correlated to the books row being checked
+EXPECTED_IS_AVAILABLE = ~exists().where(sql.Loan.book_id == sql.Book.id)
+EXPECTED_REVIEW_COUNT = (
+    select(func.count(sql.Review.id))
+    .where(sql.Review.book_id == sql.Book.id)
+    .scalar_subquery()
+)
+EXPECTED_RATING_SUM = (
+    select(func.coalesce(func.sum(sql.Review.rating), 0))
+    .where(sql.Review.book_id == sql.Book.id)
+    .scalar_subquery()
+)
+
+DRIFTED = or_(
+    sql.Book.is_available != EXPECTED_IS_AVAILABLE,
+    sql.Book.review_count != EXPECTED_REVIEW_COUNT,
+    sql.Book.rating_sum != EXPECTED_RATING_SUM,
+)
+
+
+class ReconciliationResult(NamedTuple):
+    checked: int
+    drifted: List[int]
+
+
+def id_batches(engine: Engine, batch_size: int) -> Iterator[Tuple[int, int]]:
+    with engine.connect() as connection:
+        low, high = connection.execute(
+            select(func.min(sql.Book.id), func.max(sql.Book.id))
+        ).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, batch_size):
+        yield start, min(start + batch_size - 1, high)
+
+
+def reconcile_books(
+    engine: Engine, batch_size: int = 10_000, repair: bool = True
+) -> ReconciliationResult:
+    """
+    Compare is_available, review_count and rating_sum of every book against
+    loans and reviews in batches of batch_size ids, one transaction per batch.
+
+    Args:
+        engine: (sync) engine of the database to reconcile
+        batch_size: amount of book ids checked per statement
+        repair: set drifted books to their expected values, when False
+            drifted books are only reported
+
+    Returns:
+        ReconciliationResult with the amount of checked books and the ids of
+        drifted books
+    """
+    checked = 0
+    drifted: List[int] = []
+    for start, end in id_batches(engine, batch_size):
+        in_batch = sql.Book.id.between(start, end)
+        with engine.begin() as connection:
+            checked += connection.scalar(
+                select(func.count(sql.Book.id)).where(in_batch)
+            )
+            # Drifted books are locked before they are recomputed, routes
+            # writing loans or reviews of a locked book wait for the repair.
+            # The update runs with a new snapshot that includes every write
+            # committed while the lock was awaited
+            batch_drifted = list(
+                connection.scalars(
+                    select(sql.Book.id)
+                    .where(in_batch, DRIFTED)
+                    .with_for_update(of=sql.Book)
+                )
+            )
+            if repair and batch_drifted:
+                connection.execute(
+                    update(sql.Book)
+                    .where(sql.Book.id.in_(batch_drifted), DRIFTED)
+                    .values(
+                        is_available=EXPECTED_IS_AVAILABLE,
+                        review_count=EXPECTED_REVIEW_COUNT,
+                        rating_sum=EXPECTED_RATING_SUM,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+        drifted.extend(batch_drifted)
+    return ReconciliationResult(checked=checked, drifted=drifted)
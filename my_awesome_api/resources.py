@@ -1,21 +1,49 @@
+import atexit
 from ast import literal_eval
-from typing import Any, Generator
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Generator, List, Optional
 
+import consistency as consistency
 import settings as settings
-from aws_secretsmanager_caching import SecretCache, SecretCacheConfig
-from boto3.session import Session
-from database import SQLDatabase
+from cache import (
+    InMemorySharedCache,
+    LocalCache,
+    LookupOnlyResponseCache,
+    ResponseCache,
+)
+from database import AsyncSQLDatabase, SQLDatabase
+from leaderboard import Leaderboard
+from review_queue import (
+    REVIEW_QUEUES,
+    InProcessReviewQueue,
+    ReviewWriter,
+    SQLiteReviewQueue,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session as SQLSession
 
-_aws_session: Session = None
+# boto3 and secrets cache are imported on first use, importing them adds
+# hundreds of milliseconds to every Lambda cold start
+if TYPE_CHECKING:
+    from aws_secretsmanager_caching import SecretCache
+    from boto3.session import Session
+
+_aws_session: "Session" = None
 _secrets_manager: Any = None
-_secret_cache: SecretCache = None
+_secret_cache: "SecretCache" = None
 _database: SQLDatabase = None
+_async_database: AsyncSQLDatabase = None
+_response_cache: ResponseCache = None
+_leaderboard: Leaderboard = None
+_review_writer: ReviewWriter = None
+# Cache without tiers, every lookup misses and nothing is stored
+_bypassed_response_cache = ResponseCache()
 
 
 def get_aws_session(region, use_profile=None):
     global _aws_session
     if _aws_session is None:
+        from boto3.session import Session
+
         _aws_session = Session(region_name=region, profile_name=use_profile)
     return _aws_session
 
@@ -31,12 +59,61 @@ def get_secrets_manager(region, use_profile=None):
 def get_secret_cache(region, use_profile=None):
     global _secret_cache
     if _secret_cache is None:
+        from aws_secretsmanager_caching import SecretCache, SecretCacheConfig
+
         client = get_secrets_manager(region, use_profile)
         cache_config = SecretCacheConfig()
         _secret_cache = SecretCache(config=cache_config, client=client)
     return _secret_cache
 
 
+def get_configured_secret_cache():
+    # When run locally we do not use aws secrets manager to fetch database secrets
+    if settings.ENV == "local":
+        return None
+    return get_secret_cache(region=settings.AWS_REGION)
+
+
+def _reader_endpoints(use_proxy=False) -> List[str]:
+    if use_proxy:
+        return [
+            endpoint for endpoint in [settings.RDS_PROXY_READER_ENDPOINT] if endpoint
+        ]
+    return settings.DATABASE_READER_ENDPOINTS
+
+
+def _database_arguments(use_proxy=False, use_secret_cache=None) -> dict:
+    if use_proxy:
+        database_endpoint = settings.RDS_PROXY_ENDPOINT
+    else:
+        database_endpoint = settings.DATABASE_ENDPOINT
+    if use_secret_cache:
+        database_credentials = literal_eval(
+            use_secret_cache.get_secret_string(settings.AWS_SECRET_NAME)
+        )
+        database_username = database_credentials["username"]
+        database_password = database_credentials["password"]
+    else:
+        database_username = settings.DATABASE_USERNAME
+        database_password = settings.DATABASE_PASSWORD
+    return dict(
+        username=database_username,
+        password=database_password,
+        endpoint=database_endpoint,
+        port=settings.DATABASE_PORT,
+        database=settings.DATABASE_NAME,
+        pool_profile=settings.DATABASE_POOL_PROFILE,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        slow_query_threshold=settings.SLOW_QUERY_THRESHOLD_MS / 1000,
+        reader_endpoints=_reader_endpoints(use_proxy),
+        reader_selection=settings.DATABASE_READER_SELECTION,
+        query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+    )
+
+
 def get_database(use_proxy=False, use_secret_cache=None) -> SQLDatabase:
     """
     Helper function (works for fastapi dependency injection) to fetch
@@ -52,31 +129,194 @@ def get_database(use_proxy=False, use_secret_cache=None) -> SQLDatabase:
     """
     global _database
     if _database is None:
-        if use_proxy:
-            database_endpoint = settings.RDS_PROXY_ENDPOINT
+        _database = SQLDatabase(**_database_arguments(use_proxy, use_secret_cache))
+        print(f"Connection established to database: {_database.engine.url}")
+    return _database
+
+
+def get_async_database(use_proxy=False, use_secret_cache=None) -> AsyncSQLDatabase:
+    """
+    Async counterpart of get_database using asyncpg driver
+
+    Args:
+        use_proxy (bool): Enables switching between RDS Proxy and direct RDS connection
+        use_secret_cache (SecretCache): Fetch database secrets from Secrets Manager
+        instead from local .env file
+
+    Returns:
+        AsyncSQLDatabase: SQLAlchemy async database instance connected to database
+    """
+    global _async_database
+    if _async_database is None:
+        _async_database = AsyncSQLDatabase(
+            **_database_arguments(use_proxy, use_secret_cache),
+            prepared_statement_cache_size=settings.DATABASE_PREPARED_STATEMENT_CACHE_SIZE,
+        )
+        print(f"Connection established to database: {_async_database.engine.url}")
+    return _async_database
+
+
+def get_configured_database() -> SQLDatabase:
+    """
+    Singleton database configured from settings. The engine is created
+    lazily on first use instead of during module import
+    """
+    if _database is not None:
+        return _database
+    return get_database(
+        use_proxy=settings.USE_PROXY, use_secret_cache=get_configured_secret_cache()
+    )
+
+
+def get_configured_async_database() -> AsyncSQLDatabase:
+    """
+    Async counterpart of get_configured_database
+    """
+    if _async_database is not None:
+        return _async_database
+    return get_async_database(
+        use_proxy=settings.USE_PROXY, use_secret_cache=get_configured_secret_cache()
+    )
+
+
+def warm_up_database():
+    """
+    Create the configured engine and open the first connection ahead of the
+    first request, e.g. during Lambda init phase
+    """
+    if settings.USE_ASYNC:
+        # Async connections are bound to the event loop serving requests
+        get_configured_async_database()
+        return
+    with get_configured_database().engine.connect():
+        pass
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Singleton response cache configured from settings. When caching is
+    disabled the cache has no tiers and every lookup is a miss
+
+    Returns:
+        ResponseCache: Cache of serialized entity responses
+    """
+    global _response_cache
+    if _response_cache is None:
+        if not settings.RESPONSE_CACHE_ENABLED:
+            _response_cache = ResponseCache()
         else:
-            database_endpoint = settings.DATABASE_ENDPOINT
-        if use_secret_cache:
-            database_credentials = literal_eval(
-                use_secret_cache.get_secret_string(settings.AWS_SECRET_NAME)
+            shared_tiers = {"none": None, "memory": InMemorySharedCache}
+            shared_tier = shared_tiers[settings.RESPONSE_CACHE_SHARED]
+            _response_cache = ResponseCache(
+                local=LocalCache(max_size=settings.RESPONSE_CACHE_MAX_SIZE),
+                shared=shared_tier() if shared_tier is not None else None,
+                ttl=settings.RESPONSE_CACHE_TTL,
+                invalidation_grace=settings.RESPONSE_CACHE_INVALIDATION_GRACE,
+            )
+    return _response_cache
+
+
+def get_read_response_cache() -> ResponseCache:
+    """
+    Response cache of read routes whose entries are invalidated by writes
+    instead of keyed by version. It is bypassed while the client reads its own
+    writes, and bodies read from a reader are looked up but never stored
+
+    Returns:
+        ResponseCache: Cache of serialized entity responses
+    """
+    if consistency.reads_from_writer():
+        return _bypassed_response_cache
+    response_cache = get_response_cache()
+    if response_cache.enabled and _reader_endpoints(settings.USE_PROXY):
+        return LookupOnlyResponseCache(response_cache)
+    return response_cache
+
+
+def get_leaderboard() -> Leaderboard:
+    """
+    Singleton in-process leaderboard configured from settings
+
+    Returns:
+        Leaderboard: Top books of every ranking
+    """
+    global _leaderboard
+    if _leaderboard is None:
+        _leaderboard = Leaderboard(
+            size=settings.LEADERBOARD_SIZE, ttl=settings.LEADERBOARD_TTL
+        )
+    return _leaderboard
+
+
+def get_review_writer() -> Optional[ReviewWriter]:
+    """
+    Singleton write-behind of reviews configured from settings, started on
+    first use. None unless write-behind is enabled. Refused on Lambda, which
+    freezes the writer thread between invocations and never runs atexit, so
+    reviews accepted with 202 would be lost with the execution environment
+
+    Returns:
+        ReviewWriter: Queue of reviews and the background thread writing them
+    """
+    global _review_writer
+    if _review_writer is None and settings.REVIEW_WRITE_BEHIND:
+        if settings.REVIEW_QUEUE not in REVIEW_QUEUES:
+            raise ValueError(
+                f"Unknown review queue: {settings.REVIEW_QUEUE}, "
+                f"expected one of {REVIEW_QUEUES}"
             )
-            database_username = database_credentials["username"]
-            database_password = database_credentials["password"]
+        # Both queues live in the execution environment, only a durable
+        # external queue would keep reviews queued on Lambda
+        if settings.RUNS_ON_LAMBDA:
+            raise ValueError(
+                f"REVIEW_WRITE_BEHIND is not supported on Lambda with the "
+                f"{settings.REVIEW_QUEUE} review queue"
+            )
+        if settings.REVIEW_QUEUE == "sqlite":
+            queue = SQLiteReviewQueue(settings.REVIEW_QUEUE_PATH)
         else:
-            database_username = settings.DATABASE_USERNAME
-            database_password = settings.DATABASE_PASSWORD
-        _database = SQLDatabase(
-            username=database_username,
-            password=database_password,
-            endpoint=database_endpoint,
-            port=settings.DATABASE_PORT,
-            database=settings.DATABASE_NAME,
+            queue = InProcessReviewQueue()
+        # Batches are written by a thread, with the sync engine in async mode too
+        _review_writer = ReviewWriter(
+            queue,
+            get_configured_database().engine,
+            batch_size=settings.REVIEW_BATCH_SIZE,
+            flush_interval=settings.REVIEW_FLUSH_INTERVAL,
+            max_attempts=settings.REVIEW_MAX_ATTEMPTS,
+            response_cache=get_response_cache(),
+            leaderboard=get_leaderboard(),
         )
-        print(f"Connection established to database: {_database.engine.url}")
-    return _database
+        _review_writer.start()
+        # Reviews still queued on shutdown are written before exiting
+        atexit.register(_review_writer.stop)
+    return _review_writer
 
 
 def database_session() -> Generator[SQLSession, None, None]:
-    _db: SQLDatabase = get_database()
+    _db: SQLDatabase = get_configured_database()
     with _db.create_session() as session:
         yield session
+
+
+async def async_database_session() -> AsyncGenerator[AsyncSession, None]:
+    _db: AsyncSQLDatabase = get_configured_async_database()
+    async with _db.create_session() as session:
+        yield session
+
+
+def read_only_database_session() -> Generator[SQLSession, None, None]:
+    """
+    Session for routes that only read. Bound to a reader when readers are
+    configured, unless the client wrote within the read-your-writes window
+    """
+    _db: SQLDatabase = get_configured_database()
+    with _db.create_session(use_reader=not consistency.reads_from_writer()) as session:
+        yield session
+
+
+async def async_read_only_database_session() -> AsyncGenerator[AsyncSession, None]:
+    _db: AsyncSQLDatabase = get_configured_async_database()
+    async with _db.create_session(
+        use_reader=not consistency.reads_from_writer()
+    ) as session:
+        yield session
@@ -0,0 +1,432 @@
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import cache as cache
+import models.sqlalchemy as sql
+from leaderboard import Leaderboard, LeaderboardEntry
+from sqlalchemy import (
+    Date,
+    Engine,
+    Integer,
+    Text,
+    column,
+    exists,
+    func,
+    insert,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+REVIEW_QUEUES = ("memory", "sqlite")
+
+QUEUED_REVIEW_COLUMNS = ("book_id", "borrower_id", "rating", "comment", "review_date")
+
+
+class QueuedReview(NamedTuple):
+    provisional_id: str
+    book_id: int
+    borrower_id: int
+    rating: int
+    comment: Optional[str]
+    review_date: date
+
+
+class ReviewQueue(ABC):
+    """
+    Minimal interface of a queue of reviews waiting to be written. Taken
+    reviews stay in flight until they are acknowledged once written, or
+    released to be taken again when writing them failed
+    """
+
+    @abstractmethod
+    def put(self, review: QueuedReview): ...
+
+    @abstractmethod
+    def take(self, max_items: int, timeout: float) -> List[QueuedReview]:
+        """
+        Wait up to timeout seconds for max_items reviews and take the oldest
+        max_items of the queued ones, possibly none
+        """
+
+    @abstractmethod
+    def ack(self, reviews: List[QueuedReview]): ...
+
+    @abstractmethod
+    def release(self, reviews: List[QueuedReview]): ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+
+class InProcessReviewQueue(ReviewQueue):
+    """
+    Queue kept in process memory, queued reviews are lost with the process
+    """
+
+    def __init__(self):
+        self._reviews: "deque[QueuedReview]" = deque()
+        self._condition = threading.Condition()
+
+    def put(self, review: QueuedReview):
+        with self._condition:
+            self._reviews.append(review)
+            self._condition.notify()
+
+    def take(self, max_items: int, timeout: float) -> List[QueuedReview]:
+        with self._condition:
+            self._condition.wait_for(
+                lambda: len(self._reviews) >= max_items, timeout=timeout
+            )
+            amount = min(max_items, len(self._reviews))
+            return [self._reviews.popleft() for _ in range(amount)]
+
+    def ack(self, reviews: List[QueuedReview]):
+        pass
+
+    def release(self, reviews: List[QueuedReview]):
+        with self._condition:
+            self._reviews.extendleft(reversed(reviews))
+            self._condition.notify()
+
+    def __len__(self) -> int:
+        return len(self._reviews)
+
+
+class SQLiteReviewQueue(ReviewQueue):
+    """
+    Queue persisted in a SQLite database, local stand-in for a durable queue
+    (e.g. SQS) for tests and local development. Reviews taken but never
+    acknowledged are taken again after a restart, so a review is written at
+    least once
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS queued_reviews ("
+            "position INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "provisional_id TEXT NOT NULL UNIQUE, "
+            "review TEXT NOT NULL)"
+        )
+        # Position of the last taken review, reviews up to it are in flight
+        self._taken = 0
+        self._condition = threading.Condition()
+
+    def put(self, review: QueuedReview):
+        with self._condition:
+            self._connection.execute(
+                "INSERT INTO queued_reviews (provisional_id, review) VALUES (?, ?)",
+                (review.provisional_id, _dump_review(review)),
+            )
+            self._condition.notify()
+
+    def take(self, max_items: int, timeout: float) -> List[QueuedReview]:
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._waiting() >= max_items, timeout=timeout
+            )
+            rows = self._connection.execute(
+                "SELECT position, review FROM queued_reviews WHERE position > ? "
+                "ORDER BY position LIMIT ?",
+                (self._taken, max_items),
+            ).fetchall()
+            if rows:
+                self._taken = rows[-1][0]
+            return [_load_review(review) for _, review in rows]
+
+    def ack(self, reviews: List[QueuedReview]):
+        with self._condition:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "DELETE FROM queued_reviews WHERE provisional_id = ?",
+                [(review.provisional_id,) for review in reviews],
+            )
+            self._connection.execute("COMMIT")
+
+    def release(self, reviews: List[QueuedReview]):
+        with self._condition:
+            # Every review not acknowledged yet is taken again
+            self._taken = 0
+            self._condition.notify()
+
+    def __len__(self) -> int:
+        with self._condition:
+            return self._connection.execute(
+                "SELECT count(*) FROM queued_reviews"
+            ).fetchone()[0]
+
+    def _waiting(self) -> int:
+        return self._connection.execute(
+            "SELECT count(*) FROM queued_reviews WHERE position > ?", (self._taken,)
+        ).fetchone()[0]
+
+
+def _dump_review(review: QueuedReview) -> str:
+    return json.dumps(review._replace(review_date=review.review_date.isoformat()))
+
+
+def _load_review(value: str) -> QueuedReview:
+    review = QueuedReview(*json.loads(value))
+    return review._replace(review_date=date.fromisoformat(review.review_date))
+
+
+def write_reviews(
+    connection: Connection, reviews: Iterable[QueuedReview]
+) -> List[Tuple[LeaderboardEntry, int]]:
+    """
+    Insert given reviews with one multi-row INSERT and add them to the rating
+    aggregates of their books in the same statement. Reviews of books or
+    borrowers deleted since they were queued are dropped
+
+    Returns:
+        List[Tuple[LeaderboardEntry, int]]: New aggregates of every reviewed
+        book with the amount of its reviews written
+    """
+    reviews = list(reviews)
+    # Reviewed books are locked in id order, concurrent writers of the same
+    # books then wait for each other instead of deadlocking
+    connection.execute(
+        select(sql.Book.id)
+        .where(sql.Book.id.in_({review.book_id for review in reviews}))
+        .order_by(sql.Book.id)
+        .with_for_update()
+    )
+    queued = values(
+        column("book_id", Integer),
+        column("borrower_id", Integer),
+        column("rating", Integer),
+        column("comment", Text),
+        column("review_date", Date),
+        name="queued",
+    ).data([review[1:] for review in reviews])
+    inserted = (
+        insert(sql.Review)
+        .from_select(
+            QUEUED_REVIEW_COLUMNS,
+            select(queued)
+            .where(exists().where(sql.Book.id == queued.c.book_id))
+            .where(exists().where(sql.Borrower.id == queued.c.borrower_id)),
+        )
+        .returning(sql.Review.book_id, sql.Review.rating)
+        .cte("inserted")
+    )
+    totals = (
+        select(
+            inserted.c.book_id,
+            func.count().label("review_count"),
+            func.sum(inserted.c.rating).label("rating_sum"),
+        )
+        .group_by(inserted.c.book_id)
+        .subquery("totals")
+    )
+    rows = connection.execute(
+        update(sql.Book)
+        .where(sql.Book.id == totals.c.book_id)
+        .values(
+            review_count=sql.Book.review_count + totals.c.review_count,
+            rating_sum=sql.Book.rating_sum + totals.c.rating_sum,
+        )
+        .returning(
+            sql.Book.id,
+            sql.Book.title,
+            sql.Book.review_count,
+            sql.Book.rating_sum,
+            totals.c.review_count.label("written"),
+        )
+    )
+    return [(LeaderboardEntry(*row[:4]), row.written) for row in rows]
+
+
+class ReviewWriter:
+    """
+    Write-behind of reviews. Reviews are queued by the routes and a background
+    thread writes them in batches of up to batch_size, or whatever was queued
+    within flush_interval seconds, one transaction per batch. A batch failing
+    for another reason than the database being unreachable is split in halves
+    until the reviews failing alone are found, those are dropped and logged
+    after max_attempts failed writes
+    """
+
+    def __init__(
+        self,
+        queue: ReviewQueue,
+        engine: Engine,
+        *,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        retry_interval: float = 5,
+        max_attempts: int = 5,
+        response_cache: Optional[cache.ResponseCache] = None,
+        leaderboard: Optional[Leaderboard] = None,
+    ):
+        self.queue = queue
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self.response_cache = response_cache
+        self.leaderboard = leaderboard
+        self.queued = 0
+        self.batches = 0
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        # Failed writes by provisional id of the reviews failing alone
+        self._attempts: Dict[str, int] = {}
+        # Counters are updated by the routes and the writer thread
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enqueue(
+        self, book_id: int, borrower_id: int, rating: int, comment: Optional[str]
+    ) -> QueuedReview:
+        review = QueuedReview(
+            uuid.uuid4().hex, book_id, borrower_id, rating, comment, date.today()
+        )
+        self.queue.put(review)
+        with self._lock:
+            self.queued += 1
+        return review
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="review-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Write the reviews still queued and stop the background thread
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def flush(self, timeout: float = 0) -> int:
+        """
+        Write one batch of queued reviews, returns the amount taken from
+        the queue
+        """
+        reviews = self.queue.take(self.batch_size, timeout)
+        if not reviews:
+            return 0
+        self._write(reviews)
+        return len(reviews)
+
+    def _write(self, reviews: List[QueuedReview]):
+        try:
+            with self.engine.begin() as connection:
+                written_books = write_reviews(connection, reviews)
+        except OperationalError:
+            # Database unreachable, the whole batch is taken again later
+            self._count(failures=1)
+            self.queue.release(reviews)
+            raise
+        except Exception:
+            self._count(failures=1)
+            if len(reviews) == 1:
+                if self._retry_later(reviews[0]):
+                    raise
+                return
+            middle = len(reviews) // 2
+            halves = [reviews[:middle], reviews[middle:]]
+            error = None
+            for index, half in enumerate(halves):
+                try:
+                    self._write(half)
+                except OperationalError:
+                    for remaining in halves[index + 1 :]:
+                        self.queue.release(remaining)
+                    raise
+                except Exception as half_error:
+                    error = half_error
+            if error is not None:
+                raise error
+            return
+        self.queue.ack(reviews)
+        with self._lock:
+            for review in reviews:
+                self._attempts.pop(review.provisional_id, None)
+
+        written = sum(amount for _, amount in written_books)
+        self._count(batches=1, written=written, dropped=len(reviews) - written)
+        if self.response_cache is not None and self.response_cache.enabled:
+            self.response_cache.invalidate(
+                *{cache.borrower_key(review.borrower_id) for review in reviews},
+            )
+        if self.leaderboard is not None:
+            for entry, _ in written_books:
+                self.leaderboard.record_review(entry)
+
+    def _retry_later(self, review: QueuedReview) -> bool:
+        """
+        Release a review failing alone to be taken again, or drop it once it
+        failed max_attempts times. Attempts are counted in process, a restart
+        gives every review max_attempts more
+        """
+        with self._lock:
+            attempts = self._attempts.get(review.provisional_id, 0) + 1
+            self._attempts[review.provisional_id] = attempts
+        if attempts < self.max_attempts:
+            self.queue.release([review])
+            return True
+        self.queue.ack([review])
+        with self._lock:
+            self._attempts.pop(review.provisional_id, None)
+            self.dead_lettered += 1
+        logger.error(
+            "Dropped queued review after %d failed writes: %s",
+            attempts,
+            _dump_review(review),
+        )
+        return False
+
+    def _count(self, **amounts: int):
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def status(self) -> dict:
+        with self._lock:
+            counters = {
+                "queued": self.queued,
+                "batches": self.batches,
+                "written": self.written,
+                "dropped": self.dropped,
+                "dead_lettered": self.dead_lettered,
+                "failures": self.failures,
+            }
+        return {"depth": len(self.queue), **counters}
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.flush(self.flush_interval)
+            except Exception:
+                logger.exception("Writing queued reviews failed")
+                self._stopping.wait(self.retry_interval)
+        # Drain what was queued before stopping
+        try:
+            while self.flush():
+                pass
+        except Exception:
+            logger.exception("Writing queued reviews failed, %d left", len(self.queue))
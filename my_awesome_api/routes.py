@@ -1,48 +1,389 @@
 from datetime import date
-from typing import Generator, List
+from typing import Dict, Generator, Iterable, List, Literal, Optional, Tuple
 
+import cache as cache
+import consistency as consistency
+import etags as etags
+import fieldsets as fieldsets
+import leaderboard as leaderboard
+import models.loaders as loaders
 import models.request as request
+import models.serializers as serializers
 import models.response as response
 import models.sqlalchemy as sql
 import resources as resources
+import review_queue as review_queue
+import search as search
 import settings as settings
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import parse_obj_as
+from database import constraint_name
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, delete, exists, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session as SQLSession
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Postgres default names of the foreign keys on loans table
+LOAN_FOREIGN_KEY_ERRORS = {
+    "loans_book_id_fkey": "Book not found",
+    "loans_library_card_id_fkey": "Library Card not found",
+}
+
+# The book is checked by the update of its rating aggregates, a review of an
+# unknown borrower fails on the foreign key
+REVIEW_FOREIGN_KEY_ERRORS = {
+    "reviews_borrower_id_fkey": "Borrower not found",
+}
+
+
+def by_id(entity):
+    """
+    Select of entity by primary key bound to the "id" parameter. Sessions are
+    request-scoped so session.get() never finds the object in the identity
+    map, a select built once at import skips building the query per request
+    """
+    return select(entity).where(entity.id == bindparam("id"))
+
+
+AUTHOR_BY_ID = by_id(sql.Author)
+BOOK_BY_ID = by_id(sql.Book)
+BORROWER_BY_ID = by_id(sql.Borrower)
+LIBRARY_CARD_BY_ID = by_id(sql.LibraryCard)
+LOAN_BY_ID = by_id(sql.Loan)
+# With the relationships the full response model embeds
+BOOK_RESPONSE_BY_ID = BOOK_BY_ID.options(*loaders.loader_options(response.Book))
+BORROWER_RESPONSE_BY_ID = BORROWER_BY_ID.options(
+    *loaders.loader_options(response.Borrower)
+)
+LIBRARY_CARD_RESPONSE_BY_ID = LIBRARY_CARD_BY_ID.options(
+    *loaders.loader_options(response.LibraryCard)
+)
+
+
+def review_targets_statement(book_id: int, borrower_id: int):
+    """
+    Id of given book and whether given borrower exists, in a single round
+    trip. No row when the book does not exist
+    """
+    return select(
+        sql.Book.id, exists().where(sql.Borrower.id == borrower_id).label("borrower")
+    ).where(sql.Book.id == book_id)
+
+
+def validate_batch_ids(ids: List[int]) -> List[int]:
+    if not ids:
+        raise HTTPException(status_code=422, detail="At least one id is required")
+    if len(ids) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.MAX_BATCH_SIZE} ids can be requested at once",
+        )
+    return ids
+
+
+def checkout_statement(library_card_id: int, book_ids: Iterable[int]):
+    """
+    Loan every existing book of book_ids that is not already on loan to given
+    library card in a single multi-row insert. Books are inserted in id order
+    so that concurrent checkouts lock them in the same order
+    """
+    books = (
+        select(sql.Book.id, literal(library_card_id), literal(date.today()))
+        .where(sql.Book.id.in_(set(book_ids)))
+        .order_by(sql.Book.id)
+    )
+    return (
+        insert(sql.Loan)
+        .from_select(["book_id", "library_card_id", "loan_date"], books)
+        .on_conflict_do_nothing(index_elements=[sql.Loan.book_id])
+        .returning(*loaders.LOAN_COLUMNS)
+    )
+
+
+def return_statement(library_card_id: int, book_ids: Iterable[int]):
+    """
+    Delete the loans of book_ids held by given library card
+    """
+    return (
+        delete(sql.Loan)
+        .where(
+            sql.Loan.library_card_id == library_card_id,
+            sql.Loan.book_id.in_(set(book_ids)),
+        )
+        .returning(*loaders.LOAN_COLUMNS)
+    )
+
+
+def set_availability(book_ids: Iterable[int], is_available: bool):
+    return (
+        update(sql.Book)
+        .where(sql.Book.id.in_(set(book_ids)))
+        .values(is_available=is_available)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def loan_batch_items(
+    book_ids: List[int],
+    loans,
+    success_status: int,
+    failures: Dict[int, Tuple[int, str]],
+) -> Response:
+    """
+    Batch checkout or return result in the order of requested book ids
+    """
+    loans_by_book = {loan["book_id"]: loan for loan in loans}
+    items = []
+    for book_id in book_ids:
+        loan = loans_by_book.get(book_id)
+        if loan is not None:
+            items.append(
+                {"book_id": book_id, "status_code": success_status, "item": loan}
+            )
+            continue
+        status_code, detail = failures[book_id]
+        items.append({"book_id": book_id, "status_code": status_code, "detail": detail})
+    return serializers.LOAN_BATCH.list_response(items)
+
+
+def loan_batch_invalidations(borrower_id: Optional[int], loans) -> List[str]:
+    return [cache.borrower_key(borrower_id)] + [
+        cache.loan_key(loan["id"]) for loan in loans
+    ]
+
+
+def query_ids(
+    ids: List[str] = Query(..., description="Repeated or comma separated ids")
+) -> List[int]:
+    try:
+        parsed = [
+            int(part) for value in ids for part in value.split(",") if part.strip()
+        ]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Ids must be integers")
+    return validate_batch_ids(parsed)
+
+
+def batch_items(response_model, entities, ids: List[int]) -> Response:
+    """
+    Batch result in the order of requested ids, including missing ones
+    """
+    found = {entity.id: entity for entity in entities}
+    return serializers.batch(response_model).list_response(
+        [
+            {
+                "id": requested_id,
+                "found": requested_id in found,
+                "item": found.get(requested_id),
+            }
+            for requested_id in ids
+        ]
+    )
+
+
+def _get_batch(session: SQLSession, entity, response_model, ids: List[int]):
+    # One IN query for the entities plus one per eagerly loaded relationship
+    entities = session.scalars(
+        select(entity)
+        .options(*loaders.loader_options(response_model))
+        .filter(entity.id.in_(set(ids)))
+    ).all()
+    return batch_items(response_model, entities, ids)
+
+
+@router.get("/authors", response_model=List[response.BatchItem[response.Author]])
+def get_authors(
+    ids: List[int] = Depends(query_ids),
+    session: SQLSession = Depends(resources.read_only_database_session),
+):
+    return _get_batch(session, sql.Author, response.Author, ids)
+
+
+@router.post(
+    "/authors:batchGet", response_model=List[response.BatchItem[response.Author]]
+)
+def batch_get_authors(
+    batch: request.BatchGet,
+    session: SQLSession = Depends(resources.read_only_database_session),
+):
+    return _get_batch(
+        session, sql.Author, response.Author, validate_batch_ids(batch.ids)
+    )
+
 
 @router.get("/authors/{author_id}", response_model=response.Author)
 def get_author(
-    author_id: int, session: SQLSession = Depends(resources.database_session)
+    author_id: int,
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.Author, sql.Author)
+    ),
+    session: SQLSession = Depends(resources.read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_read_response_cache),
 ):
-    author = session.query(sql.Author).filter(sql.Author.id == author_id).first()
+    if fieldset is not None:
+        author = session.scalars(
+            AUTHOR_BY_ID.options(*fieldset.options()), {"id": author_id}
+        ).first()
+        if author is None:
+            raise HTTPException(status_code=404, detail="Author not found")
+        return fieldset.response(author)
+
+    cached = response_cache.cached_response(cache.author_key(author_id))
+    if cached is not None:
+        return cached
+    author = session.scalars(AUTHOR_BY_ID, {"id": author_id}).first()
     if author is None:
         raise HTTPException(status_code=404, detail="Author not found")
-    return response.Author.model_validate(author)
+    return response_cache.store_response(
+        cache.author_key(author_id), serializers.AUTHOR.dump(author)
+    )
+
+
+@router.get("/books", response_model=List[response.BatchItem[response.Book]])
+def get_books(
+    ids: List[int] = Depends(query_ids),
+    session: SQLSession = Depends(resources.read_only_database_session),
+):
+    return _get_batch(session, sql.Book, response.Book, ids)
+
+
+@router.post("/books:batchGet", response_model=List[response.BatchItem[response.Book]])
+def batch_get_books(
+    batch: request.BatchGet,
+    session: SQLSession = Depends(resources.read_only_database_session),
+):
+    return _get_batch(session, sql.Book, response.Book, validate_batch_ids(batch.ids))
+
+
+@router.get("/books/top", response_model=List[response.TopBook])
+def get_top_books(
+    by: Literal["rating", "reviews"] = "rating",
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.LEADERBOARD_SIZE),
+    session: SQLSession = Depends(resources.read_only_database_session),
+    book_leaderboard: leaderboard.Leaderboard = Depends(resources.get_leaderboard),
+):
+    top_books = book_leaderboard.top(by, limit)
+    if top_books is None:
+        rows = session.execute(
+            leaderboard.leaderboard_statement(by, book_leaderboard.size)
+        )
+        book_leaderboard.load(by, rows)
+        top_books = book_leaderboard.top(by, limit)
+    return serializers.TOP_BOOK.list_response(top_books)
 
 
 @router.get("/books/{book_id}", response_model=response.Book)
-def get_book(book_id: int, session: SQLSession = Depends(resources.database_session)):
-    book = session.query(sql.Book).filter(sql.Book.id == book_id).first()
+def get_book(
+    book_id: int,
+    if_none_match: Optional[str] = Header(None),
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.Book, sql.Book)
+    ),
+    session: SQLSession = Depends(resources.read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    # Version is checked before anything else so that unchanged resources are
+    # answered without loading relationships or validating models
+    version = session.scalar(etags.book_version(book_id))
+    if version is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    book_etag = etags.etag(version)
+    if etags.etag_matches(if_none_match, book_etag):
+        return etags.not_modified(book_etag)
+
+    if fieldset is not None:
+        # Sparse representations are not cached, they are cheap to build
+        book = session.scalars(
+            BOOK_BY_ID.options(*fieldset.options()), {"id": book_id}
+        ).first()
+        if book is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return fieldset.response(book, headers={"ETag": book_etag})
+
+    # The body is loaded after the version, it is never older than the version
+    # it is cached under
+    cached = response_cache.cached_response(cache.book_key(book_id, version))
+    if cached is not None:
+        cached.headers["ETag"] = book_etag
+        return cached
+    book = session.scalars(BOOK_RESPONSE_BY_ID, {"id": book_id}).first()
     if book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return response.Book.model_validate(book)
+    book_response = response_cache.store_response(
+        cache.book_key(book_id, version), serializers.BOOK.dump(book)
+    )
+    book_response.headers["ETag"] = book_etag
+    return book_response
 
 
 @router.get("/books/available/", response_model=List[response.Book])
-def get_available_books(session: SQLSession = Depends(resources.database_session)):
-    # Query to get books that do not have any loans
-    subquery = session.query(sql.Loan.book_id).subquery()
-    available_books = (
-        session.query(sql.Book)
-        .outerjoin(subquery, sql.Book.id == subquery.c.book_id)
-        .filter(subquery.c.book_id == None)
-        .limit(10)
-        .all()
+def get_available_books(
+    after: Optional[int] = Query(
+        None, description="Return books with id greater than this cursor"
+    ),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    title_prefix: Optional[str] = Query(None, min_length=1),
+    published_after: Optional[date] = None,
+    published_before: Optional[date] = None,
+    session: SQLSession = Depends(resources.read_only_database_session),
+):
+    # Books that do not have any loans, paginated by keyset on books.id.
+    # The partial index ix_books_available only contains available books
+    statement = (
+        select(sql.Book)
+        .options(*loaders.loader_options(response.Book))
+        .where(sql.Book.is_available)
     )
-    return parse_obj_as(List[response.Book], available_books)
+    if after is not None:
+        statement = statement.where(sql.Book.id > after)
+    if title_prefix is not None:
+        statement = statement.where(
+            sql.Book.title.startswith(title_prefix, autoescape=True)
+        )
+    if published_after is not None:
+        statement = statement.where(sql.Book.published_date >= published_after)
+    if published_before is not None:
+        statement = statement.where(sql.Book.published_date <= published_before)
+    available_books = session.scalars(
+        statement.order_by(sql.Book.id).limit(limit)
+    ).all()
+
+    # Cursor for the next page is passed in header to keep the response a plain list
+    headers = {}
+    if len(available_books) == limit:
+        headers["X-Next-Cursor"] = str(available_books[-1].id)
+    return serializers.BOOK.list_response(available_books, headers=headers)
+
+
+@router.get("/search", response_model=List[response.SearchResult])
+def search_books(
+    q: str = Query(..., min_length=1, max_length=256),
+    after: Optional[str] = Query(
+        None, description="Return results after this cursor of X-Next-Cursor"
+    ),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    session: SQLSession = Depends(resources.read_only_database_session),
+):
+    # Books matching q in their title, author names or review comments, ranked
+    # and paginated by keyset on (rank, books.id)
+    try:
+        cursor = search.decode_cursor(after) if after is not None else None
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    results = session.execute(
+        search.search_statement(q, limit, cursor, settings.SEARCH_MAX_CANDIDATES)
+    ).all()
+
+    headers = {}
+    if len(results) == limit:
+        headers["X-Next-Cursor"] = search.encode_cursor(
+            results[-1].rank, results[-1].id
+        )
+    return serializers.SEARCH_RESULT.list_response(results, headers=headers)
 
 
 @router.post(
@@ -54,46 +395,204 @@ def create_loan(
     book_id: int,
     loan: request.Loan,
     session: SQLSession = Depends(resources.database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
 ):
-    book = session.query(sql.Book).filter(sql.Book.id == book_id).first()
-    library_card = (
-        session.query(sql.LibraryCard)
-        .filter(sql.LibraryCard.id == loan.library_card_id)
-        .first()
+    # Single round trip: the unique constraint on loans.book_id decides whether
+    # the book is already on loan and foreign keys validate book and library card
+    statement = (
+        insert(sql.Loan)
+        .values(
+            book_id=book_id,
+            library_card_id=loan.library_card_id,
+            loan_date=date.today(),
+        )
+        .on_conflict_do_nothing(index_elements=[sql.Loan.book_id])
+        .returning(sql.Loan)
     )
+    try:
+        new_loan = session.scalars(statement).one_or_none()
+    except IntegrityError as error:
+        detail = LOAN_FOREIGN_KEY_ERRORS.get(constraint_name(error))
+        if detail is None:
+            raise
+        raise HTTPException(status_code=404, detail=detail)
 
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    if not library_card:
-        raise HTTPException(status_code=404, detail="Library Card not found")
-
-    # Check if the book is already loaned out
-    existing_loan = session.query(sql.Loan).filter(sql.Loan.book_id == book_id).first()
-    if existing_loan:
+    if new_loan is None:
+        # Foreign keys are not checked when the insert is skipped on conflict
+        library_card_id = session.scalar(
+            select(sql.LibraryCard.id).where(sql.LibraryCard.id == loan.library_card_id)
+        )
+        if library_card_id is None:
+            raise HTTPException(status_code=404, detail="Library Card not found")
         raise HTTPException(status_code=409, detail="Book is already on loan")
+    session.execute(
+        update(sql.Book).where(sql.Book.id == book_id).values(is_available=False)
+    )
 
-    new_loan = sql.Loan(
-        book_id=book_id,
-        library_card_id=library_card.id,
-        loan_date=date.today(),
+    if response_cache.enabled:
+        borrower_id = session.scalar(
+            select(sql.LibraryCard.borrower_id).filter(
+                sql.LibraryCard.id == new_loan.library_card_id
+            )
+        )
+        cache.invalidate_on_commit(
+            session,
+            response_cache,
+            cache.borrower_key(borrower_id),
+        )
+    return serializers.LOAN.response(new_loan, status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/loans:batchCreate", response_model=List[response.LoanBatchItem])
+def batch_create_loans(
+    batch: request.LoanBatch,
+    session: SQLSession = Depends(resources.database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    book_ids = validate_batch_ids(batch.book_ids)
+    try:
+        loans = (
+            session.execute(checkout_statement(batch.library_card_id, book_ids))
+            .mappings()
+            .all()
+        )
+    except IntegrityError as error:
+        detail = LOAN_FOREIGN_KEY_ERRORS.get(constraint_name(error))
+        if detail is None:
+            raise
+        raise HTTPException(status_code=404, detail=detail)
+
+    if not loans:
+        # Foreign keys are not checked when every insert is skipped on conflict
+        library_card_id = session.scalar(
+            select(sql.LibraryCard.id).where(
+                sql.LibraryCard.id == batch.library_card_id
+            )
+        )
+        if library_card_id is None:
+            raise HTTPException(status_code=404, detail="Library Card not found")
+
+    loaned = {loan["book_id"] for loan in loans}
+    failures = {}
+    # Books that were not loaned either do not exist or are already on loan
+    if loaned != set(book_ids):
+        existing = set(
+            session.scalars(
+                select(sql.Book.id).where(sql.Book.id.in_(set(book_ids) - loaned))
+            )
+        )
+        failures = {
+            book_id: (
+                (409, "Book is already on loan")
+                if book_id in existing
+                else (404, "Book not found")
+            )
+            for book_id in set(book_ids) - loaned
+        }
+    if loaned:
+        session.execute(set_availability(loaned, False))
+
+    if response_cache.enabled and loans:
+        borrower_id = session.scalar(
+            select(sql.LibraryCard.borrower_id).filter(
+                sql.LibraryCard.id == batch.library_card_id
+            )
+        )
+        cache.invalidate_on_commit(
+            session,
+            response_cache,
+            *loan_batch_invalidations(borrower_id, loans),
+        )
+    return loan_batch_items(book_ids, loans, status.HTTP_201_CREATED, failures)
+
+
+@router.post("/loans:batchDelete", response_model=List[response.LoanBatchItem])
+def batch_delete_loans(
+    batch: request.LoanBatch,
+    session: SQLSession = Depends(resources.database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    book_ids = validate_batch_ids(batch.book_ids)
+    loans = (
+        session.execute(return_statement(batch.library_card_id, book_ids))
+        .mappings()
+        .all()
+    )
+    if loans:
+        session.execute(set_availability([loan["book_id"] for loan in loans], True))
+
+    if response_cache.enabled and loans:
+        borrower_id = session.scalar(
+            select(sql.LibraryCard.borrower_id).filter(
+                sql.LibraryCard.id == batch.library_card_id
+            )
+        )
+        cache.invalidate_on_commit(
+            session,
+            response_cache,
+            *loan_batch_invalidations(borrower_id, loans),
+        )
+    not_found = (status.HTTP_404_NOT_FOUND, "Loan not found")
+    return loan_batch_items(
+        book_ids,
+        loans,
+        status.HTTP_200_OK,
+        {book_id: not_found for book_id in book_ids},
     )
-    session.add(new_loan)
-    session.flush()
-    return response.Loan.model_validate(new_loan)
 
 
 @router.post(
     "/books/{book_id}/reviews",
     response_model=response.Review,
     status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": response.QueuedReview}},
 )
 def create_review(
     book_id: int,
     review: request.Review,
     session: SQLSession = Depends(resources.database_session),
+    read_only_session: SQLSession = Depends(resources.read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+    book_leaderboard: leaderboard.Leaderboard = Depends(resources.get_leaderboard),
+    review_writer: Optional[review_queue.ReviewWriter] = Depends(
+        resources.get_review_writer
+    ),
 ):
-    book = session.query(sql.Book).filter(sql.Book.id == book_id).first()
-    if not book:
+    if review_writer is not None:
+        # Write-behind: the review is inserted with the next batch of queued
+        # reviews, which also updates the rating aggregates and leaderboard
+        # Queued reviews are only written later, a review of an unknown book
+        # or borrower must be refused before it is accepted
+        targets = read_only_session.execute(
+            review_targets_statement(book_id, review.borrower_id)
+        ).one_or_none()
+        if targets is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        if not targets.borrower:
+            raise HTTPException(status_code=404, detail="Borrower not found")
+        queued_review = review_writer.enqueue(
+            book_id, review.borrower_id, review.rating, review.comment
+        )
+        return serializers.QUEUED_REVIEW.response(
+            queued_review._asdict(), status_code=status.HTTP_202_ACCEPTED
+        )
+
+    # Rating aggregates are updated in the same transaction as the review is
+    # inserted, the update also tells whether the book exists
+    reviewed_book = (
+        session.execute(
+            update(sql.Book)
+            .where(sql.Book.id == book_id)
+            .values(
+                review_count=sql.Book.review_count + 1,
+                rating_sum=sql.Book.rating_sum + review.rating,
+            )
+            .returning(
+                sql.Book.id, sql.Book.title, sql.Book.review_count, sql.Book.rating_sum
+            )
+        )
+    ).one_or_none()
+    if reviewed_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
 
     new_review = sql.Review(
@@ -104,64 +603,237 @@ def create_review(
         review_date=date.today(),
     )
     session.add(new_review)
-    session.flush()
-    return response.Review.model_validate(new_review)
+    try:
+        session.flush()
+    except IntegrityError as error:
+        detail = REVIEW_FOREIGN_KEY_ERRORS.get(constraint_name(error))
+        if detail is None:
+            raise
+        raise HTTPException(status_code=404, detail=detail)
+    cache.invalidate_on_commit(
+        session,
+        response_cache,
+        cache.borrower_key(review.borrower_id),
+    )
+    leaderboard.record_review_on_commit(
+        session, book_leaderboard, leaderboard.LeaderboardEntry(*reviewed_book)
+    )
+    return serializers.REVIEW.response(new_review, status_code=status.HTTP_201_CREATED)
+
+
+@router.get("/borrowers", response_model=List[response.BatchItem[response.Borrower]])
+def get_borrowers(
+    ids: List[int] = Depends(query_ids),
+    session: SQLSession = Depends(resources.read_only_database_session),
+):
+    return _get_batch(session, sql.Borrower, response.Borrower, ids)
+
+
+@router.post(
+    "/borrowers:batchGet",
+    response_model=List[response.BatchItem[response.Borrower]],
+)
+def batch_get_borrowers(
+    batch: request.BatchGet,
+    session: SQLSession = Depends(resources.read_only_database_session),
+):
+    return _get_batch(
+        session, sql.Borrower, response.Borrower, validate_batch_ids(batch.ids)
+    )
 
 
 @router.get("/borrowers/{borrower_id}", response_model=response.Borrower)
 def get_borrower(
-    borrower_id: int, session: SQLSession = Depends(resources.database_session)
+    borrower_id: int,
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.Borrower, sql.Borrower)
+    ),
+    session: SQLSession = Depends(resources.read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_read_response_cache),
 ):
-    borrower = (
-        session.query(sql.Borrower).filter(sql.Borrower.id == borrower_id).first()
-    )
+    if fieldset is not None:
+        borrower = session.scalars(
+            BORROWER_BY_ID.options(*fieldset.options()), {"id": borrower_id}
+        ).first()
+        if borrower is None:
+            raise HTTPException(status_code=404, detail="Borrower not found")
+        return fieldset.response(borrower)
+
+    cached = response_cache.cached_response(cache.borrower_key(borrower_id))
+    if cached is not None:
+        return cached
+    borrower = session.scalars(BORROWER_RESPONSE_BY_ID, {"id": borrower_id}).first()
     if borrower is None:
         raise HTTPException(status_code=404, detail="Borrower not found")
-    return response.Borrower.model_validate(borrower)
+    return response_cache.store_response(
+        cache.borrower_key(borrower_id), serializers.BORROWER.dump(borrower)
+    )
 
 
 @router.get("/library-cards/{library_card_id}", response_model=response.LibraryCard)
 def get_library_card(
-    library_card_id: int, session: SQLSession = Depends(resources.database_session)
+    library_card_id: int,
+    if_none_match: Optional[str] = Header(None),
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.LibraryCard, sql.LibraryCard)
+    ),
+    session: SQLSession = Depends(resources.read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
 ):
-    library_card = (
-        session.query(sql.LibraryCard)
-        .filter(sql.LibraryCard.id == library_card_id)
-        .first()
+    # Version is checked before anything else so that unchanged resources are
+    # answered without loading relationships or validating models
+    version = session.scalar(etags.library_card_version(library_card_id))
+    if version is None:
+        raise HTTPException(status_code=404, detail="Library Card not found")
+    library_card_etag = etags.etag(version)
+    if etags.etag_matches(if_none_match, library_card_etag):
+        return etags.not_modified(library_card_etag)
+
+    if fieldset is not None:
+        library_card = session.scalars(
+            LIBRARY_CARD_BY_ID.options(*fieldset.options()), {"id": library_card_id}
+        ).first()
+        if library_card is None:
+            raise HTTPException(status_code=404, detail="Library Card not found")
+        return fieldset.response(library_card, headers={"ETag": library_card_etag})
+
+    cached = response_cache.cached_response(
+        cache.library_card_key(library_card_id, version)
     )
+    if cached is not None:
+        cached.headers["ETag"] = library_card_etag
+        return cached
+    library_card = session.scalars(
+        LIBRARY_CARD_RESPONSE_BY_ID, {"id": library_card_id}
+    ).first()
     if library_card is None:
         raise HTTPException(status_code=404, detail="Library Card not found")
-    return response.LibraryCard.model_validate(library_card)
+    library_card_response = response_cache.store_response(
+        cache.library_card_key(library_card_id, version),
+        serializers.LIBRARY_CARD.dump(library_card),
+    )
+    library_card_response.headers["ETag"] = library_card_etag
+    return library_card_response
 
 
 @router.get("/loans/{loan_id}", response_model=response.Loan)
-def get_loan(loan_id: int, session: SQLSession = Depends(resources.database_session)):
-    loan = session.query(sql.Loan).filter(sql.Loan.id == loan_id).first()
+def get_loan(
+    loan_id: int,
+    fieldset: Optional[fieldsets.FieldSet] = Depends(
+        fieldsets.fieldset_query(response.Loan, sql.Loan)
+    ),
+    session: SQLSession = Depends(resources.read_only_database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_read_response_cache),
+):
+    if fieldset is not None:
+        loan = session.scalars(
+            LOAN_BY_ID.options(*fieldset.options()), {"id": loan_id}
+        ).first()
+        if loan is None:
+            raise HTTPException(status_code=404, detail="Loan not found")
+        return fieldset.response(loan)
+
+    cached = response_cache.cached_response(cache.loan_key(loan_id))
+    if cached is not None:
+        return cached
+    loan = session.scalars(LOAN_BY_ID, {"id": loan_id}).first()
     if loan is None:
         raise HTTPException(status_code=404, detail="Loan not found")
-    return response.Loan.model_validate(loan)
+    return response_cache.store_response(
+        cache.loan_key(loan_id), serializers.LOAN.dump(loan)
+    )
 
 
 @router.delete("/loans/{loan_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_loan(
-    loan_id: int, session: SQLSession = Depends(resources.database_session)
+    loan_id: int,
+    session: SQLSession = Depends(resources.database_session),
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
 ):
-    loan = session.query(sql.Loan).filter(sql.Loan.id == loan_id).first()
+    loan = session.scalars(LOAN_BY_ID, {"id": loan_id}).first()
     if loan is None:
         raise HTTPException(status_code=404, detail="Loan not found")
+    if response_cache.enabled:
+        cache.invalidate_on_commit(
+            session,
+            response_cache,
+            cache.loan_key(loan_id),
+            cache.borrower_key(loan.library_card.borrower_id),
+        )
     session.delete(loan)
-    session.commit()
+    session.execute(
+        update(sql.Book).where(sql.Book.id == loan.book_id).values(is_available=True)
+    )
     return None
 
 
+def _stream_loans_for_borrower(library_card_id: int) -> Generator[bytes, None, None]:
+    # The request scoped session is closed before a streaming body is sent,
+    # so the stream owns its session for as long as rows are being read
+    with resources.get_configured_database().create_session(
+        use_reader=not consistency.reads_from_writer()
+    ) as session:
+        loans = session.execute(
+            select(*loaders.LOAN_COLUMNS)
+            .filter(sql.Loan.library_card_id == library_card_id)
+            .order_by(sql.Loan.id)
+            .execution_options(yield_per=settings.STREAM_BATCH_SIZE)
+        ).mappings()
+        for loan in loans:
+            yield serializers.LOAN.dump(loan) + b"\n"
+
+
 @router.get("/loans", response_model=List[response.Loan])
 def list_loans_for_borrower(
-    library_card_id: int, session: SQLSession = Depends(resources.database_session)
+    library_card_id: int,
+    after: Optional[int] = Query(
+        None, description="Return loans with id greater than this cursor"
+    ),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    stream: bool = Query(False, description="Stream all loans as NDJSON"),
+    accept: Optional[str] = Header(None),
+    session: SQLSession = Depends(resources.read_only_database_session),
 ):
+    if stream or (accept is not None and NDJSON_MEDIA_TYPE in accept):
+        return StreamingResponse(
+            _stream_loans_for_borrower(library_card_id),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
     # Fetch loans associated with the borrower's library card
+    statement = select(*loaders.LOAN_COLUMNS).filter(
+        sql.Loan.library_card_id == library_card_id
+    )
+    if after is not None:
+        statement = statement.filter(sql.Loan.id > after)
     loans = (
-        session.query(sql.Loan)
-        .filter(sql.Loan.library_card_id == library_card_id)
-        .all()
+        session.execute(statement.order_by(sql.Loan.id).limit(limit)).mappings().all()
     )
-    return parse_obj_as(List[response.Loan], loans)
+
+    headers = {}
+    if len(loans) == limit:
+        headers["X-Next-Cursor"] = str(loans[-1]["id"])
+    return serializers.LOAN.list_response(loans, headers=headers)
+
+
+@router.get("/metrics/database-pool")
+def get_database_pool_metrics():
+    return resources.get_configured_database().pool_status()
+
+
+@router.get("/metrics/response-cache")
+def get_response_cache_metrics(
+    response_cache: cache.ResponseCache = Depends(resources.get_response_cache),
+):
+    return response_cache.metrics()
+
+
+@router.get("/metrics/review-queue")
+def get_review_queue_metrics(
+    review_writer: Optional[review_queue.ReviewWriter] = Depends(
+        resources.get_review_writer
+    ),
+):
+    if review_writer is None:
+        return {"enabled": False}
+    return {"enabled": True, **review_writer.status()}
@@ -0,0 +1,145 @@
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple, Optional
+
+import models.sqlalchemy as sql
+from sqlalchemy import (
+    Numeric,
+    Select,
+    cast,
+    func,
+    literal,
+    literal_column,
+    select,
+    tuple_,
+    union_all,
+)
+
+# Weight of a match in each source, books matching the query in their title
+# outrank books whose reviews mention it
+TITLE_WEIGHT = 1.0
+AUTHOR_WEIGHT = 0.8
+FUZZY_TITLE_WEIGHT = 0.5
+REVIEW_WEIGHT = 0.2
+
+# Ranks are rounded so that a cursor compares equal to the rank it was read
+# from, however the sum of the matches was computed
+RANK_SCALE = 6
+
+
+class SearchCursor(NamedTuple):
+    rank: Decimal
+    book_id: int
+
+
+def encode_cursor(rank: Decimal, book_id: int) -> str:
+    return f"{rank}_{book_id}"
+
+
+def decode_cursor(value: str) -> SearchCursor:
+    """
+    Parse a cursor of encode_cursor, raises ValueError when it is malformed
+    """
+    rank, _, book_id = value.partition("_")
+    try:
+        return SearchCursor(Decimal(rank), int(book_id))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid search cursor: {value}") from None
+
+
+def search_statement(
+    terms: str,
+    limit: int,
+    after: Optional[SearchCursor] = None,
+    max_candidates: int = 0,
+) -> Select:
+    """
+    Books matching given web search syntax terms in their title, author names
+    or review comments, or with a title similar to the terms, ranked by the
+    weighted sum of their matches and keyset paginated on (rank, id).
+
+    Args:
+        terms (str): Search terms, quoted phrases, "or" and "-" are supported
+        limit (int): Page size
+        after (SearchCursor): Cursor of the last book of the previous page
+        max_candidates (int): Best matches of each source that are ranked,
+            0 ranks all of them. A book matching very common terms weakly in
+            several sources may then be left out
+
+    Returns:
+        Select: Rows of id, title, published_date, review_count,
+        average_rating and rank
+    """
+    english = func.websearch_to_tsquery("english", terms)
+    simple = func.websearch_to_tsquery("simple", terms)
+    sources = [
+        select(
+            sql.Book.id.label("book_id"),
+            (func.ts_rank(sql.Book.search_vector, english) * TITLE_WEIGHT).label(
+                "rank"
+            ),
+        ).where(sql.Book.search_vector.bool_op("@@")(english)),
+        # word_similarity of the terms and the most similar part of the title,
+        # <% is served by the trigram index. Terms made of stop words only
+        # match nearly every title, they are skipped as full-text search does
+        select(
+            sql.Book.id.label("book_id"),
+            (func.word_similarity(terms, sql.Book.title) * FUZZY_TITLE_WEIGHT).label(
+                "rank"
+            ),
+        ).where(
+            func.numnode(english) > 0,
+            literal(terms).bool_op("<%")(sql.Book.title),
+        ),
+        select(
+            sql.book_author_table.c.book_id,
+            (func.ts_rank(sql.Author.search_vector, simple) * AUTHOR_WEIGHT).label(
+                "rank"
+            ),
+        )
+        .join_from(
+            sql.Author,
+            sql.book_author_table,
+            sql.book_author_table.c.author_id == sql.Author.id,
+        )
+        .where(sql.Author.search_vector.bool_op("@@")(simple)),
+        select(
+            sql.Review.book_id,
+            (func.ts_rank(sql.Review.search_vector, english) * REVIEW_WEIGHT).label(
+                "rank"
+            ),
+        ).where(sql.Review.search_vector.bool_op("@@")(english)),
+    ]
+    if max_candidates:
+        # Each source keeps its best matches, ordered by the labels of its
+        # own columns
+        sources = [
+            source.order_by(
+                literal_column("rank").desc(), literal_column("book_id")
+            ).limit(max_candidates)
+            for source in sources
+        ]
+    matches = union_all(*sources).subquery("matches")
+    ranked = (
+        select(
+            matches.c.book_id,
+            func.round(cast(func.sum(matches.c.rank), Numeric), RANK_SCALE).label(
+                "rank"
+            ),
+        )
+        .group_by(matches.c.book_id)
+        .subquery("ranked")
+    )
+
+    statement = select(
+        sql.Book.id,
+        sql.Book.title,
+        sql.Book.published_date,
+        sql.Book.review_count,
+        sql.Book.average_rating,
+        ranked.c.rank,
+    ).join(ranked, ranked.c.book_id == sql.Book.id)
+    if after is not None:
+        statement = statement.where(
+            tuple_(ranked.c.rank, sql.Book.id) < tuple_(after.rank, after.book_id)
+        )
+    return statement.order_by(ranked.c.rank.desc(), sql.Book.id.desc()).limit(limit)
@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 ENV = str(os.getenv("ENV", "local")).rstrip()
+# Set by the Lambda runtime
+RUNS_ON_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
 USE_PROXY = os.getenv("USE_PROXY", False)
 AWS_REGION = str(os.getenv("MY_AWS_REGION", "eu-west-1")).rstrip()
 AWS_PROFILE = str(os.getenv("MY_AWS_PROFILE", None)).rstrip()
@@ -15,3 +17,54 @@ DATABASE_PORT = int(os.getenv("DATABASE_PORT"))
 DATABASE_USERNAME = str(os.getenv("DATABASE_USERNAME")).rstrip()
 DATABASE_PASSWORD = str(os.getenv("DATABASE_PASSWORD")).rstrip()
 RDS_PROXY_ENDPOINT = str(os.getenv("RDS_PROXY_ENDPOINT")).rstrip()
+# Comma separated reader instance endpoints, or the cluster reader endpoint
+DATABASE_READER_ENDPOINTS = [
+    endpoint.strip()
+    for endpoint in os.getenv("DATABASE_READER_ENDPOINTS", "").split(",")
+    if endpoint.strip()
+]
+RDS_PROXY_READER_ENDPOINT = str(os.getenv("RDS_PROXY_READER_ENDPOINT", "")).rstrip()
+DATABASE_READER_SELECTION = str(
+    os.getenv("DATABASE_READER_SELECTION", "round-robin")
+).rstrip()
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", 0))
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 10))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 1000))
+USE_ASYNC = str(os.getenv("USE_ASYNC", False)).rstrip().lower() == "true"
+DATABASE_POOL_PROFILE = str(os.getenv("DATABASE_POOL_PROFILE", "server")).rstrip()
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", 5))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", 10))
+DATABASE_POOL_TIMEOUT = int(os.getenv("DATABASE_POOL_TIMEOUT", 30))
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", -1))
+DATABASE_QUERY_CACHE_SIZE = int(os.getenv("DATABASE_QUERY_CACHE_SIZE", 500))
+DATABASE_PREPARED_STATEMENT_CACHE_SIZE = int(
+    os.getenv("DATABASE_PREPARED_STATEMENT_CACHE_SIZE", 100)
+)
+WARM_UP_DATABASE = str(os.getenv("WARM_UP_DATABASE", False)).rstrip().lower() == "true"
+RESPONSE_CACHE_ENABLED = (
+    str(os.getenv("RESPONSE_CACHE_ENABLED", False)).rstrip().lower() == "true"
+)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 60))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", 1024))
+RESPONSE_CACHE_SHARED = str(os.getenv("RESPONSE_CACHE_SHARED", "none")).rstrip()
+RESPONSE_CACHE_INVALIDATION_GRACE = float(
+    os.getenv("RESPONSE_CACHE_INVALIDATION_GRACE", 5)
+)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 100))
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 100))
+LEADERBOARD_TTL = float(os.getenv("LEADERBOARD_TTL", 60))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 1000))
+REVIEW_WRITE_BEHIND = (
+    str(os.getenv("REVIEW_WRITE_BEHIND", False)).rstrip().lower() == "true"
+)
+REVIEW_QUEUE = str(os.getenv("REVIEW_QUEUE", "memory")).rstrip()
+REVIEW_QUEUE_PATH = str(os.getenv("REVIEW_QUEUE_PATH", "review_queue.sqlite3")).rstrip()
+REVIEW_BATCH_SIZE = int(os.getenv("REVIEW_BATCH_SIZE", 500))
+REVIEW_FLUSH_INTERVAL = float(os.getenv("REVIEW_FLUSH_INTERVAL", 0.5))
+REVIEW_MAX_ATTEMPTS = int(os.getenv("REVIEW_MAX_ATTEMPTS", 5))
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 500))
+METRICS_LOG_ENABLED = (
+    str(os.getenv("METRICS_LOG_ENABLED", False)).rstrip().lower() == "true"
+)
+METRICS_NAMESPACE = str(os.getenv("METRICS_NAMESPACE", "MyAwesomeApi")).rstrip()
@@ -0,0 +1,93 @@
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Tests always run locally against a database of their own, which is dropped
+# and migrated from scratch on every run
+os.environ["ENV"] = "local"
+os.environ["DATABASE_NAME"] = os.getenv("TEST_DATABASE_NAME", "my_awesome_api_test")
+load_dotenv(ROOT / ".env")
+os.environ.setdefault("DATABASE_ENDPOINT", "localhost")
+os.environ.setdefault("DATABASE_PORT", "5432")
+
+# Add my_awesome_api to sys.path
+sys.path.append(str(ROOT / "my_awesome_api"))
+
+import cache
+import main
+import models.sqlalchemy as sql
+import pytest
+import resources
+import settings
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from sqlalchemy import URL, create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    Configured database, created and migrated to head once per test run.
+    Tests needing it are skipped when PostgreSQL is not reachable
+    """
+    server = create_engine(
+        URL.create(
+            "postgresql+psycopg2",
+            username=settings.DATABASE_USERNAME,
+            password=settings.DATABASE_PASSWORD,
+            host=settings.DATABASE_ENDPOINT,
+            port=settings.DATABASE_PORT,
+            database="postgres",
+        ),
+        isolation_level="AUTOCOMMIT",
+        poolclass=NullPool,
+    )
+    try:
+        with server.connect() as connection:
+            connection.execute(
+                text(f'DROP DATABASE IF EXISTS "{settings.DATABASE_NAME}" WITH (FORCE)')
+            )
+            connection.execute(text(f'CREATE DATABASE "{settings.DATABASE_NAME}"'))
+    except OperationalError as error:
+        pytest.skip(f"PostgreSQL is not reachable: {error.orig}")
+    finally:
+        server.dispose()
+
+    command.upgrade(Config(str(ROOT / "alembic.ini")), "head")
+    database = resources.get_configured_database()
+    yield database
+    for engine in [database.engine, *database.readers.engines]:
+        engine.dispose()
+
+
+@pytest.fixture
+def session(database):
+    """
+    Session of the writer on emptied tables, the test commits what it adds
+    """
+    tables = ", ".join(table.name for table in sql.Base.metadata.sorted_tables)
+    with database.engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    with database.session() as session:
+        yield session
+
+
+@pytest.fixture
+def client(database):
+    """
+    Client of the app with fresh in-process singletons. The response cache is
+    disabled unless a test installs one
+    """
+    resources._response_cache = cache.ResponseCache()
+    resources._leaderboard = None
+    # Async connections are bound to the event loop of the client
+    resources._async_database = None
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,122 @@
+import time
+from datetime import date
+
+import consistency
+import models.sqlalchemy as sql
+import pytest
+import resources
+import settings
+from cache import InMemorySharedCache, LocalCache, ResponseCache
+
+KEY = "book:1"
+BEFORE_COMMIT = b'{"title": "Before"}'
+AFTER_COMMIT = b'{"title": "After"}'
+
+
+@pytest.fixture(params=["local", "shared"])
+def response_cache(request) -> ResponseCache:
+    if request.param == "local":
+        return ResponseCache(local=LocalCache(), invalidation_grace=0.2)
+    return ResponseCache(
+        local=LocalCache(), shared=InMemorySharedCache(), invalidation_grace=0.2
+    )
+
+
+def test_store_of_state_read_before_invalidation_is_rejected(response_cache):
+    response_cache.set(KEY, BEFORE_COMMIT)
+    # A request read the pre-commit state, the writer commits and invalidates
+    # before the request stores what it read
+    response_cache.invalidate(KEY)
+
+    assert response_cache.set(KEY, BEFORE_COMMIT) is False
+    assert response_cache.get(KEY) is None
+    assert response_cache.metrics()["rejected_stores"] == 1
+
+
+def test_stores_are_accepted_after_invalidation_grace(response_cache):
+    response_cache.invalidate(KEY)
+    time.sleep(0.25)
+
+    assert response_cache.set(KEY, AFTER_COMMIT) is True
+    assert response_cache.get(KEY) == AFTER_COMMIT
+
+
+def test_shared_tombstone_rejects_stores_of_other_processes():
+    shared = InMemorySharedCache()
+    writer = ResponseCache(local=LocalCache(), shared=shared)
+    reader = ResponseCache(local=LocalCache(), shared=shared)
+    writer.invalidate(KEY)
+
+    assert reader.set(KEY, BEFORE_COMMIT) is False
+    assert reader.get(KEY) is None
+
+
+def test_invalidation_without_grace_deletes_keys():
+    response_cache = ResponseCache(local=LocalCache(), invalidation_grace=0)
+    response_cache.set(KEY, BEFORE_COMMIT)
+    response_cache.invalidate(KEY)
+
+    assert response_cache.get(KEY) is None
+    assert response_cache.set(KEY, AFTER_COMMIT) is True
+
+
+@pytest.fixture
+def cached_client(client):
+    resources._response_cache = ResponseCache(local=LocalCache())
+    yield client
+
+
+def test_cached_book_body_matches_its_etag_after_a_loan(cached_client, session):
+    book = sql.Book(title="Cached", published_date=date(2000, 1, 1))
+    borrower = sql.Borrower(
+        first_name="Borrower",
+        last_name="Cache",
+        email="cache@example.com",
+        library_card=sql.LibraryCard(issue_date=date(2020, 1, 1)),
+    )
+    session.add_all([book, borrower])
+    session.commit()
+    before = cached_client.get(f"/books/{book.id}")
+
+    cached_client.post(
+        f"/books/{book.id}/loan", json={"library_card_id": borrower.library_card.id}
+    )
+    after = cached_client.get(f"/books/{book.id}")
+
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert before.json()["loan"] is None
+    assert after.json()["loan"] is not None
+    assert cached_client.get(f"/books/{book.id}").content == after.content
+
+
+@pytest.fixture
+def enabled_cache(monkeypatch) -> ResponseCache:
+    response_cache = ResponseCache(local=LocalCache())
+    monkeypatch.setattr(resources, "_response_cache", response_cache)
+    monkeypatch.setattr(settings, "USE_PROXY", False)
+    monkeypatch.setattr(settings, "DATABASE_READER_ENDPOINTS", [])
+    return response_cache
+
+
+def test_read_cache_is_bypassed_within_read_your_writes_window(enabled_cache):
+    enabled_cache.set(KEY, BEFORE_COMMIT)
+    token = consistency._reads_from_writer.set(True)
+    try:
+        read_cache = resources.get_read_response_cache()
+        read_cache.store_response(KEY, AFTER_COMMIT)
+
+        assert read_cache.cached_response(KEY) is None
+    finally:
+        consistency._reads_from_writer.reset(token)
+    assert enabled_cache.get(KEY) == BEFORE_COMMIT
+
+
+def test_read_cache_does_not_store_bodies_read_from_readers(enabled_cache, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_READER_ENDPOINTS", ["reader.invalid"])
+    enabled_cache.set("author:1", BEFORE_COMMIT)
+    read_cache = resources.get_read_response_cache()
+    read_cache.store_response(KEY, AFTER_COMMIT)
+
+    assert read_cache.cached_response("author:1").body == BEFORE_COMMIT
+    assert enabled_cache.get(KEY) is None
+    assert read_cache.metrics()["hits"] == 1
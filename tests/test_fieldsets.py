@@ -0,0 +1,107 @@
+from datetime import date
+
+import models.loaders as loaders
+import models.response as response
+import models.sqlalchemy as sql
+import pytest
+
+# Path and response model of every entity route supporting fields and expand.
+# Expansions are tested first and borrowers before library cards: serving a
+# library card resolves the models a borrower embeds, which hid the failure of
+# ?expand=library_card
+ROUTES = {
+    "author": ("/authors/{}", response.Author),
+    "book": ("/books/{}", response.Book),
+    "borrower": ("/borrowers/{}", response.Borrower),
+    "library_card": ("/library-cards/{}", response.LibraryCard),
+    "loan": ("/loans/{}", response.Loan),
+}
+
+
+def columns(model) -> list:
+    relationships = loaders.relationships(model)
+    return [
+        name
+        for name in model.model_fields
+        if name not in relationships and name != "id"
+    ]
+
+
+@pytest.fixture
+def ids(session) -> dict:
+    """
+    Ids of one row of every entity, related to each other so that every
+    relationship embeds something
+    """
+    author = sql.Author(first_name="Ada", last_name="Lovelace", biography="Notes")
+    book = sql.Book(title="Sketch", published_date=date(1843, 1, 1), authors=[author])
+    borrower = sql.Borrower(
+        first_name="Grace",
+        last_name="Hopper",
+        email="fieldsets@example.com",
+        library_card=sql.LibraryCard(issue_date=date(2020, 1, 1)),
+    )
+    session.add_all([author, book, borrower])
+    session.flush()
+    loan = sql.Loan(
+        book_id=book.id,
+        library_card_id=borrower.library_card.id,
+        loan_date=date(2024, 1, 1),
+    )
+    review = sql.Review(
+        book_id=book.id,
+        borrower_id=borrower.id,
+        rating=5,
+        comment="Visionary",
+        review_date=date(2024, 1, 2),
+    )
+    session.add_all([loan, review])
+    session.commit()
+    return {
+        "author": author.id,
+        "book": book.id,
+        "borrower": borrower.id,
+        "library_card": borrower.library_card.id,
+        "loan": loan.id,
+    }
+
+
+@pytest.mark.parametrize(
+    "entity, relationship",
+    [
+        (entity, relationship)
+        for entity, (_, model) in ROUTES.items()
+        for relationship in loaders.relationships(model)
+    ],
+)
+def test_expand_embeds_the_relationship_of_the_full_response(
+    client, ids, entity, relationship
+):
+    path, model = ROUTES[entity]
+    full = client.get(path.format(ids[entity])).json()
+
+    result = client.get(path.format(ids[entity]), params={"expand": relationship})
+
+    assert result.status_code == 200
+    assert full[relationship]
+    assert result.json() == {
+        name: full[name] for name in ("id", *columns(model), relationship)
+    }
+
+
+@pytest.mark.parametrize("entity", ROUTES)
+def test_fields_return_the_selected_columns_of_the_full_response(client, ids, entity):
+    path, model = ROUTES[entity]
+    full = client.get(path.format(ids[entity])).json()
+    selected = columns(model)[:2]
+
+    result = client.get(path.format(ids[entity]), params={"fields": ",".join(selected)})
+
+    assert result.status_code == 200
+    assert result.json() == {name: full[name] for name in ("id", *selected)}
+
+
+def test_unknown_field_is_refused(client, ids):
+    result = client.get(f"/books/{ids['book']}", params={"fields": "isbn"})
+
+    assert result.status_code == 422
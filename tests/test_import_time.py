@@ -0,0 +1,55 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import time of the Lambda handler module, override on slower
+# CI runners
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 2000))
+LAZY_MODULES = ("boto3", "botocore", "aws_secretsmanager_caching")
+
+_IMPORT_TIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s+([\w.]+)")
+
+
+def import_handler() -> dict:
+    """
+    Cumulative import time in microseconds of every module imported by a cold
+    `import main`. The database is unreachable, importing must not connect
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT / "my_awesome_api",
+        env=dict(
+            os.environ,
+            ENV="local",
+            DATABASE_ENDPOINT="unreachable.invalid",
+            DATABASE_PORT="5432",
+            WARM_UP_DATABASE="false",
+        ),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return {
+        match.group(2): int(match.group(1))
+        for match in map(_IMPORT_TIME.match, completed.stderr.splitlines())
+        if match is not None
+    }
+
+
+def test_handler_import_stays_within_budget():
+    # Best of three, the first import also compiles bytecode
+    import_times = min(
+        (import_handler() for _ in range(3)), key=lambda times: times["main"]
+    )
+
+    assert import_times["main"] / 1000 <= IMPORT_TIME_BUDGET_MS
+
+
+def test_handler_import_does_not_import_aws_clients():
+    imported = import_handler()
+
+    assert [module for module in LAZY_MODULES if module in imported] == []
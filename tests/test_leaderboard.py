@@ -0,0 +1,65 @@
+import time
+from datetime import date
+
+import models.sqlalchemy as sql
+import pytest
+import resources
+from leaderboard import Leaderboard, refresh_view
+
+TTL = 0.2
+
+
+@pytest.fixture
+def leaderboard(client) -> Leaderboard:
+    resources._leaderboard = Leaderboard(size=10, ttl=TTL)
+    return resources._leaderboard
+
+
+@pytest.fixture
+def book_and_borrower(session, database) -> tuple:
+    book = sql.Book(title="Ranked", published_date=date(2000, 1, 1))
+    borrower = sql.Borrower(
+        first_name="Borrower", last_name="Ranks", email="ranks@example.com"
+    )
+    session.add_all([book, borrower])
+    session.commit()
+    # The view is refreshed before the book is reviewed
+    with database.engine.begin() as connection:
+        refresh_view(connection)
+    return book.id, borrower.id
+
+
+def top_ids(client, by: str) -> list:
+    response = client.get("/books/top", params={"by": by})
+    assert response.status_code == 200
+    return [book["id"] for book in response.json()]
+
+
+@pytest.mark.parametrize("by", ["rating", "reviews"])
+def test_book_reviewed_after_refresh_stays_ranked_after_reload(
+    client, leaderboard, book_and_borrower, by
+):
+    book_id, borrower_id = book_and_borrower
+    assert top_ids(client, by) == []
+
+    response = client.post(
+        f"/books/{book_id}/reviews", json={"borrower_id": borrower_id, "rating": 5}
+    )
+    assert response.status_code == 201
+    assert top_ids(client, by) == [book_id]
+
+    # The rankings are reloaded from the view, not refreshed since the review
+    time.sleep(TTL + 0.05)
+    assert leaderboard.top(by, 10) is None
+    assert top_ids(client, by) == [book_id]
+
+
+def test_book_reviewed_before_first_load_is_ranked(
+    client, leaderboard, book_and_borrower
+):
+    book_id, borrower_id = book_and_borrower
+    client.post(
+        f"/books/{book_id}/reviews", json={"borrower_id": borrower_id, "rating": 4}
+    )
+
+    assert top_ids(client, "rating") == [book_id]
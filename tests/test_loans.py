@@ -0,0 +1,86 @@
+import asyncio
+from collections import Counter
+from datetime import date
+
+import httpx
+import main
+import models.sqlalchemy as sql
+import pytest
+import resources
+
+PARALLEL_CHECKOUTS = 10
+
+
+@pytest.fixture
+def library_card_id(session) -> int:
+    borrower = sql.Borrower(
+        first_name="Borrower",
+        last_name="Loans",
+        email="borrower@example.com",
+        library_card=sql.LibraryCard(issue_date=date(2020, 1, 1)),
+    )
+    session.add(borrower)
+    session.commit()
+    return borrower.library_card.id
+
+
+@pytest.fixture
+def book_id(session) -> int:
+    book = sql.Book(title="Loaned", published_date=date(2000, 1, 1))
+    session.add(book)
+    session.commit()
+    return book.id
+
+
+async def checkout_concurrently(book_id: int, library_card_id: int, amount: int):
+    # Requests run concurrently on the app, sync routes in its threadpool
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(
+            *(
+                client.post(
+                    f"/books/{book_id}/loan",
+                    json={"library_card_id": library_card_id},
+                )
+                for _ in range(amount)
+            )
+        )
+
+
+def test_parallel_checkouts_of_a_book_create_one_loan(
+    session, book_id, library_card_id
+):
+    # Async connections are bound to the event loop of the requests
+    resources._async_database = None
+    responses = asyncio.run(
+        checkout_concurrently(book_id, library_card_id, PARALLEL_CHECKOUTS)
+    )
+
+    assert Counter(response.status_code for response in responses) == {
+        201: 1,
+        409: PARALLEL_CHECKOUTS - 1,
+    }
+    assert session.query(sql.Loan).filter(sql.Loan.book_id == book_id).count() == 1
+    assert session.get(sql.Book, book_id).is_available is False
+
+
+def test_checkout_of_unknown_book_is_not_found(client, library_card_id):
+    response = client.post(
+        "/books/1000/loan", json={"library_card_id": library_card_id}
+    )
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Book not found"}
+
+
+@pytest.mark.parametrize("on_loan", [False, True])
+def test_checkout_with_unknown_library_card_is_not_found(
+    client, book_id, library_card_id, on_loan
+):
+    if on_loan:
+        client.post(f"/books/{book_id}/loan", json={"library_card_id": library_card_id})
+
+    response = client.post(f"/books/{book_id}/loan", json={"library_card_id": 1000})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Library Card not found"}
@@ -0,0 +1,126 @@
+import json
+from datetime import date
+from typing import Iterator, List, Tuple
+
+import models.sqlalchemy as sql
+import pytest
+import resources
+import settings
+from sqlalchemy import Engine, event, text
+from sqlalchemy.engine import Connection
+
+# Query plan regression check. Every GET route is called, each SELECT it
+# executed is explained and the test fails when the plan sequentially scans
+# one of the tables that are large in production. Sequential scans are
+# disabled while explaining, so that the tiny test tables are still read
+# through an index whenever one can serve the query.
+
+pytestmark = pytest.mark.skipif(
+    settings.USE_ASYNC,
+    reason="Statements are explained with psycopg2, the async routes run the "
+    "same statements",
+)
+
+SAMPLED_TABLES = ("authors", "books", "borrowers", "library_cards", "loans")
+
+ROUTES = (
+    "/authors/{authors}",
+    "/authors?ids={authors}",
+    "/books/{books}",
+    "/books?ids={books}",
+    "/books/available/?limit=10",
+    "/books/available/?limit=10&title_prefix=a",
+    "/books/top?by=rating",
+    "/books/top?by=reviews",
+    "/search?q=blue+mongoose",
+    "/search?q=mongose",
+    "/borrowers/{borrowers}",
+    "/borrowers?ids={borrowers}",
+    "/library-cards/{library_cards}",
+    "/loans/{loans}",
+    "/loans?library_card_id={library_cards}",
+)
+
+
+@pytest.fixture
+def ids(session) -> dict:
+    """
+    Ids of the last seeded row of every sampled table
+    """
+    borrowers = [
+        sql.Borrower(
+            first_name="Borrower",
+            last_name=str(index),
+            email=f"plans_{index}@example.com",
+            library_card=sql.LibraryCard(issue_date=date(2020, 1, 1)),
+        )
+        for index in range(5)
+    ]
+    for index, borrower in enumerate(borrowers):
+        author = sql.Author(first_name="Author", last_name=f"Mongoose {index}")
+        author.books = [
+            sql.Book(title=f"A blue mongoose {index}", published_date=date(2000, 1, 1)),
+            sql.Book(title=f"Another book {index}", published_date=date(2001, 1, 1)),
+        ]
+        author.books[0].loan = sql.Loan(
+            library_card=borrower.library_card, loan_date=date(2024, 1, 1)
+        )
+        author.books[0].is_available = False
+        session.add(author)
+    session.add_all(borrowers)
+    session.commit()
+    with session.connection() as connection:
+        return {
+            table: connection.scalar(text(f"SELECT max(id) FROM {table}"))
+            for table in SAMPLED_TABLES
+        }
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def sequential_scans(connection: Connection, statement: str, parameters) -> List[str]:
+    explained = connection.exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + statement, parameters
+    ).scalar()
+    if isinstance(explained, str):
+        explained = json.loads(explained)
+    return [
+        node["Relation Name"]
+        for node in plan_nodes(explained[0]["Plan"])
+        if node["Node Type"] == "Seq Scan"
+        and node.get("Relation Name") in SAMPLED_TABLES
+    ]
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_route_does_not_scan_sampled_tables(database, client, ids, route):
+    executed: List[Tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            executed.append((statement, parameters))
+
+    # Read routes run on the readers when reader endpoints are configured
+    route_engines: List[Engine] = [database.engine, *database.readers.engines]
+    for engine in route_engines:
+        event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = client.get(route.format(**ids))
+    finally:
+        for engine in route_engines:
+            event.remove(engine, "before_cursor_execute", capture)
+
+    assert response.status_code == 200
+    assert executed
+    with resources.get_configured_database().engine.connect() as connection:
+        connection.execute(text("SET enable_seqscan = off"))
+        scans = {
+            statement: scan
+            for statement, parameters in executed
+            for scan in sequential_scans(connection, statement, parameters)
+        }
+    assert scans == {}
@@ -0,0 +1,134 @@
+from datetime import date
+
+import models.sqlalchemy as sql
+import pytest
+import resources
+import settings
+from review_queue import InProcessReviewQueue, ReviewWriter
+
+
+@pytest.fixture
+def review_writer(client, database, monkeypatch) -> ReviewWriter:
+    # Not started, queued reviews are only written when the test flushes them
+    review_writer = ReviewWriter(InProcessReviewQueue(), database.engine)
+    monkeypatch.setattr(resources, "_review_writer", review_writer)
+    return review_writer
+
+
+@pytest.fixture
+def book_and_borrower(session) -> tuple:
+    book = sql.Book(title="Reviewed", published_date=date(2000, 1, 1))
+    borrower = sql.Borrower(
+        first_name="Borrower", last_name="Reviews", email="reviews@example.com"
+    )
+    session.add_all([book, borrower])
+    session.commit()
+    return book.id, borrower.id
+
+
+def review_body(borrower_id: int) -> dict:
+    return {"borrower_id": borrower_id, "rating": 4, "comment": "Queued"}
+
+
+def test_review_of_unknown_borrower_is_refused(client, book_and_borrower, session):
+    book_id, borrower_id = book_and_borrower
+    response = client.post(
+        f"/books/{book_id}/reviews", json=review_body(borrower_id + 1)
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Borrower not found"
+    # The rating aggregates updated before the insert failed are rolled back
+    assert session.get(sql.Book, book_id, populate_existing=True).review_count == 0
+
+
+def test_review_of_unknown_book_is_refused(client, book_and_borrower):
+    book_id, borrower_id = book_and_borrower
+    response = client.post(
+        f"/books/{book_id + 1}/reviews", json=review_body(borrower_id)
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Book not found"
+
+
+def test_review_is_written(client, book_and_borrower, session):
+    book_id, borrower_id = book_and_borrower
+    response = client.post(f"/books/{book_id}/reviews", json=review_body(borrower_id))
+
+    assert response.status_code == 201
+    assert response.json()["borrower_id"] == borrower_id
+    assert session.get(sql.Book, book_id, populate_existing=True).review_count == 1
+
+
+def test_write_behind_review_of_unknown_borrower_is_refused(
+    client, review_writer, book_and_borrower
+):
+    book_id, borrower_id = book_and_borrower
+    response = client.post(
+        f"/books/{book_id}/reviews", json=review_body(borrower_id + 1)
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Borrower not found"
+    assert len(review_writer.queue) == 0
+
+
+def test_write_behind_review_of_unknown_book_is_refused(
+    client, review_writer, book_and_borrower
+):
+    book_id, borrower_id = book_and_borrower
+    response = client.post(
+        f"/books/{book_id + 1}/reviews", json=review_body(borrower_id)
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Book not found"
+    assert len(review_writer.queue) == 0
+
+
+def test_write_behind_review_is_written_with_next_batch(
+    client, review_writer, book_and_borrower, session
+):
+    book_id, borrower_id = book_and_borrower
+    response = client.post(f"/books/{book_id}/reviews", json=review_body(borrower_id))
+
+    assert response.status_code == 202
+    assert review_writer.flush() == 1
+    assert review_writer.status()["written"] == 1
+    assert session.get(sql.Book, book_id, populate_existing=True).review_count == 1
+
+
+def test_review_failing_alone_is_dropped_after_max_attempts(
+    database, book_and_borrower
+):
+    book_id, borrower_id = book_and_borrower
+    review_writer = ReviewWriter(
+        InProcessReviewQueue(), database.engine, batch_size=3, max_attempts=2
+    )
+    review_writer.enqueue(book_id, borrower_id, 4, "First")
+    # Text columns of PostgreSQL cannot store NUL characters
+    poison = review_writer.enqueue(book_id, borrower_id, 1, "Poison\x00")
+    review_writer.enqueue(book_id, borrower_id, 5, "Last")
+
+    with pytest.raises(Exception):
+        review_writer.flush()
+    assert review_writer.status()["written"] == 2
+    assert [review.provisional_id for review in review_writer.queue.take(3, 0)] == [
+        poison.provisional_id
+    ]
+
+    review_writer.queue.release([poison])
+    assert review_writer.flush() == 1
+    assert review_writer.status()["dead_lettered"] == 1
+    assert len(review_writer.queue) == 0
+
+
+def test_write_behind_is_refused_on_lambda(monkeypatch):
+    monkeypatch.setattr(resources, "_review_writer", None)
+    monkeypatch.setattr(settings, "REVIEW_WRITE_BEHIND", True)
+    monkeypatch.setattr(settings, "RUNS_ON_LAMBDA", True)
+
+    with pytest.raises(ValueError, match="not supported on Lambda"):
+        resources.get_review_writer()
+    assert resources._review_writer is None
@@ -0,0 +1,134 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+
+import models.core as core
+import models.response as response
+import models.serializers as serializers
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+# Microbenchmarks of serializing each model of models/core.py from ORM-like
+# objects. Run them alone with `pytest tests/test_serialization.py`, or skip
+# them with `--benchmark-skip`.
+
+LIST_SIZE = 100
+
+
+def author(id_: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=id_,
+        first_name="Ada",
+        last_name="Lovelace",
+        biography="Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+        book_ids=list(range(1, 11)),
+    )
+
+
+def review(id_: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=id_,
+        book_id=1,
+        borrower_id=1,
+        rating=4,
+        comment="Great read, would borrow again.",
+        review_date=date(2024, 1, 1),
+    )
+
+
+def loan(id_: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=id_, book_id=id_, library_card_id=1, loan_date=date(2024, 1, 1)
+    )
+
+
+def library_card(id_: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=id_,
+        issue_date=date(2020, 1, 1),
+        borrower_id=id_,
+        loans=[loan(loan_id) for loan_id in range(1, 6)],
+    )
+
+
+def borrower(id_: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=id_,
+        first_name="Grace",
+        last_name="Hopper",
+        email=f"borrower_{id_}@example.com",
+        library_card=library_card(id_),
+        reviews=[review(review_id) for review_id in range(1, 6)],
+    )
+
+
+def book(id_: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=id_,
+        title="The Analytical Engine",
+        published_date=date(1843, 1, 1),
+        authors=[author(author_id) for author_id in range(1, 4)],
+        loan=loan(id_),
+        reviews=[review(review_id) for review_id in range(1, 21)],
+        is_available=False,
+        review_count=20,
+        average_rating=4.0,
+    )
+
+
+# Object graphs as the routes load them, by model of models/core.py
+MODELS = {
+    "Author": (author, core.Author, serializers.AUTHOR),
+    "Book": (book, response.Book, serializers.BOOK),
+    "Review": (review, core.Review, serializers.REVIEW),
+    "Borrower": (borrower, core.Borrower, serializers.BORROWER),
+    "LibraryCard": (library_card, core.LibraryCard, serializers.LIBRARY_CARD),
+    "Loan": (loan, core.Loan, serializers.LOAN),
+}
+
+
+def validate_and_encode(model, value) -> bytes:
+    """
+    Previous pipeline: model_validate in the route, then FastAPI's
+    jsonable_encoder and the stdlib json
+    """
+    return json.dumps(jsonable_encoder(model.model_validate(value))).encode()
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_serializer_matches_validate_and_encode(name):
+    build, model, serializer = MODELS[name]
+    value = build(1)
+
+    assert json.loads(serializer.dump(value)) == json.loads(
+        validate_and_encode(model, value)
+    )
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_benchmark_serializer(benchmark, name):
+    build, _, serializer = MODELS[name]
+    benchmark.group = f"{name} item"
+    benchmark(serializer.dump, build(1))
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_benchmark_validate_and_encode(benchmark, name):
+    build, model, _ = MODELS[name]
+    benchmark.group = f"{name} item"
+    benchmark(validate_and_encode, model, build(1))
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_benchmark_serializer_list(benchmark, name):
+    build, _, serializer = MODELS[name]
+    benchmark.group = f"{name} list of {LIST_SIZE}"
+    benchmark(serializer.dump_many, [build(id_) for id_ in range(1, LIST_SIZE + 1)])
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_benchmark_validate_and_encode_list(benchmark, name):
+    build, model, _ = MODELS[name]
+    values = [build(id_) for id_ in range(1, LIST_SIZE + 1)]
+    benchmark.group = f"{name} list of {LIST_SIZE}"
+    benchmark(lambda: [validate_and_encode(model, value) for value in values])
@@ -0,0 +1,86 @@
+import re
+from datetime import date
+
+import models.sqlalchemy as sql
+import pytest
+
+# Statements per request of every entity route, whatever the size of the
+# graph embedded in its response
+EXPECTED_STATEMENTS = {
+    "/books/{book_id}": 4,
+    "/authors/{author_id}": 1,
+    "/borrowers/{borrower_id}": 3,
+    "/library-cards/{library_card_id}": 3,
+    "/loans/{loan_id}": 1,
+    "/books?ids={book_id}": 3,
+    "/books/available/": 3,
+}
+
+GRAPH_SIZES = {"small": (1, 1), "large": (5, 20)}
+
+
+def statements(response) -> int:
+    # Statement count reported by SQLInstrumentationMiddleware
+    match = re.search(r'desc="(\d+) statements', response.headers["server-timing"])
+    return int(match.group(1))
+
+
+def add_book_graph(session, authors_amount: int, reviews_amount: int) -> dict:
+    """
+    Book on loan with authors_amount authors, each of them with another book,
+    and reviews_amount reviews by as many borrowers. Returns the path
+    parameters of the routes under test
+    """
+    book = sql.Book(title="Graph", published_date=date(2000, 1, 1))
+    for index in range(authors_amount):
+        author = sql.Author(first_name="Author", last_name=str(index))
+        author.books = [book, sql.Book(title=f"Other {index}")]
+    borrowers = [
+        sql.Borrower(
+            first_name="Borrower",
+            last_name=str(index),
+            email=f"borrower_{index}@example.com",
+            library_card=sql.LibraryCard(issue_date=date(2020, 1, 1)),
+        )
+        for index in range(reviews_amount)
+    ]
+    book.reviews = [
+        sql.Review(
+            borrower=borrower, rating=5, comment="Review", review_date=date(2024, 1, 1)
+        )
+        for borrower in borrowers
+    ]
+    book.review_count, book.rating_sum = reviews_amount, 5 * reviews_amount
+    library_card = borrowers[0].library_card
+    book.loan = sql.Loan(library_card=library_card, loan_date=date(2024, 1, 1))
+    book.is_available = False
+    # Every borrower reviewed some more books and loaned one
+    for borrower in borrowers:
+        for index in range(3):
+            sql.Review(
+                book=sql.Book(title=f"Reviewed {index}"),
+                borrower=borrower,
+                rating=3,
+                review_date=date(2024, 1, 1),
+            )
+    session.add(book)
+    session.commit()
+    return {
+        "book_id": book.id,
+        "author_id": author.id,
+        "borrower_id": borrowers[0].id,
+        "library_card_id": library_card.id,
+        "loan_id": book.loan.id,
+    }
+
+
+@pytest.mark.parametrize("path", EXPECTED_STATEMENTS)
+def test_statement_count_does_not_depend_on_graph_size(session, client, path):
+    counts = {}
+    for size, (authors_amount, reviews_amount) in GRAPH_SIZES.items():
+        ids = add_book_graph(session, authors_amount, reviews_amount)
+        response = client.get(path.format(**ids))
+        assert response.status_code == 200
+        counts[size] = statements(response)
+
+    assert counts == {size: EXPECTED_STATEMENTS[path] for size in GRAPH_SIZES}